@@ -0,0 +1,143 @@
+"""
+Async database operations - the crud.py functions, awaitable. Used by the routes.
+
+The SQL lives in crud.py only. Every function here runs its crud.py namesake:
+- with an AsyncSession (DB_MODE=async), through AsyncSession.run_sync - the
+  crud function gets the session's underlying Session and its database calls
+  go through the async driver
+- with a plain Session (DB_MODE=sync), on the threadpool
+
+What can't run that way has its own code here: password hashing (the hashing
+process pool), the pause between delete_users batches (asyncio.sleep, not
+time.sleep on the event loop), the streaming iterators (AsyncSession.stream)
+and get_user_row (a bare AsyncConnection).
+"""
+import asyncio
+from functools import wraps
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from starlette.concurrency import run_in_threadpool
+from . import models, schemas, crud, hashing
+from typing import AsyncIterator, List, Optional
+
+
+def _awaitable(sync_function):
+    """
+    `sync_function` from crud.py as a coroutine function taking either an
+    AsyncSession (run_sync) or a plain Session (threadpool).
+    Keeps the routes identical in both DB modes.
+    """
+    @wraps(sync_function)
+    async def wrapper(db, *args, **kwargs):
+        if isinstance(db, AsyncSession):
+            return await db.run_sync(sync_function, *args, **kwargs)
+        return await run_in_threadpool(sync_function, db, *args, **kwargs)
+    return wrapper
+
+
+# ===== USER OPERATIONS =====
+
+get_user_by_email = _awaitable(crud.get_user_by_email)
+get_user = _awaitable(crud.get_user)
+add_user = _awaitable(crud.add_user)
+update_user = _awaitable(crud.update_user)
+set_password_hash = _awaitable(crud.set_password_hash)
+delete_user_by_id = _awaitable(crud.delete_user_by_id)
+delete_todos_of_users = _awaitable(crud.delete_todos_of_users)
+delete_user_accounts = _awaitable(crud.delete_user_accounts)
+
+
+# Takes a connection, not a session, so there is no plain-Session fallback:
+# in DB_MODE=sync call crud.get_user_row on the threadpool
+async def get_user_row(connection: AsyncConnection, user_id: int) -> Optional[Row]:
+    """Find a user by their ID as a plain row (crud.USER_BY_ID), on a bare connection"""
+    result = await connection.execute(crud.USER_BY_ID, {"user_id": user_id})
+    return result.first()
+
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate, is_admin: bool = False) -> models.User:
+    """
+    Create a new user account.
+    - Hashes the password in the hashing process pool before storing
+    - Sets admin flag if specified
+    """
+    hashed_password = await hashing.hash_password(user.password)
+    return await add_user(db, user, hashed_password, is_admin)
+
+
+async def change_password(db: AsyncSession, user: models.User, new_password: str) -> models.User:
+    """Change a user's password (hashes it in the hashing process pool before storing)"""
+    return await set_password_hash(db, user, await hashing.hash_password(new_password))
+
+
+async def delete_users(db: AsyncSession, user_ids: List[int]) -> List[int]:
+    """
+    Delete user accounts and everything they own (admin only), returns the
+    IDs of the users that existed. Same batches as crud.delete_users, but
+    the pause between them doesn't block the event loop.
+    """
+    if not isinstance(db, AsyncSession):
+        return await run_in_threadpool(crud.delete_users, db, user_ids)
+    if not user_ids:
+        return []
+    while await delete_todos_of_users(db, user_ids) == crud.USER_DELETE_BATCH_SIZE:
+        await asyncio.sleep(crud.USER_DELETE_PAUSE_SECONDS)
+    return await delete_user_accounts(db, user_ids)
+
+
+# ===== TODO OPERATIONS =====
+
+create_todo = _awaitable(crud.create_todo)
+get_owned_todo = _awaitable(crud.get_owned_todo)
+update_owned_todo = _awaitable(crud.update_owned_todo)
+apply_todo_updates = _awaitable(crud.apply_todo_updates)
+delete_owned_todo = _awaitable(crud.delete_owned_todo)
+list_todo_rows = _awaitable(crud.list_todo_rows)
+list_user_rows = _awaitable(crud.list_user_rows)
+search_todos = _awaitable(crud.search_todos)
+todo_list_version = _awaitable(crud.todo_list_version)
+list_changes = _awaitable(crud.list_changes)
+todo_stats = _awaitable(crud.todo_stats)
+
+
+async def iter_todos(
+    db: AsyncSession,
+    owner_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    completed: Optional[bool] = None
+) -> AsyncIterator[models.Todo]:
+    """
+    Stream todos (crud.select_todos) from a server-side cursor, crud.STREAM_BATCH_SIZE rows at a time.
+    AsyncSession only - with a plain Session use crud.iter_todos.
+    """
+    stmt = crud.select_todos(owner_id=owner_id, cursor=cursor, completed=completed)
+    result = await db.stream_scalars(stmt.execution_options(yield_per=crud.STREAM_BATCH_SIZE))
+    async for todo in result:
+        yield todo
+
+
+# ===== BULK TODO OPERATIONS =====
+
+create_todos = _awaitable(crud.create_todos)
+update_todos = _awaitable(crud.update_todos)
+delete_todos = _awaitable(crud.delete_todos)
+
+
+# ===== EXPORT / IMPORT =====
+
+import_todos = _awaitable(crud.import_todos)
+
+
+async def iter_todo_row_batches(
+    db: AsyncSession,
+    owner_id: Optional[int] = None,
+    completed: Optional[bool] = None
+) -> AsyncIterator[List[Row]]:
+    """
+    Every matching todo as TodoOut rows, in lists of crud.EXPORT_BATCH_SIZE.
+    AsyncSession only - with a plain Session use crud.iter_todo_row_batches.
+    """
+    stmt = crud.select_todo_rows(owner_id=owner_id, completed=completed)
+    result = await db.stream(stmt.execution_options(yield_per=crud.EXPORT_BATCH_SIZE))
+    async for partition in result.partitions():
+        yield partition
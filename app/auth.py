@@ -1,11 +1,18 @@
+import os
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 
-SECRET_KEY = "supersecret"
+# Every worker process must sign and check tokens with the same key:
+# set SECRET_KEY in the environment for anything but local development.
+# The fallback is for the development server only - gunicorn.conf.py and
+# workers started with INIT_DB_ON_STARTUP=0 refuse to start without it.
+DEV_SECRET_KEY = "supersecret"
+SECRET_KEY_IS_SET = bool(os.getenv("SECRET_KEY"))
+SECRET_KEY = os.getenv("SECRET_KEY") or DEV_SECRET_KEY
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
@@ -2,21 +2,76 @@
 Database operations (CRUD = Create, Read, Update, Delete)
 All functions that interact with the database go here.
 """
+import re
+import time
+from sqlalchemy import bindparam, delete, func, insert, select, text, update, Delete, Select, Update
+from sqlalchemy.dialects.sqlite import Insert as SQLiteInsert, insert as sqlite_insert
+from sqlalchemy.engine import Connection, Row
 from sqlalchemy.orm import Session
-from . import models, schemas, auth
-from typing import List, Optional
+from . import models, schemas, auth, events, todo_cache, token_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Rows fetched per round-trip when streaming todos from a server-side cursor
+STREAM_BATCH_SIZE = 500
+# Todos deleted per transaction when deleting users, and the pause between
+# those transactions (see delete_users)
+USER_DELETE_BATCH_SIZE = 5000
+USER_DELETE_PAUSE_SECONDS = 0.05
+# Rows fetched per round-trip by exports, and imported todos inserted per
+# transaction (see transfer.py)
+EXPORT_BATCH_SIZE = 5000
+IMPORT_BATCH_SIZE = 5000
+
+# Core-level access to the todos table, for statements that return plain rows
+# (with the TodoOut columns) instead of ORM objects
+todos_table = models.Todo.__table__
+users_table = models.User.__table__
+tombstones_table = models.TodoTombstone.__table__
+change_counter_table = models.ChangeCounter.__table__
+stats_table = models.UserTodoStats.__table__
+TODO_COLUMNS = (
+    todos_table.c.id,
+    todos_table.c.title,
+    todos_table.c.description,
+    todos_table.c.completed,
+    todos_table.c.owner_id,
+)
+# A todo's owner, for GET /admin/todos?include=owner (see serialization.nest_owners)
+TODO_OWNER_COLUMNS = (
+    users_table.c.name.label("owner_name"),
+    users_table.c.email.label("owner_email"),
+)
+# The UserOut columns
+USER_COLUMNS = (
+    users_table.c.id,
+    users_table.c.name,
+    users_table.c.email,
+    users_table.c.phone_number,
+    users_table.c.is_admin,
+)
+# Every column of one user, by ID - what get_current_user needs. Built once,
+# so SQLAlchemy compiles it once and reuses the cached SQL on every lookup.
+USER_BY_ID = select(*users_table.c).where(users_table.c.id == bindparam("user_id"))
 
 
 # ===== USER OPERATIONS =====
 
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
     """Find a user by their email address"""
-    return db.query(models.User).filter(models.User.email == email).first()
+    return db.scalars(select(models.User).where(models.User.email == email)).first()
 
 
 def get_user(db: Session, user_id: int) -> Optional[models.User]:
     """Find a user by their ID"""
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return db.scalars(select(models.User).where(models.User.id == user_id)).first()
+
+
+def get_user_row(connection: Connection, user_id: int) -> Optional[Row]:
+    """
+    Find a user by their ID as a plain row (USER_BY_ID), on a bare connection:
+    no Session, identity map or models.User to build (see deps.user_row_for_token)
+    """
+    return connection.execute(USER_BY_ID, {"user_id": user_id}).first()
 
 
 def create_user(db: Session, user: schemas.UserCreate, is_admin: bool = False) -> models.User:
@@ -26,6 +81,11 @@ def create_user(db: Session, user: schemas.UserCreate, is_admin: bool = False) -
     - Sets admin flag if specified
     """
     hashed_password = auth.get_password_hash(user.password)
+    return add_user(db, user, hashed_password, is_admin)
+
+
+def add_user(db: Session, user: schemas.UserCreate, hashed_password: str, is_admin: bool = False) -> models.User:
+    """Store a new user account whose password has already been hashed"""
     db_user = models.User(
         name=user.name,
         email=user.email,
@@ -50,27 +110,104 @@ def update_user(db: Session, user: models.User, name: str, phone_number: Optiona
     db.add(user)
     db.commit()
     db.refresh(user)
+    token_cache.invalidate_user(user.id)
     return user
 
 
 def change_password(db: Session, user: models.User, new_password: str) -> models.User:
     """Change a user's password (hashes it before storing)"""
-    user.hashed_password = auth.get_password_hash(new_password)
+    return set_password_hash(db, user, auth.get_password_hash(new_password))
+
+
+def set_password_hash(db: Session, user: models.User, hashed_password: str) -> models.User:
+    """Store an already-hashed password for a user"""
+    user.hashed_password = hashed_password
     db.add(user)
     db.commit()
     db.refresh(user)
+    token_cache.invalidate_user(user.id)
     return user
 
 
-def list_users(db: Session) -> List[models.User]:
-    """Get all users (admin only)"""
-    return db.query(models.User).all()
+def delete_user_by_id(db: Session, user_id: int) -> bool:
+    """
+    Delete a user account and their todos by ID without loading them (admin only).
+    Returns False if the user doesn't exist.
+    """
+    return bool(delete_users(db, [user_id]))
+
+
+def delete_users(db: Session, user_ids: List[int]) -> List[int]:
+    """
+    Delete user accounts and everything they own (admin only), returns the
+    IDs of the users that existed. Nothing is loaded into the session:
+    - their todos are deleted USER_DELETE_BATCH_SIZE at a time, one short
+      transaction each with a pause in between, so a user with a huge number
+      of todos neither holds SQLite's write lock for seconds (other writes
+      would time out) nor needs memory for all of them
+    - the last transaction deletes any todos created in the meantime, the
+      users' change feeds and counts, and the accounts, so no todo outlives
+      its owner
+    """
+    if not user_ids:
+        return []
+    while delete_todos_of_users(db, user_ids) == USER_DELETE_BATCH_SIZE:
+        # Let writers waiting on the lock in before the next batch
+        time.sleep(USER_DELETE_PAUSE_SECONDS)
+    return delete_user_accounts(db, user_ids)
 
 
-def delete_user(db: Session, user: models.User):
-    """Delete a user account (admin only)"""
-    db.delete(user)
+def delete_user_accounts(db: Session, user_ids: List[int]) -> List[int]:
+    """
+    The last transaction of delete_users: the users' remaining todos, change
+    feeds, counts and accounts. Returns the IDs of the users that existed.
+    """
+    db.execute(delete(todos_table).where(todos_table.c.owner_id.in_(user_ids)))
+    db.execute(delete(tombstones_table).where(tombstones_table.c.owner_id.in_(user_ids)))
+    db.execute(delete(stats_table).where(stats_table.c.owner_id.in_(user_ids)))
+    deleted_ids = db.execute(
+        delete(users_table).where(users_table.c.id.in_(user_ids)).returning(users_table.c.id)
+    ).scalars().all()
     db.commit()
+    for user_id in user_ids:
+        token_cache.invalidate_user(user_id)
+        todo_cache.invalidate(user_id)
+    return list(deleted_ids)
+
+
+def delete_todos_of_users(db: Session, user_ids: List[int]) -> int:
+    """Delete (and commit) up to USER_DELETE_BATCH_SIZE of these users' todos, returns how many"""
+    deleted = db.execute(delete_todos_of_users_statement(user_ids)).all()
+    adjust_stats_for_deleted(db, deleted)
+    db.commit()
+    for owner_id in {row.owner_id for row in deleted}:
+        todo_cache.invalidate(owner_id)
+    return len(deleted)
+
+
+def delete_todos_of_users_statement(user_ids: List[int]) -> Delete:
+    """DELETE ... WHERE id IN (the first USER_DELETE_BATCH_SIZE todos of these users) RETURNING owner and completed"""
+    batch = select(todos_table.c.id).where(todos_table.c.owner_id.in_(user_ids)).limit(USER_DELETE_BATCH_SIZE)
+    return (
+        delete(todos_table)
+        .where(todos_table.c.id.in_(batch.scalar_subquery()))
+        .returning(todos_table.c.owner_id, todos_table.c.completed)
+    )
+
+
+def deleted_todo_counts(deleted: List[Row]) -> Dict[int, Tuple[int, int]]:
+    """owner_id -> (todos, completed todos) among deleted rows with owner_id and completed"""
+    counts: Dict[int, Tuple[int, int]] = {}
+    for row in deleted:
+        total, completed = counts.get(row.owner_id, (0, 0))
+        counts[row.owner_id] = (total + 1, completed + (1 if row.completed else 0))
+    return counts
+
+
+def adjust_stats_for_deleted(db: Session, deleted: List[Row]):
+    """Subtract deleted todos (rows with owner_id and completed) from their owners' counts"""
+    for owner_id, (total, completed) in deleted_todo_counts(deleted).items():
+        adjust_todo_stats(db, owner_id, total=-total, completed=-completed)
 
 
 # ===== TODO OPERATIONS =====
@@ -80,44 +217,578 @@ def create_todo(db: Session, owner: models.User, title: str, description: Option
     todo = models.Todo(
         title=title,
         description=description or "",
-        owner_id=owner.id
+        owner_id=owner.id,
+        version=reserve_versions(db)
     )
+    adjust_todo_stats(db, owner.id, total=1)
     db.add(todo)
     db.commit()
     db.refresh(todo)
+    todo_cache.invalidate(owner.id)
+    events.todos_saved(owner.id, "created", [todo])
     return todo
 
 
-def get_todo(db: Session, todo_id: int) -> Optional[models.Todo]:
-    """Find a todo by its ID"""
-    return db.query(models.Todo).filter(models.Todo.id == todo_id).first()
+def select_todos(
+    owner_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    completed: Optional[bool] = None
+) -> Select:
+    """
+    Todo objects with keyset pagination and filters.
+    - owner_id: only this user's todos (None = all users, admin only)
+    - cursor: only return todos with an ID greater than this one
+    - completed: only return todos with this completed status
+    Results are always ordered by ID so the last ID of a page is the next cursor.
+    """
+    stmt = select(models.Todo)
+    if owner_id is not None:
+        stmt = stmt.where(models.Todo.owner_id == owner_id)
+    if cursor is not None:
+        stmt = stmt.where(models.Todo.id > cursor)
+    if completed is not None:
+        stmt = stmt.where(models.Todo.completed == completed)
+    return stmt.order_by(models.Todo.id)
+
+
+def iter_todos(
+    db: Session,
+    owner_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    completed: Optional[bool] = None
+) -> Iterator[models.Todo]:
+    """
+    Stream todos (see select_todos) from a server-side cursor, STREAM_BATCH_SIZE
+    rows at a time. Memory stays flat no matter how many todos match.
+    """
+    stmt = select_todos(owner_id=owner_id, cursor=cursor, completed=completed)
+    return db.scalars(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+
+
+# ===== CHANGE VERSIONS =====
+# Every todo write takes new versions from the single change_counter row, so
+# versions only ever grow and are never handed out twice. Deletes leave a
+# tombstone with a version. Together they let a client ask for everything
+# that changed after the last version it saw (GET /todos/changes).
+
+def reserve_versions(db: Session, count: int = 1) -> int:
+    """
+    Take `count` consecutive versions, returns the first.
+    The counter UPDATE takes SQLite's write lock until commit, so versions are
+    handed out in commit order and a reader never misses a lower one later.
+    """
+    last = db.execute(
+        update(change_counter_table)
+        .where(change_counter_table.c.id == 1)
+        .values(version=change_counter_table.c.version + count)
+        .returning(change_counter_table.c.version)
+    ).scalar()
+    if last is None:
+        # Database created without migrations.run_migrations
+        db.execute(insert(change_counter_table).values(id=1, version=count))
+        last = count
+    return last - count + 1
+
+
+def tombstone_rows(owner_id: Optional[int], todo_ids: List[int], first_version: int) -> List[dict]:
+    """Rows for todo_tombstones, one version each"""
+    return [
+        {"todo_id": todo_id, "owner_id": owner_id, "version": first_version + offset}
+        for offset, todo_id in enumerate(todo_ids)
+    ]
+
+
+def add_tombstones(db: Session, owner_id: Optional[int], todo_ids: List[int]):
+    """Record deleted todos (part of the caller's transaction)"""
+    if todo_ids:
+        db.execute(insert(tombstones_table), tombstone_rows(owner_id, todo_ids, reserve_versions(db, len(todo_ids))))
+
+
+def todo_list_version(db: Session, owner_id: int) -> int:
+    """
+    The owner's latest change version (0 if they never had a todo).
+    Changes whenever one of their todos is created, updated or deleted.
+    """
+    return db.execute(select_todo_list_version(owner_id)).scalar()
+
+
+def select_todo_list_version(owner_id: int) -> Select:
+    """Two index lookups: the highest version in todos and in todo_tombstones"""
+    latest_todo = select(func.max(todos_table.c.version)).where(todos_table.c.owner_id == owner_id).scalar_subquery()
+    latest_tombstone = (
+        select(func.max(tombstones_table.c.version)).where(tombstones_table.c.owner_id == owner_id).scalar_subquery()
+    )
+    # max() with two arguments is SQLite's scalar max
+    return select(func.max(func.coalesce(latest_todo, 0), func.coalesce(latest_tombstone, 0)))
+
+
+def select_changed_todos(owner_id: int, since: int, limit: int) -> Select:
+    """The owner's todos written after version `since`, oldest change first"""
+    return (
+        select(*TODO_COLUMNS, todos_table.c.version, todos_table.c.updated_at)
+        .where(todos_table.c.owner_id == owner_id, todos_table.c.version > since)
+        .order_by(todos_table.c.version)
+        .limit(limit)
+    )
+
+
+def select_tombstones(owner_id: int, since: int, limit: int) -> Select:
+    """The owner's todos deleted after version `since`, oldest first"""
+    return (
+        select(tombstones_table.c.todo_id.label("id"), tombstones_table.c.version)
+        .where(tombstones_table.c.owner_id == owner_id, tombstones_table.c.version > since)
+        .order_by(tombstones_table.c.version)
+        .limit(limit)
+    )
+
+
+def list_changes(db: Session, owner_id: int, since: int, limit: int) -> Tuple[List[Row], List[Row]]:
+    """
+    Up to `limit` changed todos and up to `limit` tombstones after `since`
+    (two range scans on the (owner_id, version) indexes).
+    pagination.changes_page merges them into one page.
+    """
+    changed = db.execute(select_changed_todos(owner_id, since, limit)).all()
+    deleted = db.execute(select_tombstones(owner_id, since, limit)).all()
+    return changed, deleted
+
+
+# ===== TODO STATISTICS =====
+# user_todo_stats holds each user's todo counts. Every todo write adjusts
+# them in its own transaction, so GET /admin/stats reads one row per user
+# instead of counting every todo.
+
+def todo_stats_upsert(owner_id: int, total: int, completed: int) -> SQLiteInsert:
+    """Add to an owner's counts, creating their row on first use"""
+    stmt = sqlite_insert(stats_table).values(owner_id=owner_id, total=total, completed=completed)
+    return stmt.on_conflict_do_update(
+        index_elements=[stats_table.c.owner_id],
+        set_={
+            "total": stats_table.c.total + stmt.excluded.total,
+            "completed": stats_table.c.completed + stmt.excluded.completed,
+        }
+    )
+
+
+def adjust_todo_stats(db: Session, owner_id: Optional[int], total: int = 0, completed: int = 0):
+    """Add to an owner's counts (part of the caller's transaction)"""
+    if owner_id is not None and (total or completed):
+        db.execute(todo_stats_upsert(owner_id, total, completed))
+
+
+def completed_stats_update(owner_id: int, conditions: list, completed: bool) -> Update:
+    """
+    Adjust the owner's completed count for setting completed=`completed` on
+    the todos matching `conditions`. Counts the todos that will actually flip,
+    so it must run before the todo UPDATE, in the same transaction.
+    """
+    if completed:
+        flipped = select(func.count()).where(*conditions, todos_table.c.completed.is_not(True))
+    else:
+        flipped = select(-func.count()).where(*conditions, todos_table.c.completed.is_(True))
+    return (
+        update(stats_table)
+        .where(stats_table.c.owner_id == owner_id)
+        .values(completed=stats_table.c.completed + flipped.scalar_subquery())
+    )
+
+
+def completion_targets(updates: Dict[int, dict]) -> Dict[bool, List[int]]:
+    """
+    IDs that merged batch updates (see merge_batch_updates) complete (True)
+    and un-complete (False) - the same values the todo UPDATEs write.
+    """
+    targets: Dict[bool, List[int]] = {}
+    for todo_id, values in updates.items():
+        if values.get("completed") is not None:
+            targets.setdefault(values["completed"], []).append(todo_id)
+    return targets
+
+
+def select_todo_stats() -> Select:
+    """Every user with their todo counts (zeros for users without todos)"""
+    total = func.coalesce(stats_table.c.total, 0)
+    completed = func.coalesce(stats_table.c.completed, 0)
+    return (
+        select(
+            users_table.c.id.label("user_id"),
+            users_table.c.name,
+            users_table.c.email,
+            total.label("total"),
+            completed.label("completed"),
+            (total - completed).label("open"),
+        )
+        .select_from(users_table.outerjoin(stats_table, stats_table.c.owner_id == users_table.c.id))
+        .order_by(users_table.c.id)
+    )
+
+
+def todo_stats(db: Session) -> List[Row]:
+    """Per-user todo counts (admin only), one row per user"""
+    return db.execute(select_todo_stats()).all()
+
+
+# ===== OWNERSHIP-SCOPED TODO OPERATIONS =====
+# The owner check is part of the WHERE clause, so each of these is a single
+# statement: no fetch-then-compare, no refresh after the write.
+
+def todo_scope(todo_id: int, owner_id: Optional[int], version: Optional[int] = None) -> list:
+    """
+    WHERE conditions for one todo, optionally only if it belongs to owner_id
+    and only if it is still at `version`
+    """
+    conditions = [todos_table.c.id == todo_id]
+    if owner_id is not None:
+        conditions.append(todos_table.c.owner_id == owner_id)
+    if version is not None:
+        conditions.append(todos_table.c.version == version)
+    return conditions
+
+
+def get_owned_todo(db: Session, todo_id: int, owner_id: int) -> Optional[models.Todo]:
+    """Find a todo by its ID, only if it belongs to owner_id"""
+    return db.scalars(select(models.Todo).where(models.Todo.id == todo_id, models.Todo.owner_id == owner_id)).first()
 
 
-def update_todo(db: Session, todo: models.Todo, title: Optional[str], description: Optional[str], completed: Optional[bool]) -> models.Todo:
-    """Update a todo item - only updates fields that are provided"""
-    if title is not None:
-        todo.title = title
-    if description is not None:
-        todo.description = description
+def update_owned_todo(
+    db: Session,
+    todo_id: int,
+    owner_id: int,
+    title: Optional[str],
+    description: Optional[str],
+    completed: Optional[bool],
+    expected_version: Optional[int] = None
+) -> Optional[Row]:
+    """
+    Update a todo with one UPDATE ... WHERE id=? AND owner_id=? RETURNING.
+    Only provided fields are changed. Returns None if the todo doesn't exist,
+    belongs to someone else, or (with expected_version) has a different version.
+    The row has the TodoOut columns plus the new version.
+    """
+    values = {"title": title, "description": description, "completed": completed}
+    values = {field: value for field, value in values.items() if value is not None}
+    scope = todo_scope(todo_id, owner_id, expected_version)
+    if not values:
+        return db.execute(select(*TODO_COLUMNS, todos_table.c.version).where(*scope)).first()
+    values["version"] = reserve_versions(db)
     if completed is not None:
-        todo.completed = completed
-    db.add(todo)
+        db.execute(completed_stats_update(owner_id, scope, completed))
+    row = db.execute(
+        update(todos_table).where(*scope).values(values).returning(*TODO_COLUMNS, todos_table.c.version)
+    ).first()
     db.commit()
-    db.refresh(todo)
-    return todo
+    if row is not None:
+        todo_cache.invalidate(row.owner_id)
+        events.todos_saved(row.owner_id, "updated", [row])
+    return row
 
 
-def list_todos_for_user(db: Session, user: models.User) -> List[models.Todo]:
-    """Get all todos for a specific user"""
-    return db.query(models.Todo).filter(models.Todo.owner_id == user.id).all()
+def apply_todo_updates(db: Session, updates: List[Tuple[int, int, dict]]) -> List[Optional[Row]]:
+    """
+    Apply (todo_id, owner_id, changed fields) updates of any owners in one
+    transaction - a group commit, see group_commit.py. Each is an
+    update_owned_todo without expected_version; returns the updated row
+    for each (None if the todo doesn't exist or belongs to someone else).
+    """
+    if not updates:
+        return []
+    first_version = reserve_versions(db, len(updates))
+    rows = []
+    for offset, (todo_id, owner_id, values) in enumerate(updates):
+        scope = todo_scope(todo_id, owner_id)
+        if values.get("completed") is not None:
+            db.execute(completed_stats_update(owner_id, scope, values["completed"]))
+        rows.append(db.execute(
+            update(todos_table)
+            .where(*scope)
+            .values({**values, "version": first_version + offset})
+            .returning(*TODO_COLUMNS, todos_table.c.version)
+        ).first())
+    db.commit()
+    for row in rows:
+        if row is not None:
+            todo_cache.invalidate(row.owner_id)
+            events.todos_saved(row.owner_id, "updated", [row])
+    return rows
 
 
-def list_all_todos(db: Session) -> List[models.Todo]:
-    """Get all todos from all users (admin only)"""
-    return db.query(models.Todo).all()
+def delete_owned_todo(db: Session, todo_id: int, owner_id: Optional[int]) -> bool:
+    """
+    Delete a todo with one DELETE ... WHERE id=? AND owner_id=? RETURNING id.
+    owner_id=None deletes it whoever owns it (admin only).
+    Returns False if nothing was deleted.
+    """
+    deleted = db.execute(
+        delete(todos_table)
+        .where(*todo_scope(todo_id, owner_id))
+        .returning(todos_table.c.id, todos_table.c.owner_id, todos_table.c.completed)
+    ).first()
+    if deleted is not None:
+        add_tombstones(db, deleted.owner_id, [deleted.id])
+        adjust_todo_stats(db, deleted.owner_id, total=-1, completed=-1 if deleted.completed else 0)
+    db.commit()
+    if deleted is not None:
+        todo_cache.invalidate(deleted.owner_id)
+        events.todos_deleted(deleted.owner_id, [deleted.id])
+    return deleted is not None
+
+
+# ===== COLUMN-ONLY LISTINGS =====
+# Only the columns the response schema needs, as plain rows - no ORM objects
+# to build and no response_model validation, see serialization.py.
+
+def select_todo_rows(
+    owner_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    completed: Optional[bool] = None,
+    include_owner: bool = False
+) -> Select:
+    """
+    TodoOut columns with the same keyset pagination and filters as select_todos.
+    include_owner: also the owner's TODO_OWNER_COLUMNS, joined in the same
+    query (one primary key lookup per row, instead of a query per todo).
+    """
+    stmt = select(*TODO_COLUMNS)
+    if include_owner:
+        stmt = stmt.add_columns(*TODO_OWNER_COLUMNS).outerjoin(users_table, users_table.c.id == todos_table.c.owner_id)
+    if owner_id is not None:
+        stmt = stmt.where(todos_table.c.owner_id == owner_id)
+    if cursor is not None:
+        stmt = stmt.where(todos_table.c.id > cursor)
+    if completed is not None:
+        stmt = stmt.where(todos_table.c.completed == completed)
+    return stmt.order_by(todos_table.c.id)
 
 
-def delete_todo(db: Session, todo: models.Todo):
-    """Delete a todo item"""
-    db.delete(todo)
+def list_todo_rows(
+    db: Session,
+    owner_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[int] = None,
+    completed: Optional[bool] = None,
+    include_owner: bool = False
+) -> List[Row]:
+    """
+    One page of todos as rows with the TodoOut columns.
+    - owner_id: only this user's todos (None = all users, admin only)
+    - include_owner: plus the owner's name and email (TODO_OWNER_COLUMNS)
+    """
+    stmt = select_todo_rows(owner_id=owner_id, cursor=cursor, completed=completed, include_owner=include_owner)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return db.execute(stmt).all()
+
+
+def list_user_rows(db: Session) -> List[Row]:
+    """Every user as a row with the UserOut columns (admin only)"""
+    return db.execute(select(*USER_COLUMNS).order_by(users_table.c.id)).all()
+
+
+# ===== FULL-TEXT SEARCH =====
+# todos_fts is an FTS5 index over todo titles and descriptions, kept in sync
+# by triggers (see migrations.add_todo_search_index).
+
+# Words of a search query - anything else (quotes, operators) is dropped so
+# user input can never change the shape of the FTS5 query
+SEARCH_TERM = re.compile(r"\w+")
+MAX_SEARCH_TERMS = 16
+
+SEARCH_TODOS = text(
+    "SELECT todos.id, todos.title, todos.description, todos.completed, todos.owner_id"
+    " FROM todos_fts JOIN todos ON todos.id = todos_fts.rowid"
+    " WHERE todos_fts MATCH :match AND todos.owner_id = :owner_id"
+    # Lower bm25 is better; a title match counts 10x a description match
+    " ORDER BY bm25(todos_fts, 10.0, 1.0, 0.0), todos.id"
+    " LIMIT :limit"
+).columns(*TODO_COLUMNS)
+
+
+def search_params(owner_id: int, query: str, limit: int) -> Optional[dict]:
+    """
+    Parameters for SEARCH_TODOS, or None if the query has no words.
+    Every word is a prefix match ("buy mil" finds "Buy milk") and all words
+    must appear in the title or description. The owner filter is part of the
+    MATCH, so only that user's entries are ranked.
+    """
+    terms = SEARCH_TERM.findall(query)[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    words = " ".join(f'"{term}"*' for term in terms)
+    match = f'owner:"u{owner_id}" AND {{title description}}:({words})'
+    return {"match": match, "owner_id": owner_id, "limit": limit}
+
+
+def search_todos(db: Session, owner_id: int, query: str, limit: int) -> List[Row]:
+    """The owner's todos matching `query`, best match first, as rows with the TodoOut columns"""
+    params = search_params(owner_id, query, limit)
+    if params is None:
+        return []
+    return db.execute(SEARCH_TODOS, params).all()
+
+
+# ===== BULK TODO OPERATIONS =====
+# One statement (or one executemany) per operation and a single commit,
+# instead of a commit + refresh per todo. These return plain rows with the
+# TodoOut columns rather than ORM objects.
+
+TODO_UPDATE_FIELDS = ("title", "description", "completed")
+
+
+def merge_batch_updates(items: List[schemas.TodoBatchUpdateItem]) -> Dict[int, dict]:
+    """
+    todo_id -> the fields a batch changes, in request order: when an ID comes
+    up more than once its items are merged and later fields win (like
+    group_commit does), so the batch ends the same as applying them one by one.
+    IDs whose items change nothing map to {}.
+    """
+    merged: Dict[int, dict] = {}
+    for item in items:
+        values = merged.setdefault(item.id, {})
+        values.update({field: getattr(item, field) for field in TODO_UPDATE_FIELDS if getattr(item, field) is not None})
+    return merged
+
+
+def bulk_update_statements(
+    owner_id: int,
+    updates: Dict[int, dict],
+    first_version: int
+) -> List[Tuple[Update, List[dict]]]:
+    """
+    Build the UPDATEs for merged batch updates (todo_id -> changed fields, see
+    merge_batch_updates): one executemany per set of changed fields.
+    Each UPDATE is scoped to the owner, so other users' todos are never touched.
+    The i-th todo gets version first_version + i.
+    """
+    groups: Dict[tuple, List[dict]] = {}
+    for offset, (todo_id, values) in enumerate(updates.items()):
+        params = {f"new_{field}": value for field, value in values.items()}
+        params["todo_id"] = todo_id
+        params["new_version"] = first_version + offset
+        groups.setdefault(tuple(values), []).append(params)
+
+    statements = []
+    for fields, params in groups.items():
+        stmt = (
+            update(todos_table)
+            .where(todos_table.c.id == bindparam("todo_id"), todos_table.c.owner_id == owner_id)
+            .values({field: bindparam(f"new_{field}") for field in fields + ("version",)})
+        )
+        statements.append((stmt, params))
+    return statements
+
+
+def select_owned_todos(owner_id: int, todo_ids: List[int]) -> Select:
+    """The owner's todos among `todo_ids` (one IN query for the whole batch)"""
+    return (
+        select(*TODO_COLUMNS)
+        .where(todos_table.c.owner_id == owner_id, todos_table.c.id.in_(todo_ids))
+        .order_by(todos_table.c.id)
+    )
+
+
+def create_todos(db: Session, owner: models.User, items: List[schemas.TodoCreate]) -> List[Row]:
+    """Create many todos with one INSERT ... RETURNING (rows come back in input order)"""
+    if not items:
+        return []
+    # Not sort_by_parameter_order=True: SQLite has no insert sentinel, so SQLAlchemy
+    # would fall back to one INSERT per row. New IDs are assigned in VALUES order,
+    # so sorting by ID restores the input order.
+    first_version = reserve_versions(db, len(items))
+    rows = db.execute(
+        insert(todos_table).returning(*TODO_COLUMNS),
+        [
+            {"title": item.title, "description": item.description or "", "owner_id": owner.id, "version": first_version + offset}
+            for offset, item in enumerate(items)
+        ]
+    ).all()
+    adjust_todo_stats(db, owner.id, total=len(rows))
+    db.commit()
+    rows = sorted(rows, key=lambda row: row.id)
+    todo_cache.invalidate(owner.id)
+    events.todos_saved(owner.id, "created", rows)
+    return rows
+
+
+def update_todos(db: Session, owner: models.User, items: List[schemas.TodoBatchUpdateItem]) -> List[Row]:
+    """
+    Update many of the owner's todos - only provided fields are changed, and
+    items with the same ID are applied in order (see merge_batch_updates).
+    Returns the owner's todos among the given IDs after the update;
+    IDs missing from the result don't exist or belong to someone else.
+    """
+    if not items:
+        return []
+    merged = merge_batch_updates(items)
+    updates = {todo_id: values for todo_id, values in merged.items() if values}
+    for completed, todo_ids in completion_targets(updates).items():
+        scope = [todos_table.c.owner_id == owner.id, todos_table.c.id.in_(todo_ids)]
+        db.execute(completed_stats_update(owner.id, scope, completed))
+    if updates:
+        for stmt, params in bulk_update_statements(owner.id, updates, reserve_versions(db, len(updates))):
+            db.execute(stmt, params)
+    rows = db.execute(select_owned_todos(owner.id, list(merged))).all()
+    db.commit()
+    todo_cache.invalidate(owner.id)
+    events.todos_saved(owner.id, "updated", rows)
+    return rows
+
+
+def delete_todos(db: Session, owner: models.User, todo_ids: List[int]) -> List[int]:
+    """Delete many of the owner's todos with one DELETE ... RETURNING, returns the deleted IDs"""
+    if not todo_ids:
+        return []
+    deleted = db.execute(
+        delete(todos_table)
+        .where(todos_table.c.owner_id == owner.id, todos_table.c.id.in_(todo_ids))
+        .returning(todos_table.c.id, todos_table.c.completed)
+    ).all()
+    deleted_ids = [row.id for row in deleted]
+    add_tombstones(db, owner.id, deleted_ids)
+    adjust_todo_stats(db, owner.id, total=-len(deleted), completed=-sum(1 for row in deleted if row.completed))
+    db.commit()
+    todo_cache.invalidate(owner.id)
+    events.todos_deleted(owner.id, deleted_ids)
+    return list(deleted_ids)
+
+
+# ===== EXPORT / IMPORT =====
+# Whole todo lists in and out, see transfer.py.
+
+def iter_todo_row_batches(
+    db: Session,
+    owner_id: Optional[int] = None,
+    completed: Optional[bool] = None
+) -> Iterator[List[Row]]:
+    """
+    Every matching todo as rows with the TodoOut columns, in lists of
+    EXPORT_BATCH_SIZE from a server-side cursor (memory stays flat).
+    - owner_id: only this user's todos (None = all users, admin only)
+    """
+    stmt = select_todo_rows(owner_id=owner_id, completed=completed)
+    result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for partition in result.partitions():
+        yield partition
+
+
+def import_todos(db: Session, owner_id: int, todos: List[dict]) -> List[Row]:
+    """
+    Insert parsed todos (title, description, completed) for an owner in one
+    transaction, returns them as TodoOut rows.
+    INSERT ... RETURNING makes SQLAlchemy send the executemany as multi-row
+    VALUES statements (insertmanyvalues). A plain executemany runs one
+    statement per row, and FTS5 flushes its pending index data at the end of
+    every statement that fires the todos_fts_insert trigger - several times
+    slower for big batches.
+    """
+    if not todos:
+        return []
+    first_version = reserve_versions(db, len(todos))
+    rows = db.execute(
+        insert(todos_table).returning(*TODO_COLUMNS),
+        [{**todo, "owner_id": owner_id, "version": first_version + offset} for offset, todo in enumerate(todos)]
+    ).all()
+    adjust_todo_stats(db, owner_id, total=len(rows), completed=sum(1 for row in rows if row.completed))
     db.commit()
+    todo_cache.invalidate(owner_id)
+    events.todos_saved(owner_id, "created", rows)
+    return rows
@@ -1,9 +1,146 @@
-from sqlalchemy import create_engine
+import os
+from typing import Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# Read-only connections for the routes that only read (see db_routing.py).
+# Point DATABASE_READ_URL / ASYNC_DATABASE_READ_URL at a replica; by default a
+# SQLite file in WAL mode is opened a second time with mode=ro (see read_only_url).
+# DB_READ_ROUTING=0 sends every route to the primary.
+DB_READ_ROUTING = os.getenv("DB_READ_ROUTING", "1") == "1"
+
+# Which engine the routes use:
+# "sync"  - plain Session, each database call runs on the threadpool
+# "async" - AsyncSession on the aiosqlite engine, no thread held while waiting on SQLite
+DB_MODE = os.getenv("DB_MODE", "sync")
+if DB_MODE not in ("sync", "async"):
+    raise ValueError(f"DB_MODE must be 'sync' or 'async', not {DB_MODE!r}")
+
+# Engine profiles: SQLite pragmas set on every new connection + pool settings
+ENGINE_PROFILES = {
+    # The original setup: rollback journal, SQLAlchemy's default pool (5 + 10 overflow)
+    "legacy": {
+        "pragmas": {},
+        "pool": {},
+    },
+    # WAL lets readers run during a commit; synchronous=NORMAL is still
+    # crash-safe in WAL mode but skips the fsync on every commit
+    "production": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 256 * 1024 * 1024,
+            "cache_size": -64000,  # negative = KiB, so 64 MB
+            "busy_timeout": 5000,  # ms to wait for the write lock instead of failing
+            "temp_store": "MEMORY",
+        },
+        # At least as many connections as threadpool threads (40), so a
+        # request never holds a thread while waiting for a connection
+        "pool": {
+            "pool_size": 40,
+            "max_overflow": 10,
+            "pool_timeout": 30,
+            "pool_recycle": 3600,
+        },
+    },
+}
+
+DB_PROFILE = os.getenv("DB_PROFILE", "production")
+if DB_PROFILE not in ENGINE_PROFILES:
+    raise ValueError(f"DB_PROFILE must be one of {sorted(ENGINE_PROFILES)}, not {DB_PROFILE!r}")
+
+# Optional overrides for the profile's pool settings
+POOL_ENV_OVERRIDES = {
+    "pool_size": "DB_POOL_SIZE",
+    "max_overflow": "DB_MAX_OVERFLOW",
+    "pool_timeout": "DB_POOL_TIMEOUT",
+    "pool_recycle": "DB_POOL_RECYCLE",
+}
+
+
+def engine_options(url: str, profile: str) -> dict:
+    """Keyword arguments for create_engine / create_async_engine"""
+    options = dict(ENGINE_PROFILES[profile]["pool"])
+    for option, env_name in POOL_ENV_OVERRIDES.items():
+        if os.getenv(env_name):
+            options[option] = int(os.environ[env_name])
+    parsed_url = make_url(url)
+    if parsed_url.get_backend_name() == "sqlite":
+        if parsed_url.database in (None, "", ":memory:"):
+            # In-memory databases use a single shared connection, no pool to size
+            options = {}
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def apply_profile(engine: Engine, profile: str):
+    """Set the profile's pragmas on every new connection (SQLite only)"""
+    pragmas = ENGINE_PROFILES[profile]["pragmas"]
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = DB_PROFILE) -> Engine:
+    engine = create_engine(url, **engine_options(url, profile))
+    apply_profile(engine, profile)
+    return engine
+
+
+def create_async_db_engine(url: str = ASYNC_SQLALCHEMY_DATABASE_URL, profile: str = DB_PROFILE) -> AsyncEngine:
+    engine = create_async_engine(url, **engine_options(url, profile))
+    apply_profile(engine.sync_engine, profile)
+    return engine
+
+
+def read_only_url(url: str, profile: str = DB_PROFILE) -> Optional[str]:
+    """
+    The same SQLite file opened read-only (a mode=ro URI), or None.
+    Only with WAL: there readers never block the writer or each other, so a
+    separate pool of read connections keeps reads from queuing behind writes
+    for a connection. Other databases need an explicit replica URL.
+    """
+    parsed_url = make_url(url)
+    if parsed_url.get_backend_name() != "sqlite" or parsed_url.database in (None, "", ":memory:"):
+        return None
+    if ENGINE_PROFILES[profile]["pragmas"].get("journal_mode") != "WAL" or parsed_url.database.startswith("file:"):
+        return None
+    return f"{parsed_url.drivername}:///file:{parsed_url.database}?mode=ro&uri=true"
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+READ_DATABASE_URL = os.getenv("DATABASE_READ_URL") or read_only_url(SQLALCHEMY_DATABASE_URL)
+ASYNC_READ_DATABASE_URL = os.getenv("ASYNC_DATABASE_READ_URL") or read_only_url(ASYNC_SQLALCHEMY_DATABASE_URL)
+# Without a read URL (or with DB_READ_ROUTING=0) reads share the primary
+if DB_READ_ROUTING and READ_DATABASE_URL:
+    read_engine = create_db_engine(READ_DATABASE_URL)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+else:
+    read_engine, ReadSessionLocal = engine, SessionLocal
+if DB_READ_ROUTING and ASYNC_READ_DATABASE_URL:
+    async_read_engine = create_async_db_engine(ASYNC_READ_DATABASE_URL)
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+else:
+    async_read_engine, AsyncReadSessionLocal = async_engine, AsyncSessionLocal
+
 Base = declarative_base()
@@ -0,0 +1,100 @@
+"""
+Read/write routing of request sessions.
+Routes that only read are marked with @read_route. Their get_db session
+comes from the read-only connections in database.py: a second pool of
+mode=ro connections to the same SQLite file in WAL mode, or a replica given
+by DATABASE_READ_URL. Everything else uses the primary. The user lookup of
+get_current_user always goes to the primary, on a connection of its own
+(deps._get_user_row): its rows feed token_cache, and a lagging replica could
+put back a stale one.
+
+Read your writes: a replica may lag behind the primary, so for
+READ_AFTER_WRITE_SECONDS after a client sent a write, its reads go to the
+primary too. Clients are told apart by their bearer token (or address), in
+this worker only. A read-only SQLite connection sees every commit as soon as
+it starts reading, so there the fallback costs nothing and changes nothing.
+
+A @read_route that writes fails with "attempt to write a readonly database".
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Set
+from starlette.requests import HTTPConnection
+from .database import DB_MODE, async_engine, async_read_engine, engine, read_engine
+
+# Seconds after a client's write during which its reads use the primary
+READ_AFTER_WRITE_SECONDS = float(os.getenv("READ_AFTER_WRITE_SECONDS", 5))
+# Clients remembered for that (least recently written dropped first)
+READ_AFTER_WRITE_MAX_CLIENTS = int(os.getenv("READ_AFTER_WRITE_MAX_CLIENTS", 100000))
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Endpoints marked with @read_route
+_read_endpoints: Set[Callable] = set()
+# client key -> time of its last write, oldest first
+_recent_writes: "OrderedDict[str, float]" = OrderedDict()
+_stats = {"read_sessions": 0, "primary_sessions": 0, "read_your_writes": 0}
+
+
+def enabled() -> bool:
+    """False when reads share the primary's engine (no read URL, or DB_READ_ROUTING=0)"""
+    if DB_MODE == "async":
+        return async_read_engine is not async_engine
+    return read_engine is not engine
+
+
+def read_route(endpoint: Callable) -> Callable:
+    """Mark a route that only reads, so its session uses the read-only connections"""
+    _read_endpoints.add(endpoint)
+    return endpoint
+
+
+def is_read_route(connection: HTTPConnection) -> bool:
+    return connection.scope.get("endpoint") in _read_endpoints
+
+
+def client_key(connection: HTTPConnection, token: Optional[str]) -> str:
+    if token:
+        return token
+    return connection.client.host if connection.client else "unknown"
+
+
+def use_read_session(connection: HTTPConnection, token: Optional[str]) -> bool:
+    """
+    Whether this request's session should come from the read-only
+    connections. Also remembers the client as a recent writer when the
+    request is a write.
+    """
+    if not enabled():
+        return False
+    if connection.scope.get("method") in WRITE_METHODS:
+        _record_write(client_key(connection, token))
+    if not is_read_route(connection):
+        _stats["primary_sessions"] += 1
+        return False
+    written_at = _recent_writes.get(client_key(connection, token))
+    if written_at is not None and time.monotonic() - written_at < READ_AFTER_WRITE_SECONDS:
+        _stats["read_your_writes"] += 1
+        _stats["primary_sessions"] += 1
+        return False
+    _stats["read_sessions"] += 1
+    return True
+
+
+def _record_write(key: str):
+    _recent_writes.pop(key, None)
+    _recent_writes[key] = time.monotonic()
+    while len(_recent_writes) > READ_AFTER_WRITE_MAX_CLIENTS:
+        _recent_writes.popitem(last=False)
+
+
+def get_stats() -> dict:
+    """Sessions handed out per side, and reads sent to the primary after a write"""
+    return {
+        "enabled": enabled(),
+        "read_url": str((async_read_engine if DB_MODE == "async" else read_engine).url) if enabled() else None,
+        "read_routes": len(_read_endpoints),
+        "recent_writers": len(_recent_writes),
+        **_stats,
+    }
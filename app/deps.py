@@ -1,36 +1,113 @@
+from contextlib import asynccontextmanager
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from .database import SessionLocal
-from . import crud, auth, models
-from typing import Generator
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, make_transient_to_detached
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import HTTPConnection
+from .database import DB_MODE, SessionLocal, AsyncSessionLocal, ReadSessionLocal, AsyncReadSessionLocal, engine, async_engine
+from . import async_crud, auth, crud, db_routing, models, token_cache
+from typing import AsyncGenerator, AsyncIterator, Optional, Union
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-# DB dependency
-def get_db() -> Generator:
-    db = SessionLocal()
+# What get_db yields - pass it to the async_crud functions
+DBSession = Union[Session, AsyncSession]
+
+# A session for the current DB_MODE - AsyncSession when DB_MODE=async, plain Session otherwise.
+# read_only=True: from the read-only connections (see db_routing.py)
+@asynccontextmanager
+async def db_session(read_only: bool = False) -> AsyncIterator[DBSession]:
+    if DB_MODE == "async":
+        async with (AsyncReadSessionLocal if read_only else AsyncSessionLocal)() as db:
+            yield db
+        return
+    db = (ReadSessionLocal if read_only else SessionLocal)()
     try:
         yield db
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
+
+# DB dependency - read-only connections for @read_route routes, the primary otherwise
+async def get_db(connection: HTTPConnection) -> AsyncGenerator:
+    read_only = db_routing.use_read_session(connection, token_from_connection(connection))
+    async with db_session(read_only) as db:
+        yield db
+
+# auth dependencies - session-free: the user comes from token_cache or from
+# one Core lookup on a pooled connection (user_row_for_token), so routes that
+# only need the caller's identity (GET /users/me) never open a Session
+async def get_current_user_row(token: str = Depends(oauth2_scheme)) -> Row:
+    return await user_row_for_token(token)
+
+async def get_current_user(row: Row = Depends(get_current_user_row)) -> models.User:
+    return user_from_row(row)
+
+async def user_for_token(token: str) -> models.User:
+    return user_from_row(await user_row_for_token(token))
+
+async def user_row_for_token(token: str) -> Row:
+    # Already verified recently? Skip the JWT decode and the user lookup
+    row = token_cache.get(token)
+    if row is not None:
+        return row
 
-# auth dependencies
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
     payload = auth.decode_access_token(token)
     if not payload or "sub" not in payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
     user_id = int(payload.get("sub"))
-    user = crud.get_user(db, user_id)
-    if not user:
+    generation = token_cache.generation()
+    row = await _get_user_row(user_id)
+    if not row:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    token_cache.put(token, payload, row, generation)
+    return row
+
+def user_from_row(row: Row) -> models.User:
+    """A fresh detached User (for the crud functions that take one), so requests never share an instance"""
+    user = models.User(**row._mapping)
+    make_transient_to_detached(user)
     return user
 
-def get_current_active_user(current_user: models.User = Depends(get_current_user)) -> models.User:
+# On the primary, not the read-only connections: the row is cached for up to
+# TOKEN_CACHE_TTL_SECONDS, and a lagging replica could put back a stale one
+# right after a profile change invalidated it
+async def _get_user_row(user_id: int) -> Optional[Row]:
+    if DB_MODE == "async":
+        async with async_engine.connect() as connection:
+            return await async_crud.get_user_row(connection, user_id)
+    # Look up and give the connection back in the same threadpool call: one
+    # returned in a later call stays checked out while it waits for a thread,
+    # and a burst of new tokens could take every thread and connection
+    return await run_in_threadpool(_get_user_row_sync, user_id)
+
+def _get_user_row_sync(user_id: int) -> Optional[Row]:
+    with engine.connect() as connection:
+        return crud.get_user_row(connection, user_id)
+
+async def get_current_active_user(current_user: models.User = Depends(get_current_user)) -> models.User:
     # Could add active flag
     return current_user
 
-def get_current_admin_user(current_user: models.User = Depends(get_current_user)) -> models.User:
+async def get_current_admin_user(current_user: models.User = Depends(get_current_user)) -> models.User:
     if not current_user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
     return current_user
+
+# Long-lived connections (SSE, WebSocket) authenticate once when they open and
+# must not keep a database session for their whole lifetime
+def token_from_connection(connection: HTTPConnection) -> Optional[str]:
+    """Bearer token from the Authorization header, or ?access_token= (browsers can't set headers on EventSource/WebSocket)"""
+    scheme, _, token = connection.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    return connection.query_params.get("access_token")
+
+async def authenticate_connection(connection: HTTPConnection) -> models.User:
+    """Same checks as get_current_user (which doesn't hold a session either)"""
+    token = token_from_connection(connection)
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return await user_for_token(token)
+
@@ -0,0 +1,68 @@
+"""
+ETags and conditional requests.
+Polling clients send back the ETag of their last response in If-None-Match;
+when nothing changed they get an empty 304 and the route skips loading and
+encoding the body. PUT /todos/{id} accepts If-Match for optimistic
+concurrency: the update only applies if the todo is still at that version.
+
+- a todo's ETag is its change version (see crud.reserve_versions)
+- a todo list's ETag is the owner's latest version (todos and tombstones)
+  plus the query parameters
+- a profile's ETag is a hash of the UserOut fields (users have no version)
+"""
+import hashlib
+from typing import Optional, Union
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy.engine import Row
+from . import models
+
+ETAG_HEADER = "ETag"
+
+
+def todo_etag(todo_id: int, version: int) -> str:
+    return f'"todo-{todo_id}-{version}"'
+
+
+def todo_list_etag(owner_id: int, list_version: int, *params) -> str:
+    """Changes with every write to the owner's todos, and with the query parameters"""
+    return f'"todos-{owner_id}-{list_version}-{"-".join(str(param) for param in params)}"'
+
+
+def user_etag(user: Union[models.User, Row]) -> str:
+    fields = (user.id, user.name, user.email, user.phone_number, user.is_admin)
+    return f'"user-{hashlib.blake2b(repr(fields).encode(), digest_size=8).hexdigest()}"'
+
+
+def _tags(header: str) -> list:
+    return [tag.strip() for tag in header.split(",")]
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True if If-None-Match already names this ETag (weak comparison, as HTTP requires)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return any(tag == "*" or tag.removeprefix("W/") == etag for tag in _tags(header))
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={ETAG_HEADER: etag})
+
+
+def expected_todo_version(request: Request, todo_id: int) -> Optional[int]:
+    """
+    The version an If-Match header requires for this todo.
+    None if there is no If-Match (or it is "*"); 412 if it names no version
+    of this todo at all.
+    """
+    header = request.headers.get("if-match")
+    if not header:
+        return None
+    prefix = f'"todo-{todo_id}-'
+    for tag in _tags(header):
+        if tag == "*":
+            return None
+        if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix):-1].isdigit():
+            return int(tag[len(prefix):-1])
+    raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Todo has been modified")
@@ -0,0 +1,144 @@
+"""
+In-process pub/sub for todo change events.
+The crud layer publishes created / updated / deleted events after each
+commit; GET /todos/stream (Server-Sent Events) and the /todos/ws WebSocket
+subscribe to the events of the connected user and push them to the client.
+
+Each connection has its own bounded queue. A client that stops reading
+lets its queue fill up; the next event then evicts it (the connection gets
+an "evicted" message and is closed) instead of holding memory or slowing
+down everyone else. Clients reconnect and catch up with GET /todos/changes.
+
+Events are only delivered to connections on the same worker process.
+"""
+import asyncio
+import os
+import threading
+from typing import Dict, Iterable, Optional, Set
+import orjson
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 100))
+# Seconds between keep-alive messages on idle connections
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", 15))
+
+TODO_FIELDS = ("id", "title", "description", "completed", "owner_id")
+
+# Put in a queue when its subscription is evicted
+EVICTED = object()
+
+_lock = threading.Lock()
+# owner id -> subscriptions of that user's connections
+_subscriptions: Dict[int, Set["Subscription"]] = {}
+_stats = {"published": 0, "delivered": 0, "evicted": 0}
+
+
+class Subscription:
+    """One connection's queue of encoded events"""
+
+    def __init__(self, owner_id: int, loop: asyncio.AbstractEventLoop):
+        self.owner_id = owner_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.evicted = False
+
+    def deliver(self, event: bytes):
+        """Queue an event (on the subscription's event loop)"""
+        if self.evicted:
+            return
+        try:
+            self.queue.put_nowait(event)
+            _stats["delivered"] += 1
+        except asyncio.QueueFull:
+            # Slow consumer: drop what it hasn't read and tell it to go away
+            self.evicted = True
+            _stats["evicted"] += 1
+            unsubscribe(self)
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(EVICTED)
+
+    async def next_event(self, timeout: float) -> Optional[object]:
+        """The next encoded event, EVICTED, or None if nothing arrived within `timeout`"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def subscribe(owner_id: int) -> Subscription:
+    """Start receiving the user's events (call from the event loop)"""
+    subscription = Subscription(owner_id, asyncio.get_running_loop())
+    with _lock:
+        _subscriptions.setdefault(owner_id, set()).add(subscription)
+    return subscription
+
+
+def unsubscribe(subscription: Subscription):
+    with _lock:
+        subscriptions = _subscriptions.get(subscription.owner_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del _subscriptions[subscription.owner_id]
+
+
+def publish(owner_id: Optional[int], event: dict):
+    """
+    Send an event to every connection of `owner_id`.
+    Safe to call from threadpool threads (DB_MODE=sync): delivery is handed
+    to each connection's event loop. Costs one dict lookup when nobody listens.
+    """
+    if owner_id not in _subscriptions:
+        return
+    with _lock:
+        subscriptions = list(_subscriptions.get(owner_id, ()))
+    if not subscriptions:
+        return
+    _stats["published"] += 1
+    encoded = orjson.dumps(event)
+    for subscription in subscriptions:
+        if _on_loop(subscription.loop):
+            subscription.deliver(encoded)
+        else:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, encoded)
+
+
+def _on_loop(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+def _todo_dict(todo) -> dict:
+    """TodoOut fields of an ORM todo or a row"""
+    return {field: getattr(todo, field) for field in TODO_FIELDS}
+
+
+def todos_saved(owner_id: Optional[int], event_type: str, todos: Iterable):
+    """Publish one "created" or "updated" event per todo"""
+    if owner_id not in _subscriptions:
+        return
+    for todo in todos:
+        publish(owner_id, {"type": event_type, "todo": _todo_dict(todo)})
+
+
+def todos_deleted(owner_id: Optional[int], todo_ids: Iterable[int]):
+    """Publish one "deleted" event per todo"""
+    if owner_id not in _subscriptions:
+        return
+    for todo_id in todo_ids:
+        publish(owner_id, {"type": "deleted", "id": todo_id})
+
+
+def get_stats() -> dict:
+    """Open connections and delivery counters"""
+    with _lock:
+        connections = sum(len(subscriptions) for subscriptions in _subscriptions.values())
+        users = len(_subscriptions)
+    return {
+        "connections": connections,
+        "users": users,
+        "queue_size": EVENT_QUEUE_SIZE,
+        **_stats,
+    }
@@ -0,0 +1,189 @@
+"""
+Group commit for todo updates (PUT /todos/{id}).
+Every update normally commits on its own: one WAL sync and one turn at
+SQLite's single write lock per click, so clients toggling todos quickly
+queue up behind each other's commits. With GROUP_COMMIT_ENABLED=1 the route
+hands the update to one background writer task instead. The writer waits up
+to GROUP_COMMIT_INTERVAL_MS for more updates (or until
+GROUP_COMMIT_MAX_BATCH todos are waiting) and applies them all in one
+transaction (crud.apply_todo_updates). Updates to the same todo that arrive
+before the flush are merged (later fields win), so a todo toggled five
+times in a burst is written once.
+
+Each caller waits until the transaction holding its update has committed,
+then gets the todo as committed. The response is as durable as a direct
+update, and the caller's next request reads its own write. When several
+updates to one todo were merged, every caller gets the merged result.
+Updates with If-Match, or with nothing to change, still go straight to the
+database.
+
+The writer runs in each worker process and only batches that worker's
+updates.
+"""
+import asyncio
+import itertools
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.engine import Row
+from . import async_crud
+from .deps import db_session
+
+# Set to 1 to send todo updates through the writer
+GROUP_COMMIT_ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "0") == "1"
+# How long the writer waits for more updates before committing
+GROUP_COMMIT_INTERVAL_MS = float(os.getenv("GROUP_COMMIT_INTERVAL_MS", 5))
+# Most todos written in one transaction; reaching it flushes right away
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", 500))
+
+
+class PendingUpdate:
+    """The merged fields of one todo's queued updates, and their callers"""
+
+    def __init__(self):
+        self.values: dict = {}
+        self.waiters: List[asyncio.Future] = []
+
+
+# (todo id, owner id) -> pending update, in arrival order
+_pending: Dict[Tuple[int, int], PendingUpdate] = {}
+_writer: Optional[asyncio.Task] = None
+_wakeup: Optional[asyncio.Event] = None
+_full: Optional[asyncio.Event] = None
+_stopping = False
+_stats = {
+    "queued": 0,
+    "coalesced": 0,
+    "batches": 0,
+    "written": 0,
+    "failed_batches": 0,
+    "batch_size_max": 0,
+    "flush_seconds_total": 0.0,
+}
+
+
+def start():
+    """Start the writer on the running event loop (called at app startup, and by update_todo)"""
+    global _writer, _wakeup, _full, _stopping
+    loop = asyncio.get_running_loop()
+    if _writer is not None and not _writer.done() and _writer.get_loop() is loop:
+        return
+    # Anything queued on another (finished) event loop can't be answered any more
+    _pending.clear()
+    _wakeup, _full, _stopping = asyncio.Event(), asyncio.Event(), False
+    _writer = loop.create_task(_run())
+
+
+async def shutdown():
+    """Commit what is still queued and stop the writer (called at app shutdown)"""
+    global _writer, _stopping
+    if _writer is None:
+        return
+    _stopping = True
+    _wakeup.set()
+    _full.set()
+    await _writer
+    _writer = None
+
+
+def should_queue(expected_version: Optional[int], title: Optional[str], description: Optional[str], completed: Optional[bool]) -> bool:
+    """Whether an update goes through the writer: enabled, no If-Match, and something to change"""
+    return (
+        GROUP_COMMIT_ENABLED
+        and expected_version is None
+        and any(value is not None for value in (title, description, completed))
+    )
+
+
+async def update_todo(
+    todo_id: int,
+    owner_id: int,
+    title: Optional[str],
+    description: Optional[str],
+    completed: Optional[bool]
+) -> Optional[Row]:
+    """
+    Queue an update (only provided fields are changed) and wait until it is
+    committed. Returns the todo as committed, like crud.update_owned_todo,
+    or None if the todo doesn't exist or belongs to someone else.
+    """
+    start()
+    values = {"title": title, "description": description, "completed": completed}
+    values = {field: value for field, value in values.items() if value is not None}
+    key = (todo_id, owner_id)
+    pending = _pending.get(key)
+    if pending is None:
+        pending = _pending[key] = PendingUpdate()
+    else:
+        _stats["coalesced"] += 1
+    pending.values.update(values)
+    waiter = asyncio.get_running_loop().create_future()
+    pending.waiters.append(waiter)
+    _stats["queued"] += 1
+
+    _wakeup.set()
+    if len(_pending) >= GROUP_COMMIT_MAX_BATCH:
+        _full.set()
+    return await waiter
+
+
+async def _run():
+    """The writer: wait for updates, give others a moment to join, commit them together"""
+    while True:
+        await _wakeup.wait()
+        if not _stopping and len(_pending) < GROUP_COMMIT_MAX_BATCH:
+            try:
+                await asyncio.wait_for(_full.wait(), GROUP_COMMIT_INTERVAL_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+        _wakeup.clear()
+        _full.clear()
+        while _pending:
+            await _flush()
+            if not _stopping and len(_pending) < GROUP_COMMIT_MAX_BATCH:
+                # Updates that arrived during the flush wait for the next interval
+                break
+        if _stopping and not _pending:
+            return
+
+
+async def _flush():
+    """Commit up to GROUP_COMMIT_MAX_BATCH queued todos in one transaction and answer their callers"""
+    keys = list(itertools.islice(_pending, GROUP_COMMIT_MAX_BATCH))
+    batch = [(key, _pending.pop(key)) for key in keys]
+    updates = [(todo_id, owner_id, pending.values) for (todo_id, owner_id), pending in batch]
+    started = time.perf_counter()
+    try:
+        async with db_session() as db:
+            rows = await async_crud.apply_todo_updates(db, updates)
+    except Exception as exc:
+        # The whole transaction was rolled back: every caller gets the error
+        _stats["failed_batches"] += 1
+        for _, pending in batch:
+            for waiter in pending.waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+        return
+    finally:
+        _stats["flush_seconds_total"] += time.perf_counter() - started
+
+    _stats["batches"] += 1
+    _stats["written"] += len(batch)
+    _stats["batch_size_max"] = max(_stats["batch_size_max"], len(batch))
+    for (_, pending), row in zip(batch, rows):
+        for waiter in pending.waiters:
+            if not waiter.done():
+                waiter.set_result(row)
+
+
+def get_stats() -> dict:
+    """Queued, merged and written updates, batch sizes and time spent committing"""
+    batches = _stats["batches"]
+    return {
+        "enabled": GROUP_COMMIT_ENABLED,
+        "interval_ms": GROUP_COMMIT_INTERVAL_MS,
+        "max_batch": GROUP_COMMIT_MAX_BATCH,
+        "pending": len(_pending),
+        **_stats,
+        "batch_size_avg": _stats["written"] / batches if batches else 0.0,
+    }
@@ -0,0 +1,115 @@
+"""
+Password hashing off the event loop.
+PBKDF2 takes tens of milliseconds of CPU per call, so hashing and verifying
+run in a dedicated process pool (one process per core). The number of
+pending jobs is capped - when the queue is full, callers get HashingBusy
+(turned into a 503 response) instead of piling up behind a login storm.
+If a worker process dies (killed, out of memory), the broken pool is
+replaced and the jobs it took down are retried once on the new one.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from . import auth
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 1))
+# Max jobs running or waiting for a worker; more than this gets a 503
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", HASH_WORKERS * 32))
+
+_executor: Optional[Executor] = None
+_pending = 0
+_stats = {
+    "queue_depth_max": 0,
+    "rejected": 0,
+    "completed": 0,
+    "latency_seconds_total": 0.0,
+    "latency_seconds_max": 0.0,
+    "pool_restarts": 0,
+}
+
+
+class HashingBusy(Exception):
+    """The hashing queue is full - try again later"""
+
+
+def start():
+    """Start the worker processes (called at app startup)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+
+def shutdown():
+    """Stop the worker processes (called at app shutdown)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def _replace_broken(executor: Executor):
+    """Drop a pool whose worker died, unless another caller already replaced it"""
+    global _executor
+    if _executor is executor:
+        executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _stats["pool_restarts"] += 1
+    start()
+
+
+async def _run(function, *args):
+    """Run `function` in the pool, enforcing the queue limit and recording latency"""
+    global _pending
+    if _pending >= HASH_QUEUE_SIZE:
+        _stats["rejected"] += 1
+        raise HashingBusy("Too many password operations in progress")
+    start()
+
+    _pending += 1
+    _stats["queue_depth_max"] = max(_stats["queue_depth_max"], _pending)
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        executor = _executor
+        try:
+            return await loop.run_in_executor(executor, function, *args)
+        except BrokenProcessPool:
+            # Every job of the dead pool fails with this, not just the one
+            # that was running in the dead worker - retry once on a new pool
+            _replace_broken(executor)
+            return await loop.run_in_executor(_executor, function, *args)
+    finally:
+        _pending -= 1
+        elapsed = time.perf_counter() - started
+        _stats["completed"] += 1
+        _stats["latency_seconds_total"] += elapsed
+        _stats["latency_seconds_max"] = max(_stats["latency_seconds_max"], elapsed)
+
+
+async def hash_password(password: str) -> str:
+    """Async version of auth.get_password_hash"""
+    return await _run(auth.get_password_hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Async version of auth.verify_password"""
+    return await _run(auth.verify_password, plain_password, hashed_password)
+
+
+def get_stats() -> dict:
+    """Queue depth and latency (queue wait + hashing) counters"""
+    completed = _stats["completed"]
+    return {
+        "workers": HASH_WORKERS,
+        "queue_size": HASH_QUEUE_SIZE,
+        "queue_depth": _pending,
+        **_stats,
+        "latency_seconds_avg": _stats["latency_seconds_total"] / completed if completed else 0.0,
+    }
@@ -0,0 +1,219 @@
+"""
+Request timing and SQL query instrumentation.
+RequestTimingMiddleware times every request and, through SQLAlchemy cursor
+events, counts the queries it runs and the time spent in the database:
+- per-route histograms, served in Prometheus text format by GET /metrics
+- a Server-Timing header on every response (visible in browser dev tools)
+- METRICS_TOKEN, if set, is the bearer token GET /metrics requires;
+  without it the endpoint is open (keep it off the public network)
+- QUERY_LOG_THRESHOLD=N logs every request that runs more than N queries,
+  with its most repeated statements, so N+1 patterns show up in the logs
+
+Queries are attributed to the request through a context variable, which
+follows the request into threadpool calls (DB_MODE=sync) and into the
+aiosqlite engine's greenlets (DB_MODE=async).
+"""
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Log requests that run more than this many queries (0 = off)
+QUERY_LOG_THRESHOLD = int(os.getenv("QUERY_LOG_THRESHOLD", 0))
+# Bearer token for GET /metrics ("" = no authentication)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    """Queries run by one request so far"""
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        # Only kept when QUERY_LOG_THRESHOLD is set
+        self.statements: Optional[List[str]] = [] if QUERY_LOG_THRESHOLD else None
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, like a Prometheus histogram"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-2]}')
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-2]}")
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]:.6f}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency by route",
+    ("method", "route", "status"), LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL queries per request by route",
+    ("method", "route"), QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Time spent running SQL per request by route",
+    ("method", "route"), LATENCY_BUCKETS
+)
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_QUERIES, REQUEST_DB_DURATION)
+
+
+# ===== SQLALCHEMY HOOKS =====
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_request.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_request.get()
+    if stats is None:
+        return
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    stats.db_seconds += time.perf_counter() - start_times.pop()
+    stats.queries += 1
+    if stats.statements is not None:
+        stats.statements.append(statement)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    if _current_request.get() is not None and exception_context.connection is not None:
+        start_times = exception_context.connection.info.get("query_start_time")
+        if start_times:
+            start_times.pop()
+
+
+def instrument_engine(engine: Engine):
+    """Count queries run on `engine` (for an AsyncEngine pass engine.sync_engine)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+# ===== MIDDLEWARE =====
+
+class RequestTimingMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware, so streaming responses and
+    context variables work normally). Everything is recorded once the
+    response body has been sent, so streamed responses count in full.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", app;dur={elapsed_ms:.1f}'
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_request.reset(token)
+            self.record(scope, status_code, time.perf_counter() - started, stats)
+
+    @staticmethod
+    def record(scope: Scope, status_code: int, seconds: float, stats: RequestStats):
+        method = scope["method"]
+        # The route template, not the raw path, so the number of series stays bounded
+        route = scope.get("route")
+        route_path = getattr(route, "path", "<unmatched>")
+        REQUEST_DURATION.observe((method, route_path, str(status_code)), seconds)
+        REQUEST_QUERIES.observe((method, route_path), stats.queries)
+        REQUEST_DB_DURATION.observe((method, route_path), stats.db_seconds)
+
+        if QUERY_LOG_THRESHOLD and stats.queries > QUERY_LOG_THRESHOLD:
+            repeated = Counter(stats.statements).most_common(3)
+            logger.warning(
+                "%s %s ran %d queries (QUERY_LOG_THRESHOLD=%d), most repeated:\n%s",
+                method, scope["path"], stats.queries, QUERY_LOG_THRESHOLD,
+                "\n".join(f"  {count}x {' '.join(statement.split())}" for statement, count in repeated)
+            )
+
+
+def metrics_authorized(authorization: Optional[str]) -> bool:
+    """Whether an Authorization header may read /metrics (any may when METRICS_TOKEN is unset)"""
+    if not METRICS_TOKEN:
+        return True
+    scheme, _, token = (authorization or "").partition(" ")
+    return scheme.lower() == "bearer" and secrets.compare_digest(token.encode(), METRICS_TOKEN.encode())
+
+
+def render_metrics() -> str:
+    """Every histogram in Prometheus text exposition format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
@@ -3,56 +3,41 @@ Main application entry point.
 FastAPI app instance and route registration.
 """
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from .database import engine, Base, SessionLocal
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from .database import engine, async_engine, read_engine, async_read_engine
 from .routes import auth, users, todos, admin
-from . import models, crud
-from .schemas import UserCreate
+from . import models, group_commit, hashing, instrumentation, manage, rate_limit
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Lifecycle manager - runs once at startup and shutdown.
+    Lifecycle manager - runs once at startup and shutdown, in every worker.
     This prevents double-execution issues with --reload.
+    Creating tables and test accounts is `python -m app.manage init-db`'s job:
+    booting a worker on an up-to-date database only reads schema_migrations
+    (no writes, no password hashing).
     """
-    # STARTUP: Create tables and seed users
-    print("Starting up: Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    
-    print("Starting up: Seeding test accounts...")
-    db = SessionLocal()
-    try:
-        # Create admin account if it doesn't exist
-        admin_user = crud.get_user_by_email(db, "admin@admin.com")
-        if not admin_user:
-            admin_data = UserCreate(
-                name="Admin",
-                email="admin@admin.com",
-                password="admin",
-                phone_number="+1000000000"
-            )
-            crud.create_user(db, admin_data, is_admin=True)
-            print("  ✓ Created admin account: admin@admin.com")
-        else:
-            print("  ✓ Admin account already exists")
-        
-        # Create regular user account if it doesn't exist
-        regular_user = crud.get_user_by_email(db, "user@user.com")
-        if not regular_user:
-            user_data = UserCreate(
-                name="User",
-                email="user@user.com",
-                password="user",
-                phone_number="+1000000001"
-            )
-            crud.create_user(db, user_data, is_admin=False)
-            print("  ✓ Created user account: user@user.com")
-        else:
-            print("  ✓ User account already exists")
-    finally:
-        db.close()
-    
+    # STARTUP: Production workers (see gunicorn.conf.py) need a real signing key
+    if not manage.INIT_DB_ON_STARTUP:
+        manage.require_secret_key()
+
+    # STARTUP: Check the database is ready
+    if not manage.is_initialized(engine):
+        if not manage.INIT_DB_ON_STARTUP:
+            raise RuntimeError("The database is not up to date: run `python -m app.manage init-db` first")
+        print("Starting up: Initializing the database...")
+        await run_in_threadpool(manage.init_db, engine)
+
+    print("Starting up: Starting password hashing workers...")
+    hashing.start()
+
+    if group_commit.GROUP_COMMIT_ENABLED:
+        print("Starting up: Starting the group commit writer...")
+        group_commit.start()
+
     print("Application ready! Visit http://127.0.0.1:8000/docs")
     
     # Keep the lifespan context manager active until the server shuts down
@@ -60,6 +45,8 @@ async def lifespan(app: FastAPI):
         yield  # App runs here
     finally:
         print("Shutting down...")
+        await group_commit.shutdown()
+        hashing.shutdown()
 
 
 # Create FastAPI app with lifespan manager
@@ -70,8 +57,50 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Request timing, query counts and the Server-Timing header (see /metrics)
+instrumentation.instrument_engine(engine)
+instrumentation.instrument_engine(async_engine.sync_engine)
+instrumentation.instrument_engine(read_engine)
+instrumentation.instrument_engine(async_read_engine.sync_engine)
+app.add_middleware(instrumentation.RequestTimingMiddleware)
+
 # Register route modules
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(todos.router)
 app.include_router(admin.router)
+
+
+@app.exception_handler(hashing.HashingBusy)
+async def hashing_busy_handler(request: Request, exc: hashing.HashingBusy):
+    """Too many logins/registrations in flight - ask the client to retry shortly"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(rate_limit.RateLimited)
+async def rate_limited_handler(request: Request, exc: rate_limit.RateLimited):
+    """Too many attempts from this client / for this account - tell the client when to retry"""
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(exc)},
+        headers={"Retry-After": exc.retry_after_header}
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(request: Request):
+    """
+    Per-route latency, query count and database time histograms (Prometheus format).
+    Needs `Authorization: Bearer <METRICS_TOKEN>` when METRICS_TOKEN is set, open otherwise.
+    """
+    if not instrumentation.metrics_authorized(request.headers.get("Authorization")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return PlainTextResponse(instrumentation.render_metrics(), media_type=instrumentation.PROMETHEUS_MEDIA_TYPE)
@@ -0,0 +1,126 @@
+"""
+Management commands - one-shot jobs that used to run in every worker at boot.
+
+    python -m app.manage init-db
+
+init-db creates missing tables, applies migrations and creates the test
+accounts (hashing their passwords). It holds an exclusive file lock while it
+runs, so several copies at once (parallel deploys, workers starting together)
+are safe: the others wait, then find nothing left to do.
+
+Workers only check, read-only, that the database is up to date (see
+main.lifespan). With INIT_DB_ON_STARTUP=1 (the default, for local
+development) a worker that finds it isn't runs init_db itself; with
+INIT_DB_ON_STARTUP=0 (production, set by gunicorn.conf.py) it also refuses
+to start without SECRET_KEY.
+"""
+import argparse
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import sessionmaker
+from .database import SQLALCHEMY_DATABASE_URL, Base, engine as default_engine
+from . import auth, crud, migrations, models, schemas
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Run init_db from a worker that finds the database out of date, instead of refusing to start
+INIT_DB_ON_STARTUP = os.getenv("INIT_DB_ON_STARTUP", "1") == "1"
+
+# (account, is_admin) created by init-db if missing
+SEED_USERS = [
+    (schemas.UserCreate(name="Admin", email="admin@admin.com", password="admin", phone_number="+1000000000"), True),
+    (schemas.UserCreate(name="User", email="user@user.com", password="user", phone_number="+1000000001"), False),
+]
+
+
+def lock_path(url: str = SQLALCHEMY_DATABASE_URL) -> str:
+    """INIT_LOCK_FILE, or a file next to the SQLite database"""
+    if os.getenv("INIT_LOCK_FILE"):
+        return os.environ["INIT_LOCK_FILE"]
+    parsed_url = make_url(url)
+    if parsed_url.get_backend_name() == "sqlite" and parsed_url.database not in (None, "", ":memory:"):
+        return f"{parsed_url.database}.init-lock"
+    return os.path.join(tempfile.gettempdir(), "todo-app-init.lock")
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on `path` (waits for other processes holding it)"""
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    # Retries for ~10 seconds, then raises
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def require_secret_key():
+    """Refuse to run a production worker on the development SECRET_KEY fallback (see auth.py)"""
+    if not auth.SECRET_KEY_IS_SET:
+        raise RuntimeError("SECRET_KEY is not set: every worker must sign tokens with the same secret key")
+
+
+def is_initialized(engine: Engine = default_engine) -> bool:
+    """True if every migration has been applied (read-only)"""
+    return not migrations.pending_migrations(engine)
+
+
+def seed_users(engine: Engine):
+    """Create the test accounts that don't exist yet"""
+    with sessionmaker(autocommit=False, autoflush=False, bind=engine)() as db:
+        for account, is_admin in SEED_USERS:
+            if crud.get_user_by_email(db, account.email):
+                print(f"  ✓ Account already exists: {account.email}")
+            else:
+                crud.create_user(db, account, is_admin=is_admin)
+                print(f"  ✓ Created account: {account.email}")
+
+
+def init_db(engine: Engine = default_engine):
+    """Create tables, apply migrations and seed the test accounts, under the init lock"""
+    with file_lock(lock_path(str(engine.url))):
+        print("Creating database tables...")
+        Base.metadata.create_all(bind=engine)
+        print("Applying migrations...")
+        for version in migrations.run_migrations(engine):
+            print(f"  ✓ Applied migration {version}")
+        print("Seeding test accounts...")
+        seed_users(engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.manage", description="Todo App management commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init-db", help="create tables, apply migrations, create the test accounts")
+    args = parser.parse_args()
+
+    if args.command == "init-db":
+        started = time.perf_counter()
+        init_db()
+        default_engine.dispose()
+        print(f"Database ready ({time.perf_counter() - started:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
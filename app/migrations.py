@@ -0,0 +1,142 @@
+"""
+Schema migrations.
+Base.metadata.create_all() creates missing tables but never changes existing
+ones, so changes to existing tables (indexes, columns, ...) are added here as
+numbered steps. Each step runs once per database, in order, and is recorded
+in the schema_migrations table.
+
+New databases get the same schema from the models, so every step must be
+safe to run on a database that already has the change (IF NOT EXISTS, ...).
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from typing import Callable, List, Tuple
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = []
+
+
+def migration(version: int, description: str):
+    """Register a migration step"""
+    def decorator(function: Callable[[Connection], None]):
+        MIGRATIONS.append((version, description, function))
+        return function
+    return decorator
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply every step this database hasn't had yet, returns the versions applied"""
+    applied_now = []
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version INTEGER PRIMARY KEY,"
+            " description VARCHAR NOT NULL,"
+            " applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        applied = set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+        for version, description, function in sorted(MIGRATIONS, key=lambda step: step[0]):
+            if version in applied:
+                continue
+            function(connection)
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                {"version": version, "description": description}
+            )
+            applied_now.append(version)
+    return applied_now
+
+
+def pending_migrations(engine: Engine) -> List[int]:
+    """Versions this database hasn't had yet (read-only - all of them for an empty database)"""
+    with engine.connect() as connection:
+        if not inspect(connection).has_table("schema_migrations"):
+            applied = set()
+        else:
+            applied = set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+    return sorted(version for version, _, _ in MIGRATIONS if version not in applied)
+
+
+# ===== MIGRATION STEPS =====
+
+@migration(1, "Composite indexes for per-owner todo listings")
+def add_todo_owner_indexes(connection: Connection):
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_todos_owner_id_id ON todos (owner_id, id)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_todos_owner_id_completed_id ON todos (owner_id, completed, id)"
+    ))
+
+
+@migration(2, "Full-text search index over todo titles and descriptions")
+def add_todo_search_index(connection: Connection):
+    # External-content FTS5 table: it stores only the index, the text stays in
+    # `todos`. The hidden `owner` column holds "u<owner_id>" so a search can be
+    # narrowed to one user inside the index (see crud.search_todos).
+    connection.execute(text(
+        "CREATE VIEW IF NOT EXISTS todos_search_source AS"
+        " SELECT id, title, description, 'u' || owner_id AS owner FROM todos"
+    ))
+    connection.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5("
+        " title, description, owner,"
+        " content='todos_search_source', content_rowid='id', prefix='2 3')"
+    ))
+    # Triggers keep the index in sync with every write, including the Core
+    # bulk statements that never go through the ORM
+    connection.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN"
+        " INSERT INTO todos_fts (rowid, title, description, owner)"
+        " VALUES (new.id, new.title, new.description, 'u' || new.owner_id);"
+        " END"
+    ))
+    connection.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN"
+        " INSERT INTO todos_fts (todos_fts, rowid, title, description, owner)"
+        " VALUES ('delete', old.id, old.title, old.description, 'u' || old.owner_id);"
+        " END"
+    ))
+    # Toggling `completed` doesn't touch the index
+    connection.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title, description, owner_id ON todos BEGIN"
+        " INSERT INTO todos_fts (todos_fts, rowid, title, description, owner)"
+        " VALUES ('delete', old.id, old.title, old.description, 'u' || old.owner_id);"
+        " INSERT INTO todos_fts (rowid, title, description, owner)"
+        " VALUES (new.id, new.title, new.description, 'u' || new.owner_id);"
+        " END"
+    ))
+    # Index the todos that already exist
+    connection.execute(text("INSERT INTO todos_fts (todos_fts) VALUES ('rebuild')"))
+
+
+@migration(3, "Change versions on todos, tombstones for deleted todos")
+def add_todo_versions(connection: Connection):
+    # todo_tombstones and change_counter are new tables, create_all() made them
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(todos)"))}
+    if "version" not in columns:
+        connection.execute(text("ALTER TABLE todos ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+        # SQLite can't add a column with a CURRENT_TIMESTAMP default, so it's backfilled
+        connection.execute(text("ALTER TABLE todos ADD COLUMN updated_at DATETIME"))
+        # IDs are unique, so they make a valid starting version for existing todos
+        connection.execute(text("UPDATE todos SET version = id, updated_at = CURRENT_TIMESTAMP"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_todos_owner_id_version ON todos (owner_id, version)"))
+    connection.execute(text(
+        "INSERT OR IGNORE INTO change_counter (id, version)"
+        " VALUES (1, (SELECT coalesce(max(version), 0) FROM todos))"
+    ))
+
+
+@migration(4, "Per-user todo counts for GET /admin/stats")
+def add_user_todo_stats(connection: Connection):
+    # user_todo_stats is a new table, create_all() made it; count the existing todos
+    connection.execute(text(
+        "INSERT INTO user_todo_stats (owner_id, total, completed)"
+        " SELECT owner_id, count(*), count(CASE WHEN completed THEN 1 END) FROM todos"
+        " WHERE owner_id IS NOT NULL GROUP BY owner_id"
+        " ON CONFLICT (owner_id) DO UPDATE SET total = excluded.total, completed = excluded.completed"
+    ))
+
+
+@migration(5, "Rate-limit buckets shared between workers")
+def add_rate_limit_buckets(connection: Connection):
+    # rate_limit_buckets is a new table, create_all() made it. The step is
+    # recorded so that workers refuse to start on a database without it.
+    pass
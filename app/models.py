@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Index, Text, func
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -12,15 +12,70 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     is_admin = Column(Boolean, default=False)
 
-    todos = relationship("Todo", back_populates="owner")
+    # Never loaded or touched when a user is deleted: crud.delete_users removes
+    # the todos with set-based DELETEs. lazy="raise_on_sql": touching it
+    # without selectinload() raises instead of quietly running a query per user
+    todos = relationship("Todo", back_populates="owner", passive_deletes="all", lazy="raise_on_sql")
 
 class Todo(Base):
     __tablename__ = "todos"
+    __table_args__ = (
+        # Per-owner listings paged by id, with and without the completed filter.
+        # Existing databases get these from migrations.py.
+        Index("ix_todos_owner_id_id", "owner_id", "id"),
+        Index("ix_todos_owner_id_completed_id", "owner_id", "completed", "id"),
+        # Per-owner change feed (GET /todos/changes)
+        Index("ix_todos_owner_id_version", "owner_id", "version"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(Text, default="")
     completed = Column(Boolean, default=False)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    # Set from change_counter on every write, see crud.reserve_versions
+    version = Column(Integer, nullable=False, server_default="0")
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
-    owner = relationship("User", back_populates="todos")
+    # Same as User.todos: load it with joinedload()/selectinload(), or select
+    # the owner's columns with a join (crud.select_todo_rows(include_owner=True))
+    owner = relationship("User", back_populates="todos", lazy="raise_on_sql")
+
+class TodoTombstone(Base):
+    """A deleted todo, so sync clients learn about the delete"""
+    __tablename__ = "todo_tombstones"
+    __table_args__ = (
+        Index("ix_todo_tombstones_owner_id_version", "owner_id", "version"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    todo_id = Column(Integer, nullable=False)
+    owner_id = Column(Integer, nullable=True)
+    version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, server_default=func.now())
+
+class ChangeCounter(Base):
+    """Single row holding the last change version handed out"""
+    __tablename__ = "change_counter"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class UserTodoStats(Base):
+    """A user's todo counts, kept up to date by the crud functions (GET /admin/stats)"""
+    __tablename__ = "user_todo_stats"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+
+class RateLimitBucket(Base):
+    """A token bucket of rate_limit.DatabaseBackend, shared by every worker"""
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # time.time() of the last refill
+    updated_at = Column(Float, nullable=False)
+    # Whether the last request got a token
+    taken = Column(Boolean, nullable=False)
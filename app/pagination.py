@@ -0,0 +1,89 @@
+"""
+Pagination and streaming helpers for list endpoints.
+Lists are paged with a keyset cursor (the last todo ID of the previous page),
+or streamed in full as NDJSON (one JSON object per line).
+"""
+from typing import AsyncIterator, Iterator, Optional, Sequence, Union
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import Row
+from .database import DB_MODE, ReadSessionLocal, AsyncReadSessionLocal
+from . import crud, async_crud, models
+from .serialization import dumps_line
+
+# Largest `limit` a list endpoint accepts. Without a limit, lists return
+# every matching todo (as they did before pagination)
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def set_next_cursor(response: Response, todos: Sequence[Union[models.Todo, Row]], limit: Optional[int]):
+    """
+    Tell the client where the next page starts.
+    A full page means there may be more rows, so the last ID becomes the cursor.
+    Without a limit everything was returned, so there is no next page.
+    """
+    if limit is not None and len(todos) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = str(todos[-1].id)
+
+
+def changes_page(changed: Sequence[Row], deleted: Sequence[Row], since: int, limit: int) -> dict:
+    """
+    Merge changed todos and tombstones (each sorted by version and fetched
+    with limit + 1, so a longer list means there is more) into one page of
+    schemas.TodoChanges with at most `limit` entries.
+    Versions are unique, so the last version on the page is a safe next `since`.
+    """
+    entries = sorted(
+        [(row.version, False, row) for row in changed] + [(row.version, True, row) for row in deleted],
+        key=lambda entry: entry[0]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    keys = changed[0]._fields if changed else ()
+    return {
+        "todos": [dict(zip(keys, row)) for _, is_deleted, row in entries if not is_deleted],
+        "deleted": [{"id": row.id, "version": row.version} for _, is_deleted, row in entries if is_deleted],
+        "version": entries[-1][0] if entries else since,
+        "has_more": has_more,
+    }
+
+
+def todo_to_dict(todo: models.Todo) -> dict:
+    """Same fields as schemas.TodoOut"""
+    return {
+        "id": todo.id,
+        "title": todo.title,
+        "description": todo.description,
+        "completed": todo.completed,
+        "owner_id": todo.owner_id,
+    }
+
+
+def stream_todos(
+    owner_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    completed: Optional[bool] = None
+) -> StreamingResponse:
+    """
+    Stream every matching todo as NDJSON.
+    Uses its own session so the server-side cursor stays open until the
+    last row has been sent, not just until the route function returns. The
+    session comes from the read-only connections (see db_routing).
+    """
+    def generate() -> Iterator[bytes]:
+        db = ReadSessionLocal()
+        try:
+            for todo in crud.iter_todos(db, owner_id=owner_id, cursor=cursor, completed=completed):
+                yield dumps_line(todo_to_dict(todo))
+        finally:
+            db.close()
+
+    async def generate_async() -> AsyncIterator[bytes]:
+        async with AsyncReadSessionLocal() as db:
+            async for todo in async_crud.iter_todos(db, owner_id=owner_id, cursor=cursor, completed=completed):
+                yield dumps_line(todo_to_dict(todo))
+
+    body = generate_async() if DB_MODE == "async" else generate()
+    return StreamingResponse(body, media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,97 @@
+"""
+Server-Sent Events and WebSocket transports for events.py.
+Both subscribe to the connected user's todo events and forward each one as
+a JSON message: {"type": "created" | "updated", "todo": {...}} or
+{"type": "deleted", "id": ...}.
+
+A connection ends when the client goes away, when its access token expires
+(the client reconnects with a fresh one), or when it is evicted for not
+keeping up. The SSE stream sends a comment every EVENT_HEARTBEAT_SECONDS so
+proxies keep idle connections open; WebSocket connections rely on the
+server's protocol-level pings.
+"""
+import asyncio
+import time
+from typing import AsyncIterator, Optional
+from starlette.requests import HTTPConnection
+from starlette.websockets import WebSocket
+from . import auth, events
+from .deps import token_from_connection
+
+SSE_MEDIA_TYPE = "text/event-stream"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# WebSocket close codes
+CLOSE_TOKEN_EXPIRED = 1008  # policy violation
+CLOSE_EVICTED = 1013  # try again later
+
+
+def token_expires_at(connection: HTTPConnection) -> Optional[float]:
+    """When the connection's (already verified) access token expires"""
+    payload = auth.decode_access_token(token_from_connection(connection) or "")
+    return float(payload["exp"]) if payload and "exp" in payload else None
+
+
+def _wait_time(expires_at: Optional[float], heartbeat: Optional[float]) -> Optional[float]:
+    """Seconds until the next heartbeat or the token expiry (None = no limit)"""
+    remaining = None if expires_at is None else max(expires_at - time.time(), 0.0)
+    if heartbeat is None:
+        return remaining
+    return heartbeat if remaining is None else min(heartbeat, remaining)
+
+
+def _expired(expires_at: Optional[float]) -> bool:
+    return expires_at is not None and time.time() >= expires_at
+
+
+async def sse_stream(owner_id: int, expires_at: Optional[float]) -> AsyncIterator[bytes]:
+    """Body of a text/event-stream response (Starlette stops it when the client disconnects)"""
+    subscription = events.subscribe(owner_id)
+    try:
+        # Sent right away so the client knows the stream is open
+        yield b": connected\n\n"
+        while True:
+            event = await subscription.next_event(_wait_time(expires_at, events.EVENT_HEARTBEAT_SECONDS))
+            if event is events.EVICTED:
+                yield b'event: evicted\ndata: {"type": "evicted"}\n\n'
+                return
+            if event is not None:
+                yield b"data: " + event + b"\n\n"
+            elif _expired(expires_at):
+                yield b'event: expired\ndata: {"type": "expired"}\n\n'
+                return
+            else:
+                yield b": ping\n\n"
+    finally:
+        events.unsubscribe(subscription)
+
+
+async def websocket_stream(websocket: WebSocket, owner_id: int, expires_at: Optional[float]):
+    """Forward events to an accepted WebSocket until either side is done"""
+    subscription = events.subscribe(owner_id)
+
+    async def forward_events():
+        while True:
+            event = await subscription.next_event(_wait_time(expires_at, None))
+            if event is events.EVICTED:
+                await websocket.close(code=CLOSE_EVICTED, reason="Too slow, reconnect")
+                return
+            if event is not None:
+                await websocket.send_text(event.decode())
+            elif _expired(expires_at):
+                await websocket.close(code=CLOSE_TOKEN_EXPIRED, reason="Token expired")
+                return
+
+    async def wait_for_disconnect():
+        # Anything the client sends is ignored
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(forward_events()), asyncio.create_task(wait_for_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        events.unsubscribe(subscription)
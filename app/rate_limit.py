@@ -0,0 +1,233 @@
+"""
+Rate limiting for the endpoints that do expensive work per request.
+A failed login costs a full PBKDF2 verify, so a credential-stuffing burst
+could keep every hashing worker busy. Each limited route has token buckets
+keyed by client IP, email and/or user id (see ROUTE_LIMITS); a request
+that finds any of its buckets empty gets a 429 with Retry-After, before
+the user is looked up or a password is hashed.
+
+Buckets live in a backend, chosen by RATE_LIMIT_BACKEND:
+- memory (the default): MemoryBackend keeps them in this process (an LRU of
+  at most RATE_LIMIT_MAX_KEYS buckets, O(1) per request). Each worker then
+  has its own buckets, so with N workers a client gets up to N times the limit
+- database: DatabaseBackend keeps them in the rate_limit_buckets table,
+  shared by every worker (one UPSERT per bucket and request). gunicorn.conf.py
+  picks it when running more than one worker
+Pass another RateLimitBackend to set_backend() to keep them elsewhere (e.g. Redis).
+"""
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+from sqlalchemy import bindparam, case, delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import HTTPConnection
+from . import models
+from .database import engine as default_engine
+
+# Set to 0 to turn rate limiting off
+RATE_LIMITS_ENABLED = os.getenv("RATE_LIMITS_ENABLED", "1") == "1"
+# "memory" (per process) or "database" (shared by every worker), see above
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Buckets kept by MemoryBackend; the least recently used are dropped past this
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+# DatabaseBackend deletes buckets that are full again once every this many requests
+RATE_LIMIT_CLEANUP_INTERVAL = int(os.getenv("RATE_LIMIT_CLEANUP_INTERVAL", 1000))
+
+
+class Limit(NamedTuple):
+    """`burst` requests at once, refilled at `burst` per `per_seconds`"""
+    burst: int
+    per_seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.burst / self.per_seconds
+
+
+def parse_limit(spec: str) -> Optional[Limit]:
+    """'10/60' -> Limit(10, 60.0); '' or '0' -> no limit"""
+    if not spec or spec == "0":
+        return None
+    burst, _, per_seconds = spec.partition("/")
+    return Limit(int(burst), float(per_seconds or 1))
+
+
+def _limit(route: str, key_kind: str, default: str) -> Optional[Limit]:
+    """The limit from RATE_LIMIT_<ROUTE>_<KEY KIND> (e.g. RATE_LIMIT_LOGIN_IP=30/60), or the default"""
+    return parse_limit(os.getenv(f"RATE_LIMIT_{route.upper()}_{key_kind.upper()}", default))
+
+
+# route -> key kind ("ip", "email" or "user") -> limit.
+# /auth/login and /auth/token share the "login" buckets.
+ROUTE_LIMITS: Dict[str, Dict[str, Optional[Limit]]] = {
+    "login": {"ip": _limit("login", "ip", "30/60"), "email": _limit("login", "email", "10/60")},
+    "register": {"ip": _limit("register", "ip", "10/60")},
+    "change_password": {"ip": _limit("change_password", "ip", "30/60"), "user": _limit("change_password", "user", "5/60")},
+}
+
+
+class RateLimited(Exception):
+    """Too many requests - turned into a 429 response"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Too many requests, try again later")
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class RateLimitBackend(ABC):
+    """Where token buckets are kept"""
+
+    @abstractmethod
+    async def take(self, key: str, limit: Limit) -> float:
+        """Take a token from bucket `key`: 0 if there was one, else seconds until there will be"""
+
+    def get_stats(self) -> dict:
+        return {}
+
+
+class MemoryBackend(RateLimitBackend):
+    """
+    Buckets in a dict of key -> (tokens, last refill time), in LRU order.
+    Only used from the event loop, so no lock. A bucket dropped to stay
+    under max_keys comes back full: an idle bucket refills anyway, and the
+    ones in active use are the most recently used.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._evictions = 0
+
+    async def take(self, key: str, limit: Limit) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (limit.burst, now))
+        tokens = min(limit.burst, tokens + (now - updated_at) * limit.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / limit.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self._evictions += 1
+        return wait
+
+    def clear(self):
+        self._buckets.clear()
+
+    def get_stats(self) -> dict:
+        return {"backend": "memory", "buckets": len(self._buckets), "max_buckets": self.max_keys, "evictions": self._evictions}
+
+
+buckets_table = models.RateLimitBucket.__table__
+
+
+def _take_statement():
+    """
+    The bucket's UPSERT: a new bucket starts full minus this request's token;
+    an existing one is refilled for the time since its last request, then
+    gives a token if it has one. The right-hand sides all see the old row,
+    so refilled is computed from the same values everywhere.
+    """
+    now, burst, rate = bindparam("now"), bindparam("burst"), bindparam("rate")
+    refilled = func.min(burst, buckets_table.c.tokens + (now - buckets_table.c.updated_at) * rate)
+    return (
+        sqlite_insert(buckets_table)
+        .values(key=bindparam("key"), tokens=burst - 1, updated_at=now, taken=True)
+        .on_conflict_do_update(index_elements=[buckets_table.c.key], set_={
+            "tokens": case((refilled >= 1, refilled - 1), else_=refilled),
+            "updated_at": now,
+            "taken": refilled >= 1,
+        })
+        .returning(buckets_table.c.tokens, buckets_table.c.taken)
+    )
+
+
+class DatabaseBackend(RateLimitBackend):
+    """
+    Buckets in the rate_limit_buckets table, so every worker (every process
+    using the database) shares them. Each take is one atomic UPSERT ...
+    RETURNING in its own short transaction, run on the threadpool. Buckets
+    idle for longer than the longest limit window are full again, so they
+    are deleted every RATE_LIMIT_CLEANUP_INTERVAL takes.
+    """
+    TAKE = _take_statement()
+
+    def __init__(self, engine: Engine = default_engine, cleanup_interval: int = RATE_LIMIT_CLEANUP_INTERVAL):
+        self.engine = engine
+        self.cleanup_interval = cleanup_interval
+        self._takes = 0
+        self._deleted = 0
+
+    async def take(self, key: str, limit: Limit) -> float:
+        return await run_in_threadpool(self._take, key, limit)
+
+    def _take(self, key: str, limit: Limit) -> float:
+        now = time.time()
+        with self.engine.begin() as connection:
+            tokens, taken = connection.execute(
+                self.TAKE, {"key": key, "now": now, "burst": limit.burst, "rate": limit.rate}
+            ).one()
+            self._takes += 1
+            if self._takes % self.cleanup_interval == 0:
+                self._delete_full(connection, now)
+        return 0.0 if taken else (1 - tokens) / limit.rate
+
+    def _delete_full(self, connection, now: float):
+        """Delete the buckets that have refilled completely (as good as missing)"""
+        windows = [limit.per_seconds for limits in ROUTE_LIMITS.values() for limit in limits.values() if limit]
+        if windows:
+            result = connection.execute(delete(buckets_table).where(buckets_table.c.updated_at < now - max(windows)))
+            self._deleted += result.rowcount
+
+    def get_stats(self) -> dict:
+        return {"backend": "database", "takes": self._takes, "deleted_buckets": self._deleted}
+
+
+_backend: RateLimitBackend = DatabaseBackend() if RATE_LIMIT_BACKEND == "database" else MemoryBackend()
+_stats = {"allowed": 0, "rejected": 0}
+
+
+def set_backend(backend: RateLimitBackend):
+    """Keep buckets somewhere else (call before serving requests)"""
+    global _backend
+    _backend = backend
+
+
+def client_ip(connection: HTTPConnection) -> str:
+    """The client's address (behind a proxy, run uvicorn with --proxy-headers so this is the real client)"""
+    return connection.client.host if connection.client else "unknown"
+
+
+async def check(route: str, connection: HTTPConnection, email: Optional[str] = None, user_id: Optional[int] = None):
+    """
+    Take a token from each of the route's buckets that applies; raise
+    RateLimited if any was empty. Call before doing the expensive work.
+    """
+    if not RATE_LIMITS_ENABLED:
+        return
+    keys = {"ip": client_ip(connection), "email": email.strip().lower() if email else None, "user": user_id}
+    wait = 0.0
+    for key_kind, limit in ROUTE_LIMITS[route].items():
+        if limit is None or keys[key_kind] is None:
+            continue
+        wait = max(wait, await _backend.take(f"{route}:{key_kind}:{keys[key_kind]}", limit))
+    if wait:
+        _stats["rejected"] += 1
+        raise RateLimited(wait)
+    _stats["allowed"] += 1
+
+
+def get_stats() -> dict:
+    """Allowed/rejected counters and the backend's own stats"""
+    return {"enabled": RATE_LIMITS_ENABLED, **_stats, **_backend.get_stats()}
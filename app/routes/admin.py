@@ -2,94 +2,201 @@
 Admin-only endpoints - requires admin privileges.
 These endpoints can only be accessed by users with is_admin=True.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from .. import schemas, crud
-from ..deps import get_db, get_current_admin_user
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from .. import schemas, async_crud, db_routing, events, group_commit, hashing, pagination, rate_limit, todo_cache, token_cache, transfer
+from ..serialization import FastJSONResponse, nest_owners, rows_to_dicts
+from ..deps import DBSession, get_db, get_current_admin_user
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+# Most users one batch request may delete
+MAX_USER_BATCH_SIZE = 1000
+
 
 # ===== ADMIN TODO MANAGEMENT =====
 
-@router.get("/todos", response_model=list[schemas.TodoOut])
-def get_all_todos_from_all_users(
-    db: Session = Depends(get_db),
+@router.get("/todos", response_model=list[schemas.TodoWithOwner])
+@db_routing.read_route
+async def get_all_todos_from_all_users(
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE, description="Page size; without it every matching todo is returned"),
+    cursor: Optional[int] = Query(None, description="Return todos after this ID (from the X-Next-Cursor header)"),
+    completed: Optional[bool] = Query(None, description="Only return completed (true) or open (false) todos"),
+    include: Optional[schemas.TodoInclude] = Query(None, description="owner: add each todo's owner (id, name, email)"),
+    stream: bool = Query(False, description="Stream ALL matching todos as NDJSON instead of one page"),
+    db: DBSession = Depends(get_db),
     current_admin = Depends(get_current_admin_user)
 ):
     """
-    Get ALL todos from ALL users in the system.
+    Get todos from ALL users in the system (ordered by ID).
     Admin only - regular users can only see their own todos.
+    - Without limit, every matching todo is returned
+    - With limit, one page at a time: if there may be more todos, the
+      X-Next-Cursor header holds the next cursor
+    - include=owner adds each todo's owner, joined in the same query (owner
+      is null for a todo without one)
+    - stream=true returns every matching todo as NDJSON (limit and include are ignored)
     """
-    all_todos = crud.list_all_todos(db)
-    return all_todos
+    if stream:
+        return pagination.stream_todos(cursor=cursor, completed=completed)
+
+    # Plain rows encoded with orjson, skipping response_model validation
+    include_owner = include == "owner"
+    rows = await async_crud.list_todo_rows(db, limit=limit, cursor=cursor, completed=completed, include_owner=include_owner)
+    todos = rows_to_dicts(rows)
+    response = FastJSONResponse(nest_owners(todos) if include_owner else todos)
+    pagination.set_next_cursor(response, rows, limit)
+    return response
+
+
+@router.get("/todos/export", response_class=StreamingResponse)
+async def export_all_todos(
+    export_format: transfer.TransferFormat = Query("ndjson", alias="format", description="ndjson (one JSON object per line) or csv"),
+    owner_id: Optional[int] = Query(None, description="Only export this user's todos"),
+    completed: Optional[bool] = Query(None, description="Only export completed (true) or open (false) todos"),
+    current_admin = Depends(get_current_admin_user)
+):
+    """
+    Download the todos of ALL users (or of one), streamed as NDJSON or CSV (ordered by ID).
+    Admin only.
+    """
+    return transfer.export_todos(export_format, owner_id=owner_id, completed=completed)
 
 
 @router.delete("/todos/{todo_id}", status_code=status.HTTP_200_OK)
-def delete_any_users_todo(
+async def delete_any_users_todo(
     todo_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_admin = Depends(get_current_admin_user)
 ):
     """
     Delete any todo from any user.
     Admin only - regular users can only delete their own todos.
     """
-    # Step 1: Find the todo
-    todo = crud.get_todo(db, todo_id)
-    if not todo:
+    # Delete it in one statement (admin can delete any todo)
+    deleted = await async_crud.delete_owned_todo(db, todo_id, owner_id=None)
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Todo not found"
         )
     
-    # Step 2: Delete it (admin can delete any todo)
-    crud.delete_todo(db, todo)
-    
     return {"message": "Todo deleted successfully"}
 
 
 # ===== ADMIN USER MANAGEMENT =====
 
 @router.get("/users", response_model=list[schemas.UserOut])
-def get_all_users(
-    db: Session = Depends(get_db),
+@db_routing.read_route
+async def get_all_users(
+    db: DBSession = Depends(get_db),
     current_admin = Depends(get_current_admin_user)
 ):
     """
     Get a list of ALL users in the system.
     Admin only.
     """
-    all_users = crud.list_users(db)
-    return all_users
+    rows = await async_crud.list_user_rows(db)
+    return FastJSONResponse(rows_to_dicts(rows))
+
+
+# Declared before /users/{user_id} so "batch" isn't taken for an ID.
+@router.delete("/users/batch", response_model=schemas.UserBatchResult)
+async def delete_users_batch(
+    batch: schemas.UserBatchDelete,
+    db: DBSession = Depends(get_db),
+    current_admin = Depends(get_current_admin_user)
+):
+    """
+    Delete many user accounts, and all their todos, in one request.
+    Admin only - cannot include your own account.
+    Users that don't exist are reported as not_found.
+    """
+    if len(batch.ids) > MAX_USER_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"A batch can contain at most {MAX_USER_BATCH_SIZE} users"
+        )
+    if current_admin.id in batch.ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot delete your own account"
+        )
+    deleted_ids = set(await async_crud.delete_users(db, batch.ids))
+    return {"results": [
+        {"id": user_id, "status": "deleted" if user_id in deleted_ids else "not_found"}
+        for user_id in batch.ids
+    ]}
 
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_200_OK)
-def delete_any_user(
+async def delete_any_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_admin = Depends(get_current_admin_user)
 ):
     """
-    Delete any user account from the system.
+    Delete any user account from the system, and all their todos.
     Admin only - but cannot delete your own account (safety check).
     """
-    # Step 1: Find the user
-    user = crud.get_user(db, user_id)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    # Step 2: Prevent admin from deleting themselves
-    if user.id == current_admin.id:
+    # Step 1: Prevent admin from deleting themselves
+    if user_id == current_admin.id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot delete your own account"
         )
     
-    # Step 3: Delete the user
-    crud.delete_user(db, user)
+    # Step 2: Delete the user (no need to load it first)
+    deleted = await async_crud.delete_user_by_id(db, user_id)
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
     
     return {"message": "User deleted successfully"}
+
+
+# ===== ADMIN MONITORING =====
+
+@router.get("/stats", response_model=schemas.TodoStats)
+@db_routing.read_route
+async def get_todo_stats(
+    db: DBSession = Depends(get_db),
+    current_admin = Depends(get_current_admin_user)
+):
+    """
+    Total, completed and open todos for every user, plus overall totals.
+    Read from the per-user counts the todo operations keep up to date, so
+    the cost grows with the number of users, not todos.
+    """
+    users = rows_to_dicts(await async_crud.todo_stats(db))
+    total = sum(user["total"] for user in users)
+    completed = sum(user["completed"] for user in users)
+    return FastJSONResponse({"total": total, "completed": completed, "open": total - completed, "users": users})
+
+
+@router.get("/metrics")
+async def get_metrics(current_admin = Depends(get_current_admin_user)):
+    """
+    Internal counters for monitoring.
+    - hashing: password hashing queue depth, rejections, latency and pool restarts
+    - token_cache: verified-token cache size and hit rate
+    - todo_cache: cached todo list pages, their size in bytes and hit rate
+    - events: open live-update connections, delivered events and evictions
+    - rate_limit: allowed and rejected (429) requests, the bucket backend and its counters
+    - imports: todo imports in progress and totals
+    - group_commit: queued, merged and written todo updates and batch sizes
+    - db_routing: sessions from the read-only connections vs the primary
+    """
+    return {
+        "hashing": hashing.get_stats(),
+        "token_cache": token_cache.get_stats(),
+        "todo_cache": todo_cache.get_stats(),
+        "events": events.get_stats(),
+        "rate_limit": rate_limit.get_stats(),
+        "imports": transfer.get_stats(),
+        "group_commit": group_commit.get_stats(),
+        "db_routing": db_routing.get_stats(),
+    }
@@ -2,29 +2,32 @@
 Authentication endpoints - no login required.
 These are public endpoints for user registration and login.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
 from datetime import timedelta
-from .. import schemas, crud, auth
-from ..deps import get_db
+from .. import schemas, async_crud, auth, hashing, rate_limit
+from ..deps import DBSession, get_db
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/register", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED)
-def register_new_user(
+async def register_new_user(
+    request: Request,
     user_data: schemas.UserCreate,
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_db)
 ):
     """
     Register a new user.
     Required: name, email, password
     Optional: phone_number
     New users are created as regular users (not admin).
+    Limited per client IP (429 with Retry-After).
     """
+    await rate_limit.check("register", request)
+
     # Check if email exists
-    existing_user = crud.get_user_by_email(db, user_data.email)
+    existing_user = await async_crud.get_user_by_email(db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -32,20 +35,22 @@ def register_new_user(
         )
     
     # Step 2: Create new user
-    new_user = crud.create_user(db, user_data, is_admin=False)
+    new_user = await async_crud.create_user(db, user_data, is_admin=False)
     
     return new_user
 
 
 @router.post("/login", response_model=schemas.Token)
-def login_with_email_password(
+async def login_with_email_password(
+    request: Request,
     credentials: schemas.UserLogin,
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_db)
 ):
     """
     Login with email and password (JSON format).
     Returns a JWT access token.
     Use this token in the Authorization header: Bearer <token>
+    Attempts are limited per client IP and per email (429 with Retry-After).
     IN SWAGGER BEARER PARAMETER IS MISSING IF USING OAUTH 
     
     Example:
@@ -54,11 +59,14 @@ def login_with_email_password(
       "password": "string"
     }
     """
+    # Step 0: Throttle before any lookup or password hashing
+    await rate_limit.check("login", request, email=credentials.email)
+
     # Step 1: Find user by email
-    user = crud.get_user_by_email(db, credentials.email)
+    user = await async_crud.get_user_by_email(db, credentials.email)
     
     # Step 2: Verify password
-    if not user or not auth.verify_password(credentials.password, user.hashed_password):
+    if not user or not await hashing.verify_password(credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect email or password"
@@ -78,21 +86,25 @@ def login_with_email_password(
 
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_swagger(
+async def login_for_swagger(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_db)
 ):
     """
     OAuth2 login endpoint for Swagger docs.
     Use the /login endpoint for programming access (JSON).
+    Shares /login's rate limits.
     
     Swagger: click "Authorize", enter your email as 'username' and password.
     """
+    await rate_limit.check("login", request, email=form_data.username)
+
     # Step 1: Find user by email (sends 'username', treat it as email)
-    user = crud.get_user_by_email(db, form_data.username)
+    user = await async_crud.get_user_by_email(db, form_data.username)
     
     # Verify password
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    if not user or not await hashing.verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect email or password"
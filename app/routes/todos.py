@@ -1,15 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from .. import schemas, crud
-from ..deps import get_db, get_current_active_user
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from .. import schemas, async_crud, db_routing, etags, group_commit, pagination, push, todo_cache, transfer
+from ..serialization import FastJSONResponse, rows_to_dicts
+from ..deps import DBSession, authenticate_connection, get_db, get_current_active_user
 
 router = APIRouter(prefix="/todos", tags=["todos"])
 
+# Most todos one batch request may create, update or delete
+MAX_BATCH_SIZE = 1000
+
+
+def check_batch_size(size: int):
+    if size > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"A batch can contain at most {MAX_BATCH_SIZE} todos"
+        )
+
 
 @router.post("/", response_model=schemas.TodoOut, status_code=status.HTTP_201_CREATED)
-def create_new_todo(
+async def create_new_todo(
     todo_data: schemas.TodoCreate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """
@@ -18,7 +31,7 @@ def create_new_todo(
     - Description is optional
     - The todo is automatically assigned to the current user
     """
-    new_todo = crud.create_todo(
+    new_todo = await async_crud.create_todo(
         db=db,
         owner=current_user,
         title=todo_data.title,
@@ -28,52 +41,259 @@ def create_new_todo(
 
 
 @router.get("/", response_model=list[schemas.TodoOut])
-def get_my_todos(
-    db: Session = Depends(get_db),
+@db_routing.read_route
+async def get_my_todos(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE, description="Page size; without it every matching todo is returned"),
+    cursor: Optional[int] = Query(None, description="Return todos after this ID (from the X-Next-Cursor header)"),
+    completed: Optional[bool] = Query(None, description="Only return completed (true) or open (false) todos"),
+    stream: bool = Query(False, description="Stream ALL matching todos as NDJSON instead of one page"),
+    db: DBSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """
-    Get all todos for the current user.
+    Get todos for the current user (ordered by ID).
     Users can only see their own todos.
+    - Without limit, every matching todo is returned
+    - With limit, one page at a time: if there may be more todos, the
+      X-Next-Cursor header holds the next cursor
+    - stream=true returns every matching todo as NDJSON (limit is ignored)
+    - Send the ETag back in If-None-Match to get an empty 304 if nothing changed
+    - Pages that haven't changed since they were last encoded come from a cache (see todo_cache.py)
+    """
+    if stream:
+        return pagination.stream_todos(owner_id=current_user.id, cursor=cursor, completed=completed)
+
+    # Read the version before the rows: if a write lands in between, the ETag
+    # is older than the body and the next poll simply gets a full response
+    list_version = await async_crud.todo_list_version(db, current_user.id)
+    etag = etags.todo_list_etag(current_user.id, list_version, limit, cursor, completed)
+    if etags.is_not_modified(request, etag):
+        return etags.not_modified(etag)
+
+    # Plain rows encoded with orjson, skipping response_model validation -
+    # or the same bytes from the cache, if nothing changed since they were encoded
+    params = (limit, cursor, completed)
+    page = todo_cache.get(current_user.id, params, list_version)
+    if page is None:
+        rows = await async_crud.list_todo_rows(db, owner_id=current_user.id, limit=limit, cursor=cursor, completed=completed)
+        page = todo_cache.encode_page(rows, limit, list_version)
+        todo_cache.put(current_user.id, params, page)
+    response = Response(page.body, media_type=FastJSONResponse.media_type, headers={etags.ETAG_HEADER: etag})
+    if page.next_cursor is not None:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = str(page.next_cursor)
+    return response
+
+
+# ===== LIVE UPDATES =====
+# Declared before the /{todo_id} routes so "stream" isn't taken for an ID.
+# These authenticate themselves (no get_db dependency) so an open connection
+# doesn't hold a database session.
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_my_todo_events(request: Request):
+    """
+    Server-Sent Events: your todos' created / updated / deleted events, as they happen.
+    - Authenticate with the usual Authorization: Bearer header, or ?access_token= (for EventSource)
+    - The stream ends when your token expires - reconnect with a new one
+    - After reconnecting, catch up on missed changes with GET /todos/changes
+    """
+    current_user = await authenticate_connection(request)
+    return StreamingResponse(
+        push.sse_stream(current_user.id, push.token_expires_at(request)),
+        media_type=push.SSE_MEDIA_TYPE,
+        headers=push.SSE_HEADERS
+    )
+
+
+@router.websocket("/ws")
+async def websocket_my_todo_events(websocket: WebSocket):
+    """WebSocket version of GET /todos/stream (same token, same JSON messages)"""
+    try:
+        current_user = await authenticate_connection(websocket)
+    except HTTPException:
+        await websocket.close(code=push.CLOSE_TOKEN_EXPIRED, reason="Invalid authentication credentials")
+        return
+    await websocket.accept()
+    await push.websocket_stream(websocket, current_user.id, push.token_expires_at(websocket))
+
+
+# Declared before the /{todo_id} routes so "changes" isn't taken for an ID.
+@router.get("/changes", response_model=schemas.TodoChanges)
+@db_routing.read_route
+async def get_my_todo_changes(
+    since: int = Query(0, ge=0, description="The `version` from your previous sync (0 = everything)"),
+    limit: int = Query(pagination.MAX_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: DBSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Incremental sync: your todos created, updated or deleted after `since`.
+    - Store the returned `version` and send it as `since` next time
+    - If has_more is true, there are more changes - call again with the new version
     """
-    todos = crud.list_todos_for_user(db, current_user)
-    return todos
+    changed, deleted = await async_crud.list_changes(db, current_user.id, since, limit + 1)
+    return FastJSONResponse(pagination.changes_page(changed, deleted, since, limit))
+
+
+# Declared before the /{todo_id} routes so "search" isn't taken for an ID.
+@router.get("/search", response_model=list[schemas.TodoOut])
+@db_routing.read_route
+async def search_my_todos(
+    q: str = Query(..., min_length=1, description="Words to find in the title or description (prefixes match too)"),
+    limit: int = Query(20, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: DBSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Search your todos by title and description, best match first.
+    - Every word must appear; each word also matches as a prefix ("gro" finds "groceries")
+    - Title matches rank above description matches
+    """
+    rows = await async_crud.search_todos(db, current_user.id, q, limit)
+    return FastJSONResponse(rows_to_dicts(rows))
+
+
+# ===== EXPORT / IMPORT =====
+# Declared before the /{todo_id} routes so "export" isn't taken for an ID.
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_my_todos(
+    export_format: transfer.TransferFormat = Query("ndjson", alias="format", description="ndjson (one JSON object per line) or csv"),
+    completed: Optional[bool] = Query(None, description="Only export completed (true) or open (false) todos"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Download all your todos, streamed as NDJSON or CSV (ordered by ID).
+    The file can be uploaded again with POST /todos/import.
+    """
+    return transfer.export_todos(export_format, owner_id=current_user.id, completed=completed)
+
+
+@router.post(
+    "/import",
+    response_model=schemas.TodoImportResult,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        pagination.NDJSON_MEDIA_TYPE: {"schema": {"type": "string"}},
+        transfer.CSV_MEDIA_TYPE: {"schema": {"type": "string"}},
+    }}}
+)
+async def import_my_todos(
+    request: Request,
+    import_format: Optional[transfer.TransferFormat] = Query(None, alias="format", description="ndjson or csv (default: from the Content-Type, else ndjson)"),
+    db: DBSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Create todos from an uploaded NDJSON or CSV body (not JSON - send the file as is).
+    - NDJSON: one object per line with title, and optionally description and completed
+    - CSV: a header row with a title column (description and completed optional, other columns ignored)
+    - Todos are committed in batches as the upload is read; lines that don't
+      parse are skipped and reported with their line number
+    """
+    if import_format is None:
+        import_format = "csv" if request.headers.get("content-type", "").startswith(transfer.CSV_MEDIA_TYPE) else "ndjson"
+    return await transfer.import_todos(db, current_user.id, request.stream(), import_format)
+
+
+# ===== BULK OPERATIONS =====
+# Declared before the /{todo_id} routes so "batch" isn't taken for an ID.
+
+@router.post("/batch", response_model=schemas.TodoBatchResult, status_code=status.HTTP_201_CREATED)
+async def create_todos_batch(
+    batch: schemas.TodoBatchCreate,
+    db: DBSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Create many todos in one request (and one transaction).
+    Results are in the same order as the submitted todos.
+    """
+    check_batch_size(len(batch.todos))
+    rows = await async_crud.create_todos(db, current_user, batch.todos)
+    return {"results": [{"id": row.id, "status": "created", "todo": row} for row in rows]}
+
+
+@router.patch("/batch", response_model=schemas.TodoBatchResult)
+async def update_todos_batch(
+    batch: schemas.TodoBatchUpdate,
+    db: DBSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Update many todos in one request (and one transaction).
+    - Each item has an id plus the fields to change (title, description, completed)
+    - To complete todos, send {"id": ..., "completed": true} for each
+    - Items with the same id are applied in order (later fields win)
+    - Todos that don't exist or aren't yours are reported as not_found
+    """
+    check_batch_size(len(batch.todos))
+    rows = await async_crud.update_todos(db, current_user, batch.todos)
+    rows_by_id = {row.id: row for row in rows}
+    results = []
+    for item in batch.todos:
+        row = rows_by_id.get(item.id)
+        if row is None:
+            results.append({"id": item.id, "status": "not_found"})
+        else:
+            results.append({"id": item.id, "status": "updated", "todo": row})
+    return {"results": results}
+
+
+@router.delete("/batch", response_model=schemas.TodoBatchResult)
+async def delete_todos_batch(
+    batch: schemas.TodoBatchDelete,
+    db: DBSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Delete many todos in one request (and one transaction).
+    Todos that don't exist or aren't yours are reported as not_found.
+    """
+    check_batch_size(len(batch.ids))
+    deleted_ids = set(await async_crud.delete_todos(db, current_user, batch.ids))
+    return {"results": [
+        {"id": todo_id, "status": "deleted" if todo_id in deleted_ids else "not_found"}
+        for todo_id in batch.ids
+    ]}
 
 
 @router.get("/{todo_id}", response_model=schemas.TodoOut)
-def get_single_todo(
+@db_routing.read_route
+async def get_single_todo(
     todo_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """
     Get a specific todo by ID.
     Users can only access their own todos.
+    Send the ETag back in If-None-Match to get an empty 304 if it hasn't changed.
     """
-    # Step 1: Find the todo
-    todo = crud.get_todo(db, todo_id)
-    
-    # Step 2: Check if it exists and belongs to current user
+    # Find the todo - only if it belongs to the current user
+    todo = await async_crud.get_owned_todo(db, todo_id, current_user.id)
     if not todo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Todo not found"
         )
-    
-    if todo.owner_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Todo not found"
-        )
-    
+
+    etag = etags.todo_etag(todo.id, todo.version)
+    if etags.is_not_modified(request, etag):
+        return etags.not_modified(etag)
+    response.headers[etags.ETAG_HEADER] = etag
     return todo
 
 
 @router.put("/{todo_id}", response_model=schemas.TodoOut)
-def update_existing_todo(
+async def update_existing_todo(
     todo_id: int,
     todo_updates: schemas.TodoUpdate,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """
@@ -81,50 +301,54 @@ def update_existing_todo(
     - You can update title, description, and/or completed status
     - All fields are optional - only provided fields will be changed
     - Users can only update their own todos
+    - With If-Match: <ETag>, the update only applies if nobody changed the todo since (else 412)
     """
-    # Step 1: Find the todo
-    todo = crud.get_todo(db, todo_id)
-    
-    # Step 2: Check ownership
-    if not todo or todo.owner_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Todo not found"
-        )
-    
-    # Step 3: Update the todo
-    updated_todo = crud.update_todo(
-        db=db,
-        todo=todo,
+    expected_version = etags.expected_todo_version(request, todo_id)
+
+    # Update the todo - the ownership (and version) check is part of the same UPDATE
+    changes = dict(
+        todo_id=todo_id,
+        owner_id=current_user.id,
         title=todo_updates.title,
         description=todo_updates.description,
         completed=todo_updates.completed
     )
-    
+    if group_commit.should_queue(expected_version, todo_updates.title, todo_updates.description, todo_updates.completed):
+        # Committed together with the other updates of the next few milliseconds
+        updated_todo = await group_commit.update_todo(**changes)
+    else:
+        updated_todo = await async_crud.update_owned_todo(db=db, expected_version=expected_version, **changes)
+    if not updated_todo:
+        if expected_version is not None and await async_crud.get_owned_todo(db, todo_id, current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Todo has been modified"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Todo not found"
+        )
+
+    response.headers[etags.ETAG_HEADER] = etags.todo_etag(updated_todo.id, updated_todo.version)
     return updated_todo
 
 
 @router.delete("/{todo_id}", status_code=status.HTTP_200_OK)
-def delete_my_todo(
+async def delete_my_todo(
     todo_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """
     Delete a todo item.
     Users can only delete their own todos.
     """
-    # Step 1: Find the todo
-    todo = crud.get_todo(db, todo_id)
-    
-    # Step 2: Check ownership
-    if not todo or todo.owner_id != current_user.id:
+    # Delete it - the ownership check is part of the same DELETE
+    deleted = await async_crud.delete_owned_todo(db, todo_id, current_user.id)
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Todo not found"
         )
     
-    # Step 3: Delete it
-    crud.delete_todo(db, todo)
-    
     return {"message": "Todo deleted successfully"}
@@ -1,24 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from .. import schemas, crud, auth
-from ..deps import get_db, get_current_active_user
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.engine import Row
+from .. import schemas, async_crud, crud, etags, hashing, rate_limit
+from ..serialization import FastJSONResponse
+from ..deps import DBSession, get_db, get_current_active_user, get_current_user_row
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# The UserOut fields, picked from the user's row by GET /users/me
+USER_OUT_FIELDS = [column.key for column in crud.USER_COLUMNS]
+
 
 @router.get("/me", response_model=schemas.UserOut)
-def get_my_profile(current_user = Depends(get_current_active_user)):
+async def get_my_profile(
+    request: Request,
+    current_user: Row = Depends(get_current_user_row)
+):
     """
     Get current user's profile information.
     Returns: name, email, phone_number, is_admin flag
+    Send the ETag back in If-None-Match to get an empty 304 if it hasn't changed.
+    No session and no ORM object: the row from token_cache (or one Core lookup)
+    is encoded straight to JSON.
     """
-    return current_user
+    etag = etags.user_etag(current_user)
+    if etags.is_not_modified(request, etag):
+        return etags.not_modified(etag)
+    profile = {field: current_user._mapping[field] for field in USER_OUT_FIELDS}
+    return FastJSONResponse(profile, headers={etags.ETAG_HEADER: etag})
 
 
 @router.put("/me", response_model=schemas.UserOut)
-def update_my_profile(
+async def update_my_profile(
     profile: schemas.UserProfileUpdate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """
@@ -26,7 +40,7 @@ def update_my_profile(
     You can change: name, phone_number
     You cannot change: email, is_admin, password (use change-password endpoint)
     """
-    updated_user = crud.update_user(
+    updated_user = await async_crud.update_user(
         db=db,
         user=current_user,
         name=profile.name,
@@ -36,23 +50,27 @@ def update_my_profile(
 
 
 @router.post("/me/change-password")
-def change_my_password(
+async def change_my_password(
+    request: Request,
     password_data: schemas.PasswordChange,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """
     Change current user's password.
     Requires: current password (for security verification)
+    Limited per user and per client IP (429 with Retry-After).
     """
+    await rate_limit.check("change_password", request, user_id=current_user.id)
+
     # Step 1: Verify the current password is correct
-    if not auth.verify_password(password_data.current_password, current_user.hashed_password):
+    if not await hashing.verify_password(password_data.current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Step 2: Update to the new password
-    crud.change_password(db, current_user, password_data.new_password)
+    await async_crud.change_password(db, current_user, password_data.new_password)
     
     return {"message": "Password successfully changed"}
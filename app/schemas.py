@@ -1,5 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Literal, Optional
 
 # ===== AUTH SCHEMAS =====
 
@@ -68,3 +69,112 @@ class TodoOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+class TodoOwner(BaseModel):
+    """The owner of a todo, in admin listings with include=owner"""
+    id: int
+    name: str
+    email: EmailStr
+
+class TodoWithOwner(TodoOut):
+    """Todo item with its owner (GET /admin/todos?include=owner)"""
+    owner: Optional[TodoOwner] = None
+
+# What GET /admin/todos can add to each todo
+TodoInclude = Literal["owner"]
+
+
+# ===== BULK TODO SCHEMAS =====
+
+class TodoBatchCreate(BaseModel):
+    """Create many todos at once"""
+    todos: List[TodoCreate]
+
+class TodoBatchUpdateItem(TodoUpdate):
+    """One todo to update - same fields as TodoUpdate plus its ID"""
+    id: int
+
+class TodoBatchUpdate(BaseModel):
+    """Update (or complete) many todos at once"""
+    todos: List[TodoBatchUpdateItem]
+
+class TodoBatchDelete(BaseModel):
+    """Delete many todos at once"""
+    ids: List[int]
+
+class TodoBatchItemResult(BaseModel):
+    """Outcome for one item of a batch: created, updated, deleted or not_found"""
+    id: Optional[int] = None
+    status: str
+    todo: Optional[TodoOut] = None
+
+class TodoBatchResult(BaseModel):
+    """Per-item results, in the same order as the request"""
+    results: List[TodoBatchItemResult]
+
+class TodoImportError(BaseModel):
+    """A line of an import that was skipped"""
+    line: int
+    error: str
+
+class TodoImportResult(BaseModel):
+    """Outcome of an import - failed counts every skipped line, errors lists the first ones"""
+    imported: int
+    failed: int
+    errors: List[TodoImportError]
+    errors_truncated: bool
+
+
+# ===== SYNC SCHEMAS =====
+
+class TodoChange(TodoOut):
+    """A todo created or updated since the client's last sync"""
+    version: int
+    updated_at: Optional[datetime] = None
+
+class TodoDeleted(BaseModel):
+    """A todo deleted since the client's last sync"""
+    id: int
+    version: int
+
+class TodoChanges(BaseModel):
+    """
+    Everything that changed after `since`, in version order.
+    Pass `version` as the next `since`; if has_more is true, ask again right away.
+    """
+    todos: List[TodoChange]
+    deleted: List[TodoDeleted]
+    version: int
+    has_more: bool
+
+
+# ===== ADMIN SCHEMAS =====
+
+class UserTodoStats(BaseModel):
+    """One user's todo counts"""
+    user_id: int
+    name: str
+    email: str
+    total: int
+    completed: int
+    open: int
+
+class UserBatchDelete(BaseModel):
+    """Delete many user accounts at once"""
+    ids: List[int]
+
+class UserBatchItemResult(BaseModel):
+    """Outcome for one user of a batch: deleted or not_found"""
+    id: int
+    status: str
+
+class UserBatchResult(BaseModel):
+    """Per-user results, in the same order as the request"""
+    results: List[UserBatchItemResult]
+
+class TodoStats(BaseModel):
+    """Todo counts for every user, plus the totals over all users"""
+    total: int
+    completed: int
+    open: int
+    users: List[UserTodoStats]
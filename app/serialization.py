@@ -0,0 +1,47 @@
+"""
+Fast JSON responses for list endpoints.
+Returning ORM objects makes FastAPI validate every one into the route's
+response_model (TodoOut / UserOut) and then encode the result again - for a
+page of 1,000 todos that is most of the request's CPU time. The list routes
+instead select only the schema's columns (crud.list_todo_rows /
+list_user_rows) and encode the rows straight to bytes with orjson.
+
+The routes keep their response_model, so the OpenAPI schema is unchanged;
+returning a Response skips the validation step at runtime.
+"""
+from typing import Any, List, Sequence
+import orjson
+from fastapi import Response
+from sqlalchemy.engine import Row
+
+
+class FastJSONResponse(Response):
+    """application/json response encoded with orjson"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def rows_to_dicts(rows: Sequence[Row]) -> List[dict]:
+    """
+    Plain dicts for orjson (it can't encode Row objects directly).
+    zip() with the column names once is several times faster than Row._asdict().
+    """
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def nest_owners(todos: List[dict]) -> List[dict]:
+    """Turn the owner_name/owner_email columns of todo dicts into an "owner" object (TodoWithOwner)"""
+    for todo in todos:
+        name, email = todo.pop("owner_name"), todo.pop("owner_email")
+        todo["owner"] = {"id": todo["owner_id"], "name": name, "email": email} if email is not None else None
+    return todos
+
+
+def dumps_line(content: Any) -> bytes:
+    """One NDJSON line"""
+    return orjson.dumps(content, option=orjson.OPT_APPEND_NEWLINE)
@@ -0,0 +1,199 @@
+"""
+Cache of encoded GET /todos/ pages.
+Most polls of a todo list find it unchanged. The route already reads the
+owner's list version for the ETag; with this cache a client without the
+ETag (or with another page's) gets the page's JSON bytes as they were
+encoded last time, instead of another list query and another encode.
+
+Entries are keyed by owner and query parameters and remember the list
+version they were encoded at. A lookup with a different version is a miss,
+so an entry can never be served after its owner's todos changed - even if
+the write happened on another worker, or landed while the page was being
+loaded. On top of that every crud write to a user's todos calls
+invalidate() after committing, so their entries stop taking up memory
+right away.
+
+Entries live in a backend. MemoryBackend keeps them in this process, as an
+LRU bounded by the bytes it holds (TODO_CACHE_MAX_BYTES). Pass another
+TodoCacheBackend to set_backend() to share pages between workers (e.g. one
+backed by shared memory or Redis). Backends are called from the event loop
+and, in DB_MODE=sync, from threadpool threads (invalidate()), so they must
+be thread-safe and quick.
+"""
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Hashable, NamedTuple, Optional, Sequence, Set, Tuple
+import orjson
+from sqlalchemy.engine import Row
+from .serialization import rows_to_dicts
+
+# Set to 0 to turn the cache off
+TODO_CACHE_ENABLED = os.getenv("TODO_CACHE_ENABLED", "1") == "1"
+# Bytes of encoded pages (plus ENTRY_OVERHEAD_BYTES each) kept by MemoryBackend
+TODO_CACHE_MAX_BYTES = int(os.getenv("TODO_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Rough size of an entry's key, tuple and dict slots, counted with its body
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class CachedPage(NamedTuple):
+    """One encoded page of todos and the owner's list version it was read at"""
+    version: int
+    body: bytes
+    next_cursor: Optional[int]
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + ENTRY_OVERHEAD_BYTES
+
+
+def encode_page(rows: Sequence[Row], limit: Optional[int], version: int) -> CachedPage:
+    """Encode TodoOut rows like FastJSONResponse; a full page has a next cursor (see pagination.set_next_cursor)"""
+    next_cursor = rows[-1].id if limit is not None and len(rows) == limit else None
+    return CachedPage(version, orjson.dumps(rows_to_dicts(rows)), next_cursor)
+
+
+class TodoCacheBackend(ABC):
+    """Where encoded pages are kept"""
+
+    @abstractmethod
+    def get(self, owner_id: int, params: Hashable) -> Optional[CachedPage]:
+        """The page cached for these parameters, or None"""
+
+    @abstractmethod
+    def put(self, owner_id: int, params: Hashable, page: CachedPage):
+        """Cache a page (replacing any page for the same parameters)"""
+
+    @abstractmethod
+    def invalidate(self, owner_id: int) -> int:
+        """Drop every page of an owner, returns how many there were"""
+
+    @abstractmethod
+    def clear(self):
+        """Drop every page"""
+
+    def get_stats(self) -> dict:
+        return {}
+
+
+class MemoryBackend(TodoCacheBackend):
+    """
+    Pages in a dict of (owner id, params) -> page, in LRU order, plus the
+    keys of each owner so invalidate() doesn't scan. Least recently used
+    pages are dropped once the total size passes max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = TODO_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pages: "OrderedDict[Tuple[int, Hashable], CachedPage]" = OrderedDict()
+        self._keys_by_owner: Dict[int, Set[Tuple[int, Hashable]]] = {}
+        self._bytes = 0
+        self._evictions = 0
+
+    def get(self, owner_id: int, params: Hashable) -> Optional[CachedPage]:
+        key = (owner_id, params)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+
+    def put(self, owner_id: int, params: Hashable, page: CachedPage):
+        if page.size > self.max_bytes:
+            return
+        key = (owner_id, params)
+        with self._lock:
+            self._remove(key)
+            self._pages[key] = page
+            self._keys_by_owner.setdefault(owner_id, set()).add(key)
+            self._bytes += page.size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._pages)))
+                self._evictions += 1
+
+    def invalidate(self, owner_id: int) -> int:
+        with self._lock:
+            keys = self._keys_by_owner.pop(owner_id, set())
+            for key in keys:
+                self._bytes -= self._pages.pop(key).size
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._keys_by_owner.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Tuple[int, Hashable]):
+        """Remove one page (caller holds the lock)"""
+        page = self._pages.pop(key, None)
+        if page is None:
+            return
+        self._bytes -= page.size
+        keys = self._keys_by_owner[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_owner[key[0]]
+
+    def get_stats(self) -> dict:
+        return {
+            "entries": len(self._pages),
+            "users": len(self._keys_by_owner),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self._evictions,
+        }
+
+
+_backend: TodoCacheBackend = MemoryBackend()
+_stats = {"hits": 0, "misses": 0, "stale": 0, "invalidations": 0}
+
+
+def set_backend(backend: TodoCacheBackend):
+    """Keep pages somewhere else (call before serving requests)"""
+    global _backend
+    _backend = backend
+
+
+def get(owner_id: int, params: Hashable, version: int) -> Optional[CachedPage]:
+    """The cached page for these query parameters if it was encoded at `version`, else None"""
+    if not TODO_CACHE_ENABLED:
+        return None
+    page = _backend.get(owner_id, params)
+    if page is None or page.version != version:
+        _stats["misses"] += 1
+        if page is not None:
+            _stats["stale"] += 1
+        return None
+    _stats["hits"] += 1
+    return page
+
+
+def put(owner_id: int, params: Hashable, page: CachedPage):
+    """Cache a page read at page.version (replaces an older one)"""
+    if TODO_CACHE_ENABLED:
+        _backend.put(owner_id, params, page)
+
+
+def invalidate(owner_id: Optional[int]):
+    """Drop an owner's pages (their todos changed) - called by crud after every commit that writes todos"""
+    if TODO_CACHE_ENABLED and owner_id is not None and _backend.invalidate(owner_id):
+        _stats["invalidations"] += 1
+
+
+def clear():
+    """Drop everything"""
+    _backend.clear()
+
+
+def get_stats() -> dict:
+    """Hit/miss counters, hit rate and the backend's size in bytes"""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        "enabled": TODO_CACHE_ENABLED,
+        **_stats,
+        "hit_rate": _stats["hits"] / lookups if lookups else 0.0,
+        **_backend.get_stats(),
+    }
@@ -0,0 +1,127 @@
+"""
+Cache of verified access tokens.
+Authenticated requests normally decode the JWT and SELECT the user every time.
+This keeps the result per token (LRU, bounded size) for up to
+TOKEN_CACHE_TTL_SECONDS, never past the token's own expiry.
+
+Entries hold the user's row (crud.USER_BY_ID), not an ORM object: rows are
+immutable, so requests can share them, and deps builds a fresh detached
+models.User from one only where a route needs it. crud.update_user,
+change_password and delete_user call invalidate_user() so the row is never
+stale in this process. Other processes don't hear about it, so with several
+workers a deleted or changed user would stay signed in on the others for up
+to the TTL: gunicorn.conf.py turns the cache off (TOKEN_CACHE_ENABLED=0)
+when it runs more than one worker.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+from sqlalchemy.engine import Row
+
+# Set to 0 to turn the cache off (every request looks the user up)
+TOKEN_CACHE_ENABLED = os.getenv("TOKEN_CACHE_ENABLED", "1") == "1"
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", 60))
+
+_lock = threading.Lock()
+# token -> (expires_at, user row)
+_entries: "OrderedDict[str, tuple]" = OrderedDict()
+# user id -> tokens cached for that user (so invalidate_user is cheap)
+_tokens_by_user: Dict[int, Set[str]] = {}
+# Bumped on every invalidation, see put()
+_generation = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def generation() -> int:
+    """Read this before loading the user from the database, pass it to put()"""
+    return _generation
+
+
+def get(token: str) -> Optional[Row]:
+    """Return the user row of a cached token, or None"""
+    if not TOKEN_CACHE_ENABLED:
+        return None
+    with _lock:
+        entry = _entries.get(token)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        expires_at, row = entry
+        if expires_at <= time.time():
+            _remove(token)
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(token)
+        _stats["hits"] += 1
+        return row
+
+
+def put(token: str, payload: dict, row: Row, seen_generation: int):
+    """
+    Cache a verified token and its user.
+    Skipped if any user was invalidated since `seen_generation` was read,
+    because the user we loaded might already be out of date.
+    """
+    if not TOKEN_CACHE_ENABLED:
+        return
+    expires_at = time.time() + TOKEN_CACHE_TTL_SECONDS
+    if "exp" in payload:
+        expires_at = min(expires_at, float(payload["exp"]))
+
+    with _lock:
+        if seen_generation != _generation:
+            return
+        _remove(token)
+        _entries[token] = (expires_at, row)
+        _tokens_by_user.setdefault(row.id, set()).add(token)
+        while len(_entries) > TOKEN_CACHE_SIZE:
+            _remove(next(iter(_entries)))
+            _stats["evictions"] += 1
+
+
+def invalidate_user(user_id: int):
+    """Drop every cached token of a user (their profile, password or account changed)"""
+    global _generation
+    with _lock:
+        _generation += 1
+        _stats["invalidations"] += 1
+        for token in _tokens_by_user.pop(user_id, set()):
+            _entries.pop(token, None)
+
+
+def clear():
+    """Drop everything"""
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+        _tokens_by_user.clear()
+
+
+def _remove(token: str):
+    """Remove one entry (caller holds the lock)"""
+    entry = _entries.pop(token, None)
+    if entry is None:
+        return
+    user_id = entry[1].id
+    tokens = _tokens_by_user.get(user_id)
+    if tokens is not None:
+        tokens.discard(token)
+        if not tokens:
+            del _tokens_by_user[user_id]
+
+
+def get_stats() -> dict:
+    """Hit/miss counters and current size"""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        "enabled": TOKEN_CACHE_ENABLED,
+        "size": len(_entries),
+        "max_size": TOKEN_CACHE_SIZE,
+        "ttl_seconds": TOKEN_CACHE_TTL_SECONDS,
+        **_stats,
+        "hit_rate": _stats["hits"] / lookups if lookups else 0.0,
+    }
@@ -0,0 +1,264 @@
+"""
+Bulk export and import of todos.
+
+Exports (GET /todos/export, GET /admin/todos/export) stream every matching
+todo as NDJSON or CSV from a server-side cursor. Each batch of
+crud.EXPORT_BATCH_SIZE rows is encoded into one chunk, so memory stays flat
+however many todos there are.
+
+Imports (POST /todos/import) read the request body as it arrives, parse it
+line by line and insert crud.IMPORT_BATCH_SIZE todos per transaction with
+one executemany. Lines that don't parse are skipped and reported with
+their line number; the other lines are imported. Every batch bumps versions,
+updates user_todo_stats and publishes events like any other todo write.
+Imports in progress are listed in GET /admin/metrics.
+"""
+import csv
+import io
+import itertools
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Literal, Optional, Tuple
+import orjson
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import Row
+from .database import DB_MODE, ReadSessionLocal, AsyncReadSessionLocal
+from . import crud, async_crud
+from .pagination import NDJSON_MEDIA_TYPE
+
+CSV_MEDIA_TYPE = "text/csv"
+TransferFormat = Literal["ndjson", "csv"]
+
+# Exported columns (the TodoOut fields); imports use title, description and completed
+EXPORT_FIELDS = ("id", "title", "description", "completed", "owner_id")
+# Line errors listed in an import's result (all of them are counted)
+MAX_IMPORT_ERRORS = 100
+# A line (or CSV record) longer than this aborts the import
+MAX_IMPORT_LINE_BYTES = 1024 * 1024
+
+CSV_TRUE = {"true", "1", "yes"}
+CSV_FALSE = {"false", "0", "no", ""}
+
+_import_ids = itertools.count(1)
+# import id -> progress of the imports running in this process
+_running: Dict[int, dict] = {}
+_stats = {"imports": 0, "imported": 0, "failed_lines": 0}
+
+
+# ===== EXPORT =====
+
+def encode_ndjson(rows: List[Row]) -> bytes:
+    keys = rows[0]._fields
+    return b"".join(orjson.dumps(dict(zip(keys, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+def encode_csv(rows: List[Row]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        (todo_id, title, description or "", "true" if completed else "false", owner_id)
+        for todo_id, title, description, completed, owner_id in rows
+    )
+    return buffer.getvalue().encode()
+
+
+def export_todos(export_format: TransferFormat, owner_id: Optional[int] = None, completed: Optional[bool] = None) -> StreamingResponse:
+    """
+    Stream every matching todo (owner_id None = all users).
+    Uses its own session, like pagination.stream_todos, so the cursor stays
+    open until the last row has been sent.
+    """
+    encode = encode_csv if export_format == "csv" else encode_ndjson
+    header = (",".join(EXPORT_FIELDS) + "\r\n").encode() if export_format == "csv" else b""
+
+    def generate() -> Iterator[bytes]:
+        if header:
+            yield header
+        db = ReadSessionLocal()
+        try:
+            for rows in crud.iter_todo_row_batches(db, owner_id=owner_id, completed=completed):
+                yield encode(rows)
+        finally:
+            db.close()
+
+    async def generate_async() -> AsyncIterator[bytes]:
+        if header:
+            yield header
+        async with AsyncReadSessionLocal() as db:
+            async for rows in async_crud.iter_todo_row_batches(db, owner_id=owner_id, completed=completed):
+                yield encode(rows)
+
+    media_type = CSV_MEDIA_TYPE if export_format == "csv" else NDJSON_MEDIA_TYPE
+    return StreamingResponse(
+        generate_async() if DB_MODE == "async" else generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="todos.{export_format}"'}
+    )
+
+
+# ===== IMPORT =====
+
+def todo_fields(data) -> dict:
+    """The columns of one imported todo, or ValueError saying what's wrong"""
+    if not isinstance(data, dict):
+        raise ValueError("expected an object with a title")
+    title = data.get("title")
+    if not isinstance(title, str):
+        raise ValueError("title is required and must be a string")
+    description = data.get("description")
+    if description is None:
+        description = ""
+    elif not isinstance(description, str):
+        raise ValueError("description must be a string")
+    completed = data.get("completed", False)
+    if isinstance(completed, str):
+        if completed.strip().lower() in CSV_TRUE:
+            completed = True
+        elif completed.strip().lower() in CSV_FALSE:
+            completed = False
+    if not isinstance(completed, bool):
+        raise ValueError("completed must be true or false")
+    return {"title": title, "description": description, "completed": completed}
+
+
+def parse_ndjson(lines: List[Tuple[int, bytes]]) -> Iterator[Tuple[int, object]]:
+    """(line number, todo columns or error message) for each non-empty line"""
+    for number, line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield number, todo_fields(orjson.loads(line))
+        except orjson.JSONDecodeError:
+            yield number, "invalid JSON"
+        except ValueError as exc:
+            yield number, str(exc)
+
+
+class CsvParser:
+    """
+    CSV with a header row (title is required, unknown columns are ignored,
+    so an export imports as is). A quoted field may span lines: a record
+    ends at a line break outside quotes, i.e. once its quotes are balanced.
+    """
+
+    def __init__(self):
+        self.header: Optional[List[str]] = None
+        # Lines of a record that isn't complete yet, and its first line number
+        self.pending: List[bytes] = []
+        self.pending_line = 0
+        self.pending_quotes = 0
+        self.pending_bytes = 0
+
+    def parse(self, lines: List[Tuple[int, bytes]]) -> Iterator[Tuple[int, object]]:
+        records: List[Tuple[int, str]] = []
+        for number, line in lines:
+            if not self.pending:
+                self.pending_line = number
+            self.pending.append(line)
+            self.pending_quotes += line.count(b'"')
+            self.pending_bytes += len(line)
+            if self.pending_bytes > MAX_IMPORT_LINE_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"The record starting on line {self.pending_line} is longer than {MAX_IMPORT_LINE_BYTES} bytes (unclosed quote?)"
+                )
+            if self.pending_quotes % 2 == 0:
+                records.append(self._take_pending())
+        yield from self._parse_records(records)
+
+    def finish(self) -> Iterator[Tuple[int, object]]:
+        """The last record, if the body ended inside quotes"""
+        if self.pending:
+            yield from self._parse_records([self._take_pending()])
+
+    def _take_pending(self) -> Tuple[int, str]:
+        record = (self.pending_line, b"".join(self.pending).decode("utf-8", errors="replace"))
+        self.pending, self.pending_quotes, self.pending_bytes = [], 0, 0
+        return record
+
+    def _parse_records(self, records: List[Tuple[int, str]]) -> Iterator[Tuple[int, object]]:
+        for number, record in records:
+            if not record.strip():
+                continue
+            try:
+                values = next(csv.reader([record], strict=True))
+            except csv.Error as exc:
+                yield number, f"invalid CSV: {exc}"
+                continue
+            if self.header is None:
+                self.header = [name.strip().lower() for name in values]
+                if "title" not in self.header:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The CSV header row must have a title column")
+                continue
+            try:
+                yield number, todo_fields(dict(zip(self.header, values)))
+            except ValueError as exc:
+                yield number, str(exc)
+
+
+async def split_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[Tuple[int, bytes]]]:
+    """The complete lines of each chunk of the body, numbered from 1 (line breaks kept)"""
+    remainder = b""
+    number = 1
+    async for chunk in chunks:
+        lines = (remainder + chunk).splitlines(keepends=True)
+        remainder = lines.pop() if lines and not lines[-1].endswith(b"\n") else b""
+        if len(remainder) > MAX_IMPORT_LINE_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Line {number + len(lines)} is longer than {MAX_IMPORT_LINE_BYTES} bytes"
+            )
+        if lines:
+            yield list(zip(range(number, number + len(lines)), lines))
+            number += len(lines)
+    if remainder:
+        yield [(number, remainder)]
+
+
+async def import_todos(db, owner_id: int, chunks: AsyncIterator[bytes], import_format: TransferFormat) -> dict:
+    """Import the todos in a request body for an owner, see the module docstring"""
+    import_id = next(_import_ids)
+    progress = {"id": import_id, "owner_id": owner_id, "format": import_format, "lines": 0, "imported": 0, "failed": 0, "started": time.time()}
+    errors = []
+    batch: List[dict] = []
+    csv_parser = CsvParser() if import_format == "csv" else None
+    _running[import_id] = progress
+    _stats["imports"] += 1
+
+    def add(parsed: Iterator[Tuple[int, object]]):
+        for number, todo in parsed:
+            if isinstance(todo, dict):
+                batch.append(todo)
+                continue
+            progress["failed"] += 1
+            if len(errors) < MAX_IMPORT_ERRORS:
+                errors.append({"line": number, "error": todo})
+
+    async def flush():
+        progress["imported"] += len(await async_crud.import_todos(db, owner_id, batch))
+        batch.clear()
+
+    try:
+        async for lines in split_lines(chunks):
+            progress["lines"] = lines[-1][0]
+            add(csv_parser.parse(lines) if csv_parser else parse_ndjson(lines))
+            if len(batch) >= crud.IMPORT_BATCH_SIZE:
+                await flush()
+        if csv_parser:
+            add(csv_parser.finish())
+        await flush()
+    finally:
+        del _running[import_id]
+        _stats["imported"] += progress["imported"]
+        _stats["failed_lines"] += progress["failed"]
+
+    return {
+        "imported": progress["imported"],
+        "failed": progress["failed"],
+        "errors": errors,
+        "errors_truncated": progress["failed"] > len(errors),
+    }
+
+
+def get_stats() -> dict:
+    """Imports running now (with their progress) and totals"""
+    return {"running": [dict(progress) for progress in _running.values()], **_stats}
@@ -0,0 +1,63 @@
+"""
+Benchmark: POST /todos/batch with 1,000 todos vs a single POST /todos/.
+
+Runs the app in-process on a fresh database in a temp directory and
+prints the median time of each. Target: the batch costs under 10x one
+single create.
+
+Usage:
+    pip install httpx
+    python benchmarks/batch_todos.py
+    DB_MODE=async python benchmarks/batch_todos.py
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import common  # noqa: F401 - puts the repository root on sys.path
+
+
+def timed(function, repeat: int) -> float:
+    """Median seconds per call"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)  # the app uses ./test.db
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        response = client.post("/auth/login", json={"email": "user@user.com", "password": "user"})
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        batch = {"todos": [{"title": f"todo {i}", "description": "batch"} for i in range(args.batch_size)]}
+
+        def single():
+            assert client.post("/todos/", json={"title": "single"}).status_code == 201
+
+        def bulk():
+            assert client.post("/todos/batch", json=batch).status_code == 201
+
+        single_seconds = timed(single, args.repeat)
+        bulk_seconds = timed(bulk, max(3, args.repeat // 4))
+
+    print(f"single POST /todos/:           {single_seconds * 1000:8.2f} ms")
+    print(f"POST /todos/batch ({args.batch_size} todos): {bulk_seconds * 1000:8.2f} ms")
+    print(f"batch / single:                {bulk_seconds / single_seconds:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
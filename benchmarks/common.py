@@ -0,0 +1,75 @@
+"""
+Helpers shared by the benchmarks and the scripts/ checks: the repository
+root (put on sys.path on import, so `from app import ...` works), a uvicorn
+server on a free port, and logging in.
+
+The benchmarks import it as `common` (their own directory is on sys.path),
+the suite and the scripts as `benchmarks.common`.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode: str, port: int, workdir: str, *uvicorn_args: str) -> subprocess.Popen:
+    """Run uvicorn in `workdir` (so ./test.db is a database of its own) with DB_MODE=mode"""
+    env = dict(os.environ, DB_MODE=mode)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--app-dir", REPO_ROOT,
+         "--port", str(port), "--log-level", "warning", "--no-access-log", *uvicorn_args],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+def wait_until_up(base_url: str, timeout: float = 10):
+    """Wait until the server at base_url answers"""
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{base_url}/docs")
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def rss_mb(pid: int) -> float:
+    """Resident memory of a process (Linux only, 0 elsewhere)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def auth_headers(response) -> dict:
+    """The Authorization header for the token in a POST /auth/login response"""
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def log_in(client, email: str, password: str, **request_options) -> dict:
+    """Log in with a blocking client (TestClient, httpx.Client, Locust's), returns the auth headers"""
+    return auth_headers(client.post("/auth/login", json={"email": email, "password": password}, **request_options))
+
+
+async def async_log_in(client, email: str, password: str) -> dict:
+    """log_in with an httpx.AsyncClient"""
+    return auth_headers(await client.post("/auth/login", json={"email": email, "password": password}))
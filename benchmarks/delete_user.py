@@ -0,0 +1,114 @@
+"""
+Benchmark: deleting a user who owns 500,000 todos.
+
+Fills a fresh database with one user owning --todos todos (plus a second,
+small user), then deletes the big user with crud.delete_user_by_id while
+another process keeps creating todos for the second user. Prints how long
+the delete took, the Python memory it allocated at peak (tracemalloc), and
+the slowest concurrent write - which stays short because the todos are
+deleted in batches of USER_DELETE_BATCH_SIZE, one transaction each.
+Checks that none of the user's todos are left and the other user's are.
+
+Usage:
+    python benchmarks/delete_user.py
+    python benchmarks/delete_user.py --todos 1000000
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+import common  # noqa: F401 - puts the repository root on sys.path
+from app import crud, migrations, models
+from app.database import Base, create_db_engine
+
+
+def fill(engine, total: int):
+    """The big user (id 1) with `total` todos, the other user (id 2) with 10; counts included"""
+    with engine.begin() as connection:
+        connection.execute(crud.users_table.insert(), [
+            {"name": "big", "email": "big@example.com", "hashed_password": "x", "is_admin": False},
+            {"name": "other", "email": "other@example.com", "hashed_password": "x", "is_admin": False},
+        ])
+        batch_size = 50000
+        for start in range(0, total, batch_size):
+            connection.execute(crud.todos_table.insert(), [
+                {"title": f"todo {i}", "description": "something to do", "completed": i % 3 == 0, "owner_id": 1}
+                for i in range(start, min(start + batch_size, total))
+            ])
+        connection.execute(crud.todos_table.insert(), [{"title": f"other {i}", "owner_id": 2} for i in range(10)])
+    # Backfill user_todo_stats like an existing database would have
+    with engine.begin() as connection:
+        migrations.add_user_todo_stats(connection)
+
+
+def keep_writing(url: str, stop, results):
+    """Create a todo for the other user every 10ms; sends back each write's duration (None = failed)"""
+    engine = create_db_engine(url)
+    with sessionmaker(autocommit=False, autoflush=False, bind=engine)() as db:
+        other = crud.get_user(db, 2)
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                crud.create_todo(db, other, "written during the delete")
+                results.put(time.perf_counter() - start)
+            except OperationalError:
+                db.rollback()
+                results.put(None)
+            time.sleep(0.01)
+    results.put("done")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--todos", type=int, default=500000)
+    parser.add_argument("--batch-size", type=int, default=crud.USER_DELETE_BATCH_SIZE, help="todos deleted per transaction")
+    args = parser.parse_args()
+    crud.USER_DELETE_BATCH_SIZE = args.batch_size
+
+    url = f"sqlite:///{tempfile.mkdtemp()}/delete.db"
+    engine = create_db_engine(url)
+    Base.metadata.create_all(bind=engine)
+    migrations.run_migrations(engine)
+    print(f"filling {args.todos} todos...")
+    fill(engine, args.todos)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    stop, results = multiprocessing.Event(), multiprocessing.Queue()
+    writer = multiprocessing.Process(target=keep_writing, args=(url, stop, results))
+    writer.start()
+    time.sleep(1)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        deleted = crud.delete_user_by_id(db, 1)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stop.set()
+    latencies = list(iter(results.get, "done"))
+    writer.join()
+    failed = latencies.count(None)
+    latencies = [latency for latency in latencies if latency is not None]
+
+    with SessionLocal() as db:
+        left = db.execute(select(func.count()).select_from(crud.todos_table).where(crud.todos_table.c.owner_id == 1)).scalar()
+        others = db.execute(select(func.count()).select_from(crud.todos_table).where(crud.todos_table.c.owner_id == 2)).scalar()
+        stats = db.get(models.UserTodoStats, 2)
+    print(f"deleted user: {deleted}, in {seconds:.2f}s ({args.todos / seconds:,.0f} todos/s)")
+    print(f"peak Python memory during the delete: {peak / 1024 / 1024:.1f} MB")
+    print(f"concurrent writes: {len(latencies)}, slowest {max(latencies) * 1000:.0f} ms, failed {failed}")
+    print(f"todos left for the deleted user: {left}; other user: {others} (counted: {stats.total})")
+    engine.dispose()
+    sys.exit(0 if deleted and left == 0 and others == stats.total and not failed else 1)
+
+
+if __name__ == "__main__":
+    main()
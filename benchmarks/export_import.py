@@ -0,0 +1,135 @@
+"""
+Benchmark: exporting and re-importing 1,000,000 todos.
+
+Fills a fresh database with --todos todos for one user, starts the app
+with uvicorn, then for each format downloads them with GET /admin/todos/export and
+uploads that file to POST /todos/import as a second user. Prints the time,
+rows/s and the server's peak memory for each step, and checks that every
+row came back. With DB_PROFILE=production the server's memory includes the
+memory-mapped database file (up to 256 MB); run with DB_PROFILE=legacy to
+see the memory the export and import themselves use.
+
+Usage:
+    pip install httpx
+    python benchmarks/export_import.py
+    python benchmarks/export_import.py --todos 100000 --formats csv --mode async
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from common import free_port, log_in, rss_mb, start_server, wait_until_up
+from app import auth, crud, migrations
+from app.database import Base, create_db_engine
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class PeakMemory:
+    """Samples a process's resident memory in the background, keeps the highest"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak = rss_mb(pid)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(0.05):
+            self.peak = max(self.peak, rss_mb(self.pid))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def fill(url: str, total: int):
+    """A fresh database whose second user (id 2) owns `total` todos (the admin logs in with "benchmark")"""
+    engine = create_db_engine(url)
+    Base.metadata.create_all(bind=engine)
+    migrations.run_migrations(engine)
+    with engine.begin() as connection:
+        connection.execute(crud.users_table.insert(), [
+            {"name": "Admin", "email": "admin@admin.com", "hashed_password": auth.get_password_hash("benchmark"), "is_admin": True},
+            {"name": "Exporter", "email": "user@user.com", "hashed_password": "x", "is_admin": False},
+        ])
+        batch_size = 50000
+        for start in range(0, total, batch_size):
+            connection.execute(crud.todos_table.insert(), [
+                {"title": f"todo {i}", "description": f"something to do, \"item\" {i}", "completed": i % 3 == 0, "owner_id": 2}
+                for i in range(start, min(start + batch_size, total))
+            ])
+        migrations.add_user_todo_stats(connection)
+    engine.dispose()
+
+
+def account(client: httpx.Client, email: str) -> dict:
+    """Log in with the password "benchmark" (registering first if needed), returns the auth headers"""
+    client.post("/auth/register", json={"name": "Bench", "email": email, "password": "benchmark"})
+    return log_in(client, email, "benchmark")
+
+
+def upload(path: str):
+    with open(path, "rb") as upload_file:
+        while chunk := upload_file.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--todos", type=int, default=1000000)
+    parser.add_argument("--formats", nargs="+", default=["ndjson", "csv"], choices=["ndjson", "csv"])
+    parser.add_argument("--mode", default="sync", choices=["sync", "async"])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    print(f"filling {args.todos} todos...")
+    fill(f"sqlite:///{workdir}/test.db", args.todos)
+    port = free_port()
+    server = start_server(args.mode, port, workdir)
+    ok = True
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}")
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=600) as client:
+            admin = account(client, "admin@admin.com")
+            print(f"server memory at rest: {rss_mb(server.pid):.0f} MB   (DB_MODE={args.mode})")
+            for export_format in args.formats:
+                path = os.path.join(workdir, f"todos.{export_format}")
+                started = time.perf_counter()
+                with PeakMemory(server.pid) as memory, open(path, "wb") as export_file:
+                    with client.stream("GET", "/admin/todos/export", params={"format": export_format, "owner_id": 2},
+                                       headers=admin) as response:
+                        response.raise_for_status()
+                        for chunk in response.iter_bytes():
+                            export_file.write(chunk)
+                seconds = time.perf_counter() - started
+                print(f"export {export_format:<6} {args.todos:>9} rows in {seconds:6.2f}s "
+                      f"({args.todos / seconds:>9,.0f} rows/s, {os.path.getsize(path) / 1e6:.0f} MB), server peak {memory.peak:.0f} MB")
+
+                importer = account(client, f"importer-{export_format}@bench.example")
+                started = time.perf_counter()
+                with PeakMemory(server.pid) as memory:
+                    response = client.post("/todos/import", params={"format": export_format}, content=upload(path), headers=importer)
+                    response.raise_for_status()
+                seconds = time.perf_counter() - started
+                result = response.json()
+                print(f"import {export_format:<6} {result['imported']:>9} rows in {seconds:6.2f}s "
+                      f"({result['imported'] / seconds:>9,.0f} rows/s, {result['failed']} failed), server peak {memory.peak:.0f} MB")
+                ok = ok and result["imported"] == args.todos and not result["failed"]
+    finally:
+        server.terminate()
+        server.wait()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
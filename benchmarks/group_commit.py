@@ -0,0 +1,135 @@
+"""
+Benchmark: PUT /todos/{id} toggles with per-request commits vs group commit.
+
+Runs the app in-process (httpx's ASGI transport, no sockets, so the load
+generator costs little CPU next to the app) on a fresh database, once with
+GROUP_COMMIT_ENABLED=0 and once with GROUP_COMMIT_ENABLED=1, each in its own
+subprocess. N concurrent clients toggle `completed` on random todos among
+--todos as fast as they can. Prints acknowledged updates/s, latency and the
+number of commits, then checks that the user's completed count still
+matches their todos.
+
+--db-profile legacy runs SQLite with its defaults (rollback journal,
+synchronous=FULL: every commit waits for the disk), production with WAL and
+synchronous=NORMAL (commits don't sync, but still take the write lock in turn).
+
+Usage:
+    pip install httpx
+    python benchmarks/group_commit.py
+    python benchmarks/group_commit.py --clients 10 100 --todos 10 --db-profile legacy --mode async
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import log_in
+
+
+async def run_load(client, headers: dict, todo_ids: list, clients: int, duration: float) -> dict:
+    """`clients` workers each send toggles back-to-back for `duration` seconds"""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(seed: int):
+        nonlocal errors
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.put(f"/todos/{rng.choice(todo_ids)}", json={"completed": rng.random() < 0.5}, headers=headers)
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(seed) for seed in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    percentile = lambda fraction: latencies[max(0, int(len(latencies) * fraction) - 1)] * 1000 if latencies else float("nan")
+    return {"ups": len(latencies) / elapsed, "p50_ms": percentile(0.5), "p99_ms": percentile(0.99), "errors": errors}
+
+
+def run_one(args):
+    """One configuration, in this process (the settings are in the environment); prints the results as JSON"""
+    os.chdir(tempfile.mkdtemp())  # the app uses ./test.db
+    import httpx
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    results = {}
+    # TestClient runs the lifespan (and starts the writer); the load goes
+    # through an async client on the same event loop
+    with TestClient(app) as client:
+        headers = log_in(client, "user@user.com", "user")
+        admin = log_in(client, "admin@admin.com", "admin")
+        response = client.post("/todos/batch", json={"todos": [{"title": f"todo {i}"} for i in range(args.todos)]}, headers=headers)
+        todo_ids = [result["id"] for result in response.json()["results"]]
+
+        async def load(clients: int) -> dict:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as async_client:
+                return await run_load(async_client, headers, todo_ids, clients, args.duration)
+
+        for clients in args.clients:
+            before = client.get("/admin/metrics", headers=admin).json()["group_commit"]["batches"]
+            result = client.portal.call(load, clients)
+            after = client.get("/admin/metrics", headers=admin).json()["group_commit"]["batches"]
+            result["commits"] = after - before
+            results[clients] = result
+
+        todos = client.get("/todos/", params={"limit": 1000}, headers=headers).json()
+        stats = client.get("/admin/stats", headers=admin).json()
+        counted = next(user["completed"] for user in stats["users"] if user["email"] == "user@user.com")
+        results["consistent"] = counted == sum(1 for todo in todos if todo["completed"])
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    parser.add_argument("--todos", type=int, default=100, help="todos the clients toggle at random")
+    parser.add_argument("--mode", default="sync", choices=["sync", "async"])
+    parser.add_argument("--db-profile", default="production", choices=["production", "legacy"])
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_one:
+        run_one(args)
+        return
+
+    print(f"DB_MODE={args.mode} DB_PROFILE={args.db_profile}, {args.todos} todos")
+    print(f"{'writes':<10} {'clients':>7} {'updates/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'commits':>8} {'errors':>7}")
+    ok = True
+    for group_commit in (False, True):
+        env = dict(
+            os.environ,
+            GROUP_COMMIT_ENABLED="1" if group_commit else "0",
+            DB_MODE=args.mode,
+            DB_PROFILE=args.db_profile,
+        )
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-one", *sys.argv[1:]],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        results = json.loads(output.strip().splitlines()[-1])
+        label = "grouped" if group_commit else "direct"
+        for clients in args.clients:
+            result = results[str(clients)]
+            commits = result["commits"] if group_commit else "-"
+            print(f"{label:<10} {clients:>7} {result['ups']:>10.1f} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                  f"{commits:>8} {result['errors']:>7}", flush=True)
+            ok = ok and not result["errors"]
+        if not results["consistent"]:
+            print(f"{label}: the completed count doesn't match the todos")
+            ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: per-request cost of finding the caller (get_current_user) and
+answering GET /users/me.
+
+Compares, in the same app and database:
+- session: the previous path, rebuilt here as a route - get_db opens an ORM
+           Session, the user is loaded as a models.User into its identity
+           map and returned through response_model=UserOut
+- core:    the current path - no Session: the user's row comes from the
+           token cache or from one cached Core select on a pooled connection
+           (crud.USER_BY_ID) and is encoded straight to JSON
+
+Each is measured with the token cache on (the usual case: the user is only
+looked up once a minute per token) and off (every request looks the user up).
+Also times the lookup alone, without HTTP. The app runs in-process (httpx's
+ASGI transport), once per database mode in its own subprocess. Prints the
+median microseconds per request.
+
+Usage:
+    pip install httpx
+    python benchmarks/identity.py
+    python benchmarks/identity.py --requests 5000 --modes async
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import log_in
+
+
+async def median_us(call, repeat: int) -> float:
+    """Median microseconds per awaited call, after a short warm-up"""
+    for _ in range(min(repeat, 100)):
+        await call()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def run_one(args):
+    """Both paths in this process (DB_MODE is in the environment); prints the results as JSON"""
+    os.chdir(tempfile.mkdtemp())  # the app uses ./test.db
+    import httpx
+    from fastapi import Depends, Response
+    from fastapi.testclient import TestClient
+    from app import async_crud, auth, deps, etags, schemas, token_cache
+    from app.main import app
+    from app.routes.users import USER_OUT_FIELDS
+    from app.serialization import FastJSONResponse
+
+    async def session_current_user(token: str = Depends(deps.oauth2_scheme), db: deps.DBSession = Depends(deps.get_db)):
+        """get_current_user as it was: a session for every request, the user loaded into it as an ORM object"""
+        row = token_cache.get(token)
+        if row is not None:
+            # The cache used to hand out a detached models.User too
+            return deps.user_from_row(row)
+        payload = auth.decode_access_token(token)
+        return await async_crud.get_user(db, int(payload["sub"]))
+
+    async def session_profile(response: Response, current_user=Depends(session_current_user)):
+        response.headers[etags.ETAG_HEADER] = etags.user_etag(current_user)
+        return current_user
+
+    app.router.add_api_route("/bench/users/me", session_profile, response_model=schemas.UserOut)
+
+    with TestClient(app) as client:
+        headers = log_in(client, "user@user.com", "user")
+        user_id = client.get("/users/me", headers=headers).json()["id"]
+        assert client.get("/bench/users/me", headers=headers).json() == client.get("/users/me", headers=headers).json()
+
+        async def session_lookup():
+            async with deps.db_session() as db:
+                user = await async_crud.get_user(db, user_id)
+                return schemas.UserOut.model_validate(user, from_attributes=True).model_dump_json()
+
+        async def core_lookup():
+            row = await deps._get_user_row(user_id)
+            return FastJSONResponse({field: row._mapping[field] for field in USER_OUT_FIELDS}).body
+
+        async def measure() -> dict:
+            measured = {
+                "lookup": {
+                    "session": await median_us(session_lookup, args.requests),
+                    "core": await median_us(core_lookup, args.requests),
+                }
+            }
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as async_client:
+                for cache, ttl in (("cache hit", token_cache.TOKEN_CACHE_TTL_SECONDS), ("cache miss", 0)):
+                    token_cache.TOKEN_CACHE_TTL_SECONDS = ttl
+                    token_cache.clear()
+                    await async_client.get("/users/me", headers=headers)  # caches the token (unless ttl is 0)
+                    measured[cache] = {
+                        "session": await median_us(lambda: async_client.get("/bench/users/me", headers=headers), args.requests),
+                        "core": await median_us(lambda: async_client.get("/users/me", headers=headers), args.requests),
+                    }
+            return measured
+
+        results = client.portal.call(measure)
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="timed calls per path and case")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_one:
+        run_one(args)
+        return
+
+    print(f"{'DB_MODE':<8} {'case':<20} {'session us':>11} {'core us':>9} {'speedup':>8}")
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-one", "--requests", str(args.requests)],
+            env=dict(os.environ, DB_MODE=mode), check=True, capture_output=True, text=True,
+        ).stdout
+        results = json.loads(output.strip().splitlines()[-1])
+        for case, label in (("lookup", "lookup only"), ("cache hit", "/users/me cache hit"), ("cache miss", "/users/me cache miss")):
+            session, core = results[case]["session"], results[case]["core"]
+            print(f"{mode:<8} {label:<20} {session:>11.0f} {core:>9.0f} {session / core:>7.1f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Test: hold 5,000 idle live-update connections on one worker.
+
+Starts the app with uvicorn (one worker, fresh database in a temp
+directory), opens --connections GET /todos/stream (SSE) or /todos/ws
+(WebSocket) connections as the seeded test user, keeps them idle for
+--hold seconds, then creates one todo and checks that every connection
+receives the event. Prints the server's memory use and the fan-out
+latency, and exits with status 1 if any connection failed or missed the
+event.
+
+Usage:
+    pip install httpx
+    python benchmarks/idle_connections.py
+    python benchmarks/idle_connections.py --kind ws --connections 5000
+"""
+import argparse
+import asyncio
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from common import async_log_in, free_port, rss_mb, start_server, wait_until_up
+
+
+class SSEConnection:
+    """A bare-bones SSE client on a raw socket - cheap enough to open thousands"""
+
+    def __init__(self, port: int, token: str):
+        self.port = port
+        self.token = token
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        self.writer.write(
+            f"GET /todos/stream HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {self.token}\r\n"
+            "Accept: text/event-stream\r\n\r\n".encode()
+        )
+        status_line = await self.reader.readline()
+        if b" 200 " not in status_line:
+            raise RuntimeError(status_line.decode().strip())
+        await self.reader.readuntil(b": connected\n\n")
+
+    async def next_event(self) -> bytes:
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                raise ConnectionError("stream closed")
+            if line.startswith(b"data: "):
+                return line
+
+    async def close(self):
+        self.writer.close()
+
+
+class WebSocketConnection:
+    def __init__(self, port: int, token: str):
+        self.url = f"ws://127.0.0.1:{port}/todos/ws?access_token={token}"
+
+    async def open(self):
+        import websockets
+        self.websocket = await websockets.connect(self.url, ping_interval=None)
+
+    async def next_event(self) -> str:
+        return await self.websocket.recv()
+
+    async def close(self):
+        await self.websocket.close()
+
+
+async def run(args, port: int, server: subprocess.Popen) -> bool:
+    base_url = f"http://127.0.0.1:{port}"
+    wait_until_up(base_url)
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        headers = await async_log_in(client, "user@user.com", "user")
+        token = headers["Authorization"].removeprefix("Bearer ")
+        idle_rss = rss_mb(server.pid)
+
+        connection_class = SSEConnection if args.kind == "sse" else WebSocketConnection
+        connections = [connection_class(port, token) for _ in range(args.connections)]
+        started = time.perf_counter()
+        failures = 0
+        for batch_start in range(0, len(connections), args.batch):
+            batch = connections[batch_start:batch_start + args.batch]
+            results = await asyncio.gather(*(connection.open() for connection in batch), return_exceptions=True)
+            failures += sum(isinstance(result, Exception) for result in results)
+        open_seconds = time.perf_counter() - started
+        print(f"opened {len(connections) - failures}/{len(connections)} {args.kind} connections in {open_seconds:.1f}s")
+        if failures:
+            return False
+
+        await asyncio.sleep(args.hold)
+        print(f"server memory: {idle_rss:.0f} MB before, {rss_mb(server.pid):.0f} MB holding the connections")
+        metrics = (await client.get("/admin/metrics", headers=await async_log_in(client, "admin@admin.com", "admin"))).json()
+        print(f"server reports {metrics['events']['connections']} connections")
+
+        async def receive(connection) -> float:
+            await asyncio.wait_for(connection.next_event(), args.timeout)
+            return time.perf_counter()
+
+        receivers = [asyncio.create_task(receive(connection)) for connection in connections]
+        sent = time.perf_counter()
+        await client.post("/todos/", json={"title": "fan-out"}, headers=headers)
+        results = await asyncio.gather(*receivers, return_exceptions=True)
+        latencies = sorted((result - sent) * 1000 for result in results if isinstance(result, float))
+        missed = len(results) - len(latencies)
+        print(f"event delivered to {len(latencies)}/{len(connections)} connections")
+        if latencies:
+            print(f"fan-out latency: p50 {statistics.median(latencies):.0f} ms, max {latencies[-1]:.0f} ms")
+        await asyncio.gather(*(connection.close() for connection in connections), return_exceptions=True)
+        return missed == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--kind", choices=["sse", "ws"], default="sse")
+    parser.add_argument("--mode", choices=["sync", "async"], default="async")
+    parser.add_argument("--hold", type=float, default=5, help="seconds to keep the connections idle")
+    parser.add_argument("--batch", type=int, default=500, help="connections opened at the same time")
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    # Each connection needs a file descriptor here and one in the server
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.connections * 2 + 100)), hard))
+
+    port = free_port()
+    workdir = tempfile.mkdtemp()
+    server = start_server(args.mode, port, workdir, "--backlog", "8192")
+    try:
+        ok = asyncio.run(run(args, port, server))
+    finally:
+        server.terminate()
+        server.wait()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Load test: sync vs async database mode.
+
+Starts the app with uvicorn once per DB_MODE (on a fresh database in a temp
+directory), then hammers GET /todos/ with N concurrent clients and reports
+requests/sec and p99 latency.
+
+Usage:
+    pip install httpx
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --clients 50 200 --duration 5
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+import httpx
+
+from common import async_log_in, free_port, start_server, wait_until_up
+
+
+async def login_and_seed(base_url: str, todos: int) -> dict:
+    """Log in as the seeded test user and give them some todos to list"""
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        headers = await async_log_in(client, "user@user.com", "user")
+        for i in range(todos):
+            await client.post("/todos/", json={"title": f"todo {i}"}, headers=headers)
+    return headers
+
+
+async def run_load(base_url: str, headers: dict, clients: int, duration: float) -> dict:
+    """`clients` workers each send GET /todos/ back-to-back for `duration` seconds"""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get("/todos/")
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else float("nan")
+    return {"rps": len(latencies) / elapsed, "p99_ms": p99 * 1000, "errors": errors}
+
+
+async def benchmark_mode(mode: str, client_counts: list, duration: float, todos: int) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as workdir:
+        server = start_server(mode, port, workdir)
+        try:
+            wait_until_up(base_url)
+            headers = await login_and_seed(base_url, todos)
+            return {n: await run_load(base_url, headers, n, duration) for n in client_counts}
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    parser.add_argument("--todos", type=int, default=20, help="todos in the listed user's account")
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'clients':>7} {'req/s':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode in args.modes:
+        results = asyncio.run(benchmark_mode(mode, args.clients, args.duration, args.todos))
+        for clients, result in results.items():
+            print(f"{mode:<6} {clients:>7} {result['rps']:>9.1f} {result['p99_ms']:>9.1f} {result['errors']:>7}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: GET /todos/search (FTS5) vs a LIKE scan, as the table grows.
+
+For each size, fills a fresh database with random todos spread over
+--users owners, then times crud.search_todos against the equivalent
+owner-scoped `title LIKE '%word%' OR description LIKE '%word%'` query,
+using random prefixes of vocabulary words. Prints the median latency.
+
+Usage:
+    python benchmarks/search.py
+    python benchmarks/search.py --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import sessionmaker
+import common  # noqa: F401 - puts the repository root on sys.path
+from app import crud, migrations
+from app.database import Base, create_db_engine
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list:
+    return sorted({"".join(rng.choice(LETTERS) for _ in range(rng.randint(5, 10))) for _ in range(size)})
+
+
+def fill(engine, total: int, users: int, vocabulary: list, rng: random.Random):
+    """Insert users and todos in large executemany batches (the triggers index them)"""
+    with engine.begin() as connection:
+        connection.execute(crud.users_table.insert(), [
+            {"name": f"user {i}", "email": f"user{i}@example.com", "hashed_password": "x", "is_admin": False}
+            for i in range(users)
+        ])
+        batch_size = 50000
+        for start in range(0, total, batch_size):
+            connection.execute(crud.todos_table.insert(), [
+                {
+                    "title": " ".join(rng.sample(vocabulary, 3)),
+                    "description": " ".join(rng.sample(vocabulary, 8)),
+                    "completed": False,
+                    "owner_id": rng.randint(1, users),
+                }
+                for _ in range(start, min(start + batch_size, total))
+            ])
+
+
+def like_search(db, owner_id: int, word: str, limit: int):
+    """What search would cost without the index"""
+    todos = crud.todos_table
+    pattern = f"%{word}%"
+    return db.execute(
+        select(*crud.TODO_COLUMNS)
+        .where(todos.c.owner_id == owner_id, or_(todos.c.title.like(pattern), todos.c.description.like(pattern)))
+        .order_by(todos.c.id)
+        .limit(limit)
+    ).all()
+
+
+def median_ms(function, queries: list) -> float:
+    samples = []
+    for owner_id, word in queries:
+        start = time.perf_counter()
+        function(owner_id, word)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated todo counts")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    print(f"{'todos':>10} {'fts5 ms':>10} {'like ms':>10}")
+    for total in (int(size) for size in args.sizes.split(",")):
+        engine = create_db_engine(f"sqlite:///{tempfile.mkdtemp()}/search.db")
+        Base.metadata.create_all(bind=engine)
+        migrations.run_migrations(engine)
+        fill(engine, total, args.users, vocabulary, rng)
+
+        queries = [(rng.randint(1, args.users), rng.choice(vocabulary)[:4]) for _ in range(args.queries)]
+        with sessionmaker(bind=engine)() as db:
+            fts_ms = median_ms(lambda owner_id, word: crud.search_todos(db, owner_id, word, args.limit), queries)
+            like_ms = median_ms(lambda owner_id, word: like_search(db, owner_id, word, args.limit), queries)
+        engine.dispose()
+        print(f"{total:>10} {fts_ms:>10.2f} {like_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: encoding a 10,000-todo list response.
+
+Compares, on the same SQLite data:
+- orm:  ORM objects returned through response_model=list[TodoOut]
+        (the old GET /todos/ path - FastAPI validates every object)
+- fast: crud.list_todo_rows + FastJSONResponse (the current path - TodoOut
+        columns only, encoded with orjson)
+
+Both run as real FastAPI routes called in-process, so the numbers include
+the query, validation and encoding. Prints the median time per request and
+per row.
+
+Usage:
+    pip install httpx
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --rows 50000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import common  # noqa: F401 - puts the repository root on sys.path
+
+
+def timed(function, repeat: int) -> float:
+    """Median seconds per call"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from fastapi import Depends, FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import sessionmaker
+    from app import crud, models, schemas
+    from app.database import Base, create_db_engine
+    from app.serialization import FastJSONResponse, rows_to_dicts
+
+    engine = create_db_engine(f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        owner = crud.add_user(db, schemas.UserCreate(name="Owner", email="owner@example.com", password="x"), "hash")
+        crud.create_todos(db, owner, [
+            schemas.TodoCreate(title=f"todo {i}", description="benchmark row") for i in range(args.rows)
+        ])
+        owner_id = owner.id
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+
+    @app.get("/orm", response_model=list[schemas.TodoOut])
+    def orm_path(db=Depends(get_db)):
+        return db.query(models.Todo).filter(models.Todo.owner_id == owner_id).order_by(models.Todo.id).all()
+
+    @app.get("/fast", response_model=list[schemas.TodoOut])
+    def fast_path(db=Depends(get_db)):
+        return FastJSONResponse(rows_to_dicts(crud.list_todo_rows(db, owner_id=owner_id)))
+
+    with TestClient(app) as client:
+        assert client.get("/orm").json() == client.get("/fast").json()
+        results = {
+            path: timed(lambda: client.get(path).raise_for_status(), args.repeat)
+            for path in ("/orm", "/fast")
+        }
+
+    print(f"{args.rows} todos per response")
+    for path, seconds in results.items():
+        print(f"{path:6} {seconds * 1000:8.2f} ms/request  {seconds / args.rows * 1e6:6.2f} us/row")
+    print(f"speedup: {results['/orm'] / results['/fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: mixed read/write throughput for each SQLite engine profile.
+
+For every profile in app.database.ENGINE_PROFILES, creates a fresh database,
+seeds users and todos, then runs worker threads for a fixed time. Each
+operation is a read (crud.list_todo_rows, one page) or, with
+probability --write-ratio, a write (crud.create_todo, one commit).
+
+Usage:
+    python benchmarks/sqlite_profiles.py
+    python benchmarks/sqlite_profiles.py --threads 16 --write-ratio 0.5
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+import common  # noqa: F401 - puts the repository root on sys.path
+from app import crud, models
+from app.database import Base, ENGINE_PROFILES, create_db_engine
+
+
+def seed(SessionLocal, users: int, todos_per_user: int) -> list:
+    db = SessionLocal()
+    try:
+        owners = [
+            models.User(name=f"user {i}", email=f"user{i}@example.com", hashed_password="x")
+            for i in range(users)
+        ]
+        db.add_all(owners)
+        db.flush()
+        db.add_all(
+            models.Todo(title=f"todo {j}", description="", owner_id=owner.id)
+            for owner in owners for j in range(todos_per_user)
+        )
+        db.commit()
+        return [owner.id for owner in owners]
+    finally:
+        db.close()
+
+
+def run_profile(profile: str, args) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_db_engine(f"sqlite:///{workdir}/bench.db", profile)
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        owner_ids = seed(SessionLocal, args.users, args.todos)
+
+        deadline = time.perf_counter() + args.duration
+        reads, writes, errors, latencies = [0], [0], [0], []
+        lock = threading.Lock()
+
+        def worker(seed_value: int):
+            rng = random.Random(seed_value)
+            while time.perf_counter() < deadline:
+                owner = models.User(id=rng.choice(owner_ids))
+                is_write = rng.random() < args.write_ratio
+                start = time.perf_counter()
+                db = SessionLocal()
+                try:
+                    if is_write:
+                        crud.create_todo(db, owner, "benchmark")
+                    else:
+                        crud.list_todo_rows(db, owner_id=owner.id, limit=50)
+                    ok = True
+                except Exception:
+                    ok = False
+                finally:
+                    db.close()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if not ok:
+                        errors[0] += 1
+                    elif is_write:
+                        writes[0] += 1
+                    else:
+                        reads[0] += 1
+                    latencies.append(elapsed)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    latencies.sort()
+    return {
+        "ops_per_sec": (reads[0] + writes[0]) / args.duration,
+        "reads": reads[0],
+        "writes": writes[0],
+        "errors": errors[0],
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per profile")
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--todos", type=int, default=100, help="todos per user")
+    parser.add_argument("--profiles", nargs="+", default=list(ENGINE_PROFILES), choices=list(ENGINE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"{'profile':<11} {'ops/s':>9} {'reads':>8} {'writes':>8} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for profile in args.profiles:
+        r = run_profile(profile, args)
+        print(f"{profile:<11} {r['ops_per_sec']:>9.1f} {r['reads']:>8} {r['writes']:>8} {r['errors']:>7} "
+              f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
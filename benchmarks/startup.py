@@ -0,0 +1,128 @@
+"""
+Benchmark: how long the app takes to boot, and whether booting writes to the database.
+
+Times, from process launch until the server answers (median of --repeat runs):
+- `python -m app.manage init-db` on a fresh database
+- uvicorn on a fresh database (the worker initializes it: INIT_DB_ON_STARTUP=1)
+- uvicorn on an initialized database (a read-only check, no hashing)
+- gunicorn with --workers workers on an initialized database (until every
+  worker has finished starting)
+Each boot on an initialized database must leave the database contents unchanged.
+
+Usage:
+    pip install httpx gunicorn
+    python benchmarks/startup.py
+    python benchmarks/startup.py --workers 8 --repeat 5
+"""
+import argparse
+import hashlib
+import importlib.util
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from common import REPO_ROOT, free_port
+
+# gunicorn.conf.py refuses to start without SECRET_KEY
+ENV = dict({"SECRET_KEY": "startup-benchmark"}, **os.environ, PYTHONPATH=REPO_ROOT)
+
+
+def database_state(workdir: str) -> str:
+    """Hash of the database's contents (a checkpoint may touch the files without changing them)"""
+    connection = sqlite3.connect(os.path.join(workdir, "test.db"))
+    try:
+        return hashlib.sha256("\n".join(connection.iterdump()).encode()).hexdigest()
+    finally:
+        connection.close()
+
+
+def wait_for_server(port: int, process: subprocess.Popen, log_path: str, workers: int) -> float:
+    """Seconds until the server answers and `workers` workers report startup complete"""
+    started = time.perf_counter()
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}, see {log_path}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+            with open(log_path) as log:
+                if log.read().count("Application startup complete") >= workers:
+                    return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+
+
+def boot(command: list, workdir: str, port: int, workers: int = 1) -> float:
+    """Launch a server, time its startup, stop it"""
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(command, cwd=workdir, env=ENV, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        return wait_for_server(port, process, log_path, workers)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def uvicorn_command(port: int) -> list:
+    return [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "info", "--no-access-log"]
+
+
+def gunicorn_command(port: int, workers: int) -> list:
+    return [sys.executable, "-m", "gunicorn", "app.main:app", "--config", os.path.join(REPO_ROOT, "gunicorn.conf.py"),
+            "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "info"]
+
+
+def init_db(workdir: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "app.manage", "init-db"], cwd=workdir, env=ENV, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    timings = {"init-db (fresh database)": [], "uvicorn, fresh database": [], "uvicorn, initialized database": []}
+    gunicorn_name = f"gunicorn --workers {args.workers}, initialized database"
+    if importlib.util.find_spec("gunicorn"):
+        timings[gunicorn_name] = []
+    writes = []
+
+    for _ in range(args.repeat):
+        workdir = tempfile.mkdtemp()
+        timings["init-db (fresh database)"].append(init_db(workdir))
+
+        workdir = tempfile.mkdtemp()
+        timings["uvicorn, fresh database"].append(boot(uvicorn_command(port := free_port()), workdir, port))
+
+        before = database_state(workdir)
+        timings["uvicorn, initialized database"].append(boot(uvicorn_command(port := free_port()), workdir, port))
+        if database_state(workdir) != before:
+            writes.append("uvicorn")
+
+        if gunicorn_name in timings:
+            # The master runs init-db once; on an initialized database it has nothing to write
+            before = database_state(workdir)
+            timings[gunicorn_name].append(boot(gunicorn_command(port := free_port(), args.workers), workdir, port, args.workers))
+            if database_state(workdir) != before:
+                writes.append("gunicorn")
+
+    for name, samples in timings.items():
+        print(f"{name:<45} {statistics.median(samples) * 1000:>8.0f} ms")
+    if gunicorn_name not in timings:
+        print("(gunicorn is not installed, skipped)")
+    print("database writes while booting on an initialized database:", ", ".join(sorted(set(writes))) or "none")
+    sys.exit(1 if writes else 0)
+
+
+if __name__ == "__main__":
+    main()
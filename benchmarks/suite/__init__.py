@@ -0,0 +1,11 @@
+"""
+Benchmark suite covering every router (auth, users, todos, admin).
+
+- scenarios.py: the requests sent, one scenario per endpoint
+- runner.py: seeds users and todos, sends the scenarios in-process
+- report.py: throughput, p50/p95/p99 and queries per request as JSON,
+  compared against a stored baseline (baseline.json)
+- locustfile.py: the same scenarios against a running server, with Locust
+
+Run from the repository root: python -m benchmarks.suite --help
+"""
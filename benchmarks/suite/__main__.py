@@ -0,0 +1,69 @@
+"""
+Run the benchmark suite: python -m benchmarks.suite (from the repository root).
+
+Seeds a fresh database in a temporary directory, runs every scenario (or
+those of --routers) and prints req/s per endpoint. --output writes the JSON
+report; --baseline compares against a stored report and exits with status 1
+if anything regressed.
+
+Usage:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --users 1000 --todos 100 --requests 500 --concurrency 20
+    python -m benchmarks.suite --routers todos admin --db-mode async
+    python -m benchmarks.suite --output report.json --baseline benchmarks/suite/baseline.json
+    python -m benchmarks.suite --output benchmarks/suite/baseline.json   # store a new baseline
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+
+def main():
+    # Imported here: the app reads its settings from the environment at import time
+    from .scenarios import ROUTERS
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100, help="seeded users (each one is a simulated client)")
+    parser.add_argument("--todos", type=int, default=50, help="seeded todos per user")
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument("--routers", nargs="+", default=ROUTERS, choices=ROUTERS)
+    parser.add_argument("--db-mode", default="sync", choices=["sync", "async"])
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="compare with this JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop against the baseline")
+    parser.add_argument("--p95-tolerance", type=float, default=0.5, help="allowed p95 latency growth against the baseline")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="todo-bench-")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+        "DB_MODE": args.db_mode,
+        # Every simulated client logs in from the same address
+        "RATE_LIMITS_ENABLED": "0",
+        "INIT_LOCK_FILE": os.path.join(workdir, "init.lock"),
+    })
+    from . import report, runner
+
+    print(f"seeding {args.users} users x {args.todos} todos in {workdir}, DB_MODE={args.db_mode}")
+    results = asyncio.run(runner.run(args.users, args.todos, args.requests, args.concurrency, args.routers, args.warmup))
+    settings = {key: getattr(args, key) for key in ("users", "todos", "requests", "concurrency", "warmup", "routers", "db_mode")}
+    current = report.build_report(results, settings)
+    if args.output:
+        report.save(current, args.output)
+        print(f"report written to {args.output}")
+
+    if args.baseline:
+        regressions = report.compare(current, report.load(args.baseline), args.tolerance, args.p95_tolerance)
+        if regressions:
+            print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
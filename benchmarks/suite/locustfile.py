@@ -0,0 +1,79 @@
+"""
+The suite's scenarios as a Locust load test against a running server.
+
+Each simulated user registers its own account, creates some todos and then
+picks scenarios at random (admin scenarios run as the seeded admin in a
+separate user class). Start the server with rate limits off, since every
+simulated user connects from the same address:
+
+    RATE_LIMITS_ENABLED=0 uvicorn app.main:app
+    pip install locust
+    locust -f benchmarks/suite/locustfile.py --host http://127.0.0.1:8000 --users 100 --spawn-rate 10
+"""
+import itertools
+import os
+import random
+import sys
+import uuid
+
+from locust import HttpUser, between, task
+
+SUITE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [SUITE_DIR, os.path.dirname(os.path.dirname(SUITE_DIR))]
+from benchmarks.common import log_in  # noqa: E402
+from scenarios import PASSWORD, SCENARIOS, Client  # noqa: E402
+
+ADMIN_EMAIL, ADMIN_PASSWORD = "admin@admin.com", "admin"
+
+
+class ScenarioUser(HttpUser):
+    abstract = True
+    wait_time = between(0.1, 0.5)
+    admin = False
+
+    def log_in(self, email: str, password: str) -> dict:
+        return log_in(self.client, email, password, name="POST /auth/login")
+
+    def send(self, scenario):
+        method, url, kwargs = scenario.build(self.bench_client, next(self.counter))
+        headers = self.admin_headers if scenario.admin else self.bench_client.headers
+        with self.client.request(method, url, headers=headers, name=scenario.name, catch_response=True, **kwargs) as response:
+            if response.status_code >= 400:
+                response.failure(f"HTTP {response.status_code}")
+            elif scenario.after:
+                scenario.after(self.bench_client, response.json())
+
+    @task
+    def run_scenario(self):
+        self.send(self.random.choice(self.scenarios))
+
+
+class ApiUser(ScenarioUser):
+    """A regular user: every auth, users and todos scenario"""
+    weight = 10
+    scenarios = [scenario for scenario in SCENARIOS if not scenario.admin]
+
+    def on_start(self):
+        email = f"locust-{uuid.uuid4().hex[:12]}@bench.example"
+        response = self.client.post("/auth/register", json={"name": "Locust", "email": email, "password": PASSWORD}, name="POST /auth/register")
+        user_id = response.json()["id"]
+        headers = self.log_in(email, PASSWORD)
+        todos = [{"title": f"locust todo {n}"} for n in range(20)]
+        response = self.client.post("/todos/batch", json={"todos": todos}, headers=headers, name="POST /todos/batch")
+        todo_ids = [result["id"] for result in response.json()["results"]]
+        self.bench_client = Client(user_id, email, headers, todo_ids)
+        self.admin_headers = None
+        self.counter = itertools.count()
+        self.random = random.Random()
+
+
+class AdminUser(ScenarioUser):
+    """The seeded admin: the admin scenarios"""
+    weight = 1
+    scenarios = [scenario for scenario in SCENARIOS if scenario.admin]
+
+    def on_start(self):
+        self.admin_headers = self.log_in(ADMIN_EMAIL, ADMIN_PASSWORD)
+        self.bench_client = Client(0, ADMIN_EMAIL, self.admin_headers, [1])
+        self.counter = itertools.count()
+        self.random = random.Random()
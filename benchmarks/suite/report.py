@@ -0,0 +1,104 @@
+"""
+Per-scenario numbers, the JSON report, and the comparison with a baseline.
+
+A scenario regresses when, compared with the baseline:
+- its throughput dropped by more than the tolerance (default 20%)
+- its p95 latency grew by more than the p95 tolerance (default 50%: tail
+  latencies of writes depend on when SQLite syncs and vary more)
+- it runs more queries per request, by more than QUERY_TOLERANCE (query
+  counts don't depend on the machine; they only wobble a little where a
+  token cache miss depends on the order concurrent requests finish in)
+Timings are only comparable between runs on the same machine.
+"""
+import json
+import platform
+import sys
+import time
+from typing import Dict, List, Optional
+
+REPORT_VERSION = 1
+QUERY_TOLERANCE = 0.5
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, round(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(scenario, latencies: List[float], queries: List[int], errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "router": scenario.router,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def build_report(results: Dict[str, dict], settings: dict) -> dict:
+    return {
+        "version": REPORT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "machine": {"python": sys.version.split()[0], "platform": platform.platform(), "processor": platform.machine()},
+        "settings": settings,
+        "scenarios": results,
+    }
+
+
+def load(path: str) -> dict:
+    with open(path) as report_file:
+        return json.load(report_file)
+
+
+def save(report: dict, path: str):
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+        report_file.write("\n")
+
+
+def _change(current: float, baseline: float) -> Optional[float]:
+    return (current - baseline) / baseline if baseline else None
+
+
+def compare(report: dict, baseline: dict, tolerance: float, p95_tolerance: float) -> List[str]:
+    """Print each scenario next to the baseline; return the regressions found"""
+    if baseline.get("settings") != report["settings"]:
+        print(f"warning: the baseline was run with different settings: {baseline.get('settings')}")
+    regressions = []
+    print(f"\n{'scenario':<36} {'req/s':>9} {'vs base':>8} {'p95 ms':>9} {'vs base':>8} {'queries':>8} {'base':>6}")
+    for name, result in report["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            print(f"{name:<36} {result['throughput_rps']:>9.1f} {'(new)':>8}")
+            continue
+        throughput_change = _change(result["throughput_rps"], base["throughput_rps"])
+        p95_change = _change(result["p95_ms"], base["p95_ms"])
+        print(
+            f"{name:<36} {result['throughput_rps']:>9.1f} {_format(throughput_change):>8} "
+            f"{result['p95_ms']:>9.2f} {_format(p95_change):>8} "
+            f"{_format_queries(result['queries_per_request']):>8} {_format_queries(base['queries_per_request']):>6}"
+        )
+        if throughput_change is not None and throughput_change < -tolerance:
+            regressions.append(f"{name}: throughput {throughput_change:+.0%}")
+        if p95_change is not None and p95_change > p95_tolerance:
+            regressions.append(f"{name}: p95 latency {p95_change:+.0%}")
+        if (result["queries_per_request"] or 0) > (base["queries_per_request"] or 0) + QUERY_TOLERANCE:
+            regressions.append(f"{name}: {result['queries_per_request']} queries per request (was {base['queries_per_request']})")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors (was {base['errors']})")
+    return regressions
+
+
+def _format(change: Optional[float]) -> str:
+    return "-" if change is None else f"{change:+.0%}"
+
+
+def _format_queries(queries: Optional[float]) -> str:
+    return "-" if queries is None else f"{queries:g}"
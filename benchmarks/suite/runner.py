@@ -0,0 +1,129 @@
+"""
+Seeds a fresh database and sends every scenario through an in-process ASGI
+client (httpx.ASGITransport - no server, no sockets, the middleware and
+the database calls run as they do under uvicorn).
+
+Imports the app, so DATABASE_URL, DB_MODE etc. must be set first (see
+__main__.py).
+"""
+import asyncio
+import random
+import re
+import time
+from typing import Dict, List
+
+import httpx
+from sqlalchemy import select
+
+from app import auth, crud, hashing, manage, migrations, token_cache
+from app.database import engine
+from app.main import app
+
+from ..common import async_log_in
+from .report import summarize
+from .scenarios import PASSWORD, SCENARIOS, WORDS, Client
+
+ADMIN_EMAIL, ADMIN_PASSWORD = "admin@admin.com", "admin"
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def seed(users: int, todos_per_user: int) -> Dict[int, List[int]]:
+    """`users` accounts with `todos_per_user` todos each (a third completed); returns user id -> todo ids"""
+    manage.init_db(engine)
+    # One hash for everyone: seeding shouldn't take a PBKDF2 per user
+    hashed_password = auth.get_password_hash(PASSWORD)
+    randomizer = random.Random(0)
+    users_per_insert = max(1, 50000 // max(1, todos_per_user))
+    with engine.begin() as connection:
+        connection.execute(crud.users_table.insert(), [
+            {"name": f"Bench {n}", "email": f"bench{n}@bench.example", "hashed_password": hashed_password, "is_admin": False}
+            for n in range(users)
+        ])
+        user_ids = connection.execute(
+            select(crud.users_table.c.id).where(crud.users_table.c.email.like("bench%@bench.example")).order_by(crud.users_table.c.id)
+        ).scalars().all()
+        for start in range(0, users, users_per_insert):
+            connection.execute(crud.todos_table.insert(), [
+                {
+                    "title": f"{randomizer.choice(WORDS)} {randomizer.choice(WORDS)} {n}",
+                    "description": f"seeded todo {n} of user {user_id}",
+                    "completed": n % 3 == 0,
+                    "owner_id": user_id,
+                }
+                for user_id in user_ids[start:start + users_per_insert]
+                for n in range(todos_per_user)
+            ])
+        # Counts for GET /admin/stats, as an existing database would have them
+        migrations.add_user_todo_stats(connection)
+        rows = connection.execute(
+            select(crud.todos_table.c.owner_id, crud.todos_table.c.id).where(crud.todos_table.c.owner_id.in_(user_ids))
+        ).all()
+    todo_ids: Dict[int, List[int]] = {user_id: [] for user_id in user_ids}
+    for owner_id, todo_id in rows:
+        todo_ids[owner_id].append(todo_id)
+    return todo_ids
+
+
+async def run_scenario(http: httpx.AsyncClient, scenario, clients: List[Client], admin_headers: dict,
+                       requests: int, concurrency: int, first_index: int = 0) -> dict:
+    """
+    Send `requests` requests, `concurrency` at a time, round-robin over the
+    clients. Scenarios build request number i from first_index on, so the
+    warmup and the measured run don't send the same requests (e.g. register
+    the same email twice).
+    """
+    if scenario.max_requests:
+        requests = min(requests, scenario.max_requests)
+    latencies, queries = [], []
+    errors = 0
+    next_index = first_index
+    requests += first_index
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+            client = clients[i % len(clients)]
+            method, url, kwargs = scenario.build(client, i)
+            headers = admin_headers if scenario.admin else client.headers
+            started = time.perf_counter()
+            response = await http.request(method, url, headers=headers, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            match = QUERIES.search(response.headers.get("server-timing", ""))
+            if match:
+                queries.append(int(match.group(1)))
+            if response.status_code >= 400:
+                errors += 1
+            elif scenario.after:
+                scenario.after(client, response.json())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(scenario, latencies, queries, errors, time.perf_counter() - started)
+
+
+async def run(users: int, todos_per_user: int, requests: int, concurrency: int, routers: List[str], warmup: int) -> Dict[str, dict]:
+    todo_ids = seed(users, todos_per_user)
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            admin_headers = await async_log_in(http, ADMIN_EMAIL, ADMIN_PASSWORD)
+            clients = []
+            for n, (user_id, ids) in enumerate(todo_ids.items()):
+                email = f"bench{n}@bench.example"
+                clients.append(Client(user_id, email, await async_log_in(http, email, PASSWORD), ids))
+
+            for scenario in SCENARIOS:
+                if scenario.router not in routers:
+                    continue
+                if warmup:
+                    await run_scenario(http, scenario, clients, admin_headers, warmup, concurrency, first_index=requests)
+                results[scenario.name] = await run_scenario(http, scenario, clients, admin_headers, requests, concurrency)
+                print(f"  {scenario.name:<36} {results[scenario.name]['throughput_rps']:>9.1f} req/s", flush=True)
+    finally:
+        hashing.shutdown()
+        token_cache.clear()
+        engine.dispose()
+    return results
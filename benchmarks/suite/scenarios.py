@@ -0,0 +1,88 @@
+"""
+What the suite sends: one Scenario per endpoint, grouped by router.
+
+A scenario builds a request for a simulated client (build) and may record
+something from the response for later scenarios (after), e.g. the ids of
+the todos it created so the delete scenarios have something to delete.
+Scenarios only describe requests, so the in-process runner and the Locust
+file send exactly the same ones. They run in the order listed.
+"""
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+# The seeded accounts' password
+PASSWORD = "benchmark-password"
+# Words the seeded titles are made of (GET /todos/search looks for them)
+WORDS = ("buy", "call", "email", "fix", "plan", "read", "review", "write")
+
+# (method, url, keyword arguments for the HTTP client: json, params or data)
+Request = Tuple[str, str, dict]
+
+
+class Client:
+    """One simulated API client: an account, its token and what it has created"""
+
+    def __init__(self, user_id: int, email: str, headers: dict, todo_ids: List[int]):
+        self.user_id = user_id
+        self.email = email
+        self.headers = headers
+        self.todo_ids = todo_ids
+        # Ids of todos created by the scenarios, deleted by later ones
+        self.created: List[int] = []
+        self.batch_created: List[List[int]] = []
+
+    def todo_id(self, i: int) -> int:
+        return self.todo_ids[i % len(self.todo_ids)]
+
+
+class Scenario(NamedTuple):
+    router: str
+    name: str
+    build: Callable[[Client, int], Request]
+    # Sent with the admin's token instead of the client's
+    admin: bool = False
+    # Cap on the requests per run (for the endpoints that hash passwords)
+    max_requests: Optional[int] = None
+    after: Optional[Callable[[Client, dict], None]] = None
+
+
+def _created(client: Client, body: dict):
+    client.created.append(body["id"])
+
+
+def _batch_created(client: Client, body: dict):
+    client.batch_created.append([result["id"] for result in body["results"]])
+
+
+def _pop(ids: list, fallback: int) -> int:
+    return ids.pop() if ids else fallback
+
+
+SCENARIOS: List[Scenario] = [
+    # auth
+    Scenario("auth", "POST /auth/login", lambda c, i: ("POST", "/auth/login", {"json": {"email": c.email, "password": PASSWORD}}), max_requests=100),
+    Scenario("auth", "POST /auth/register", lambda c, i: ("POST", "/auth/register", {"json": {"name": "New", "email": f"new{c.user_id}-{i}@bench.example", "password": PASSWORD}}), max_requests=100),
+    # users
+    Scenario("users", "GET /users/me", lambda c, i: ("GET", "/users/me", {})),
+    Scenario("users", "PUT /users/me", lambda c, i: ("PUT", "/users/me", {"json": {"name": f"User {i}", "phone_number": "+1000000000"}})),
+    Scenario("users", "POST /users/me/change-password", lambda c, i: ("POST", "/users/me/change-password", {"json": {"current_password": PASSWORD, "new_password": PASSWORD}}), max_requests=100),
+    # todos
+    Scenario("todos", "GET /todos/", lambda c, i: ("GET", "/todos/", {})),
+    Scenario("todos", "GET /todos/?completed=true", lambda c, i: ("GET", "/todos/", {"params": {"completed": "true"}})),
+    Scenario("todos", "GET /todos/{id}", lambda c, i: ("GET", f"/todos/{c.todo_id(i)}", {})),
+    Scenario("todos", "GET /todos/search", lambda c, i: ("GET", "/todos/search", {"params": {"q": WORDS[i % len(WORDS)]}})),
+    Scenario("todos", "GET /todos/changes", lambda c, i: ("GET", "/todos/changes", {"params": {"since": 0, "limit": 100}})),
+    Scenario("todos", "POST /todos/", lambda c, i: ("POST", "/todos/", {"json": {"title": f"new {WORDS[i % len(WORDS)]} {i}", "description": "created by the benchmark"}}), after=_created),
+    Scenario("todos", "PUT /todos/{id}", lambda c, i: ("PUT", f"/todos/{c.todo_id(i)}", {"json": {"completed": i % 2 == 0}})),
+    Scenario("todos", "POST /todos/batch", lambda c, i: ("POST", "/todos/batch", {"json": {"todos": [{"title": f"batch {i}-{n}"} for n in range(10)]}}), after=_batch_created),
+    Scenario("todos", "PATCH /todos/batch", lambda c, i: ("PATCH", "/todos/batch", {"json": {"todos": [{"id": c.todo_id(i + n), "completed": n % 2 == 0} for n in range(10)]}})),
+    Scenario("todos", "DELETE /todos/batch", lambda c, i: ("DELETE", "/todos/batch", {"json": {"ids": c.batch_created.pop() if c.batch_created else [c.todo_id(i)]}})),
+    Scenario("todos", "DELETE /todos/{id}", lambda c, i: ("DELETE", f"/todos/{_pop(c.created, c.todo_id(i))}", {})),
+    # admin
+    Scenario("admin", "GET /admin/users", lambda c, i: ("GET", "/admin/users", {}), admin=True),
+    Scenario("admin", "GET /admin/todos", lambda c, i: ("GET", "/admin/todos", {"params": {"cursor": c.todo_id(i)}}), admin=True),
+    Scenario("admin", "GET /admin/todos?completed=false", lambda c, i: ("GET", "/admin/todos", {"params": {"completed": "false"}}), admin=True),
+    Scenario("admin", "GET /admin/stats", lambda c, i: ("GET", "/admin/stats", {}), admin=True),
+    Scenario("admin", "GET /admin/metrics", lambda c, i: ("GET", "/admin/metrics", {}), admin=True),
+]
+
+ROUTERS = sorted({scenario.router for scenario in SCENARIOS})
@@ -0,0 +1,39 @@
+"""
+gunicorn settings for running the app in several worker processes:
+
+    SECRET_KEY=... gunicorn app.main:app
+
+gunicorn reads this file from the current directory. The database is set up
+once, by `python -m app.manage init-db` in the master process before any
+worker starts; workers then boot without writing to the database (and
+refuse to start if it isn't up to date). Any setting can be overridden on
+the command line, e.g. `gunicorn app.main:app --workers 8 --bind 0.0.0.0:8000`.
+
+With more than one worker, state that would otherwise be kept per worker is
+shared or turned off (unless set in the environment): rate-limit buckets
+move to the database (RATE_LIMIT_BACKEND=database), so a client can't get
+the limit once per worker, and the verified-token cache is off
+(TOKEN_CACHE_ENABLED=0), so a changed or deleted user isn't still accepted
+by the workers that didn't make the change.
+"""
+import os
+import subprocess
+import sys
+
+bind = os.getenv("BIND", "127.0.0.1:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Workers must find the database ready (see on_starting)
+raw_env = ["INIT_DB_ON_STARTUP=0"]
+
+
+def on_starting(server):
+    """Runs once in the master. A separate process, so no database connection is inherited by the workers."""
+    if not os.getenv("SECRET_KEY"):
+        # Without it every worker would sign tokens with the development key
+        sys.exit("SECRET_KEY is not set: run e.g. `SECRET_KEY=... gunicorn app.main:app`")
+    if server.cfg.workers > 1:
+        # Workers are forked from the master and inherit its environment
+        os.environ.setdefault("RATE_LIMIT_BACKEND", "database")
+        os.environ.setdefault("TOKEN_CACHE_ENABLED", "0")
+    subprocess.run([sys.executable, "-m", "app.manage", "init-db"], check=True)
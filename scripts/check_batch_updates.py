@@ -0,0 +1,106 @@
+"""
+Batch update check for PATCH /todos/batch.
+
+Runs the app in-process on a fresh database with two identical sets of
+todos. Each round sends a random batch - many items for the same ID, in
+any order - to PATCH /todos/batch for the first set, and the same items
+one at a time to PUT /todos/{id} for the second. Exits with status 1 if
+the two sets end up different (a batch must end like its items applied in
+request order), if the user's completed count in GET /admin/stats doesn't
+match their todos, or if a todo changed by a batch isn't in the change feed
+after it.
+
+Usage:
+    python scripts/check_batch_updates.py
+    DB_MODE=async python scripts/check_batch_updates.py --rounds 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.common import log_in  # noqa: E402
+
+FIELDS = ("title", "description", "completed")
+
+
+def random_item(rng: random.Random, todo_index: int) -> dict:
+    """One batch item for the todo_index-th todo of a set: some of its fields, maybe none"""
+    item = {"index": todo_index}
+    if rng.random() < 0.5:
+        item["title"] = f"title {rng.randrange(5)}"
+    if rng.random() < 0.3:
+        item["description"] = f"description {rng.randrange(5)}"
+    if rng.random() < 0.7:
+        item["completed"] = rng.random() < 0.5
+    return item
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=100, help="random batches to send")
+    parser.add_argument("--todos", type=int, default=5, help="todos per set (few, so IDs repeat within a batch)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ["TODO_CACHE_ENABLED"] = "0"
+    os.chdir(tempfile.mkdtemp())  # the app uses ./test.db
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    problems = []
+    with TestClient(app) as client:
+        headers, admin_headers = log_in(client, "user@user.com", "user"), log_in(client, "admin@admin.com", "admin")
+        user_id = client.get("/users/me", headers=headers).json()["id"]
+        response = client.post("/todos/batch", json={"todos": [{"title": "new"} for _ in range(2 * args.todos)]}, headers=headers)
+        ids = [result["id"] for result in response.json()["results"]]
+        batched, one_by_one = ids[:args.todos], ids[args.todos:]
+        version = client.get("/todos/changes", params={"since": 0}, headers=headers).json()["version"]
+
+        for round_number in range(args.rounds):
+            items = [random_item(rng, rng.randrange(args.todos)) for _ in range(rng.randint(1, 3 * args.todos))]
+            batch = [{"id": batched[item["index"]], **{field: item[field] for field in FIELDS if field in item}} for item in items]
+            response = client.patch("/todos/batch", json={"todos": batch}, headers=headers)
+            if response.status_code != 200 or any(result["status"] != "updated" for result in response.json()["results"]):
+                problems.append(f"round {round_number}: PATCH /todos/batch answered {response.status_code} {response.text[:200]}")
+                break
+            for item in items:
+                client.put(f"/todos/{one_by_one[item['index']]}", json={field: item[field] for field in FIELDS if field in item}, headers=headers)
+
+            todos = {todo["id"]: todo for todo in client.get("/todos/", headers=headers).json()}
+            for index, (batch_id, single_id) in enumerate(zip(batched, one_by_one)):
+                got = {field: todos[batch_id][field] for field in FIELDS}
+                expected = {field: todos[single_id][field] for field in FIELDS}
+                if got != expected:
+                    problems.append(f"round {round_number}: todo {index} is {got} after the batch, {expected} one by one")
+
+            completed = sum(1 for todo in todos.values() if todo["completed"])
+            stats = {row["user_id"]: row for row in client.get("/admin/stats", headers=admin_headers).json()["users"]}
+            if stats[user_id]["completed"] != completed:
+                problems.append(f"round {round_number}: /admin/stats says {stats[user_id]['completed']} completed, the todos {completed}")
+
+            changes = client.get("/todos/changes", params={"since": version}, headers=headers).json()
+            changed = {todo["id"] for todo in changes["todos"]}
+            for item in items:
+                if len(item) > 1 and batched[item["index"]] not in changed:
+                    problems.append(f"round {round_number}: todo {item['index']} changed but isn't in /todos/changes")
+                    break
+            version = changes["version"]
+            if problems:
+                break
+
+    if problems:
+        print("FAILED:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print(f"OK: {args.rounds} batches ended like their items applied one by one")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Query count check for the API endpoints.
+
+Runs the app in-process on a fresh database, calls each endpoint in
+ENDPOINTS and reads the number of SQL queries it ran from its Server-Timing
+header. Then it grows the data (--users more users, --todos todos each,
+interleaved so a page of the admin listing spans many owners) and calls
+them again. Exits with status 1 if an endpoint's query count changed with
+the data - the sign of a query per row (N+1), e.g. a lazy load of
+Todo.owner - or if an endpoint didn't answer with 2xx (the relationships
+are lazy="raise_on_sql", so an accidental lazy load is a 500).
+
+Each endpoint is called twice per round and the second call counts, so the
+verified-token cache is warm both times. The todo list cache is turned off,
+so GET /todos/ runs its queries.
+
+Usage:
+    python scripts/check_query_counts.py
+    DB_MODE=async python scripts/check_query_counts.py --users 200 --todos 50
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.common import log_in  # noqa: E402
+
+QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+PAGE = {"limit": 100}
+
+# (name, method, path, query parameters or JSON body, who calls it)
+ENDPOINTS = [
+    ("list todos", "GET", "/todos/", PAGE, "user"),
+    ("list todos [completed]", "GET", "/todos/", {**PAGE, "completed": True}, "user"),
+    ("get todo", "GET", "/todos/{todo_id}", None, "user"),
+    ("changes", "GET", "/todos/changes", {"since": 0}, "user"),
+    ("search", "GET", "/todos/search", {"q": "todo", "limit": 100}, "user"),
+    ("profile", "GET", "/users/me", None, "user"),
+    ("update todo", "PUT", "/todos/{todo_id}", {"completed": True}, "user"),
+    ("create todo", "POST", "/todos/", {"title": "another"}, "user"),
+    ("admin todos", "GET", "/admin/todos", PAGE, "admin"),
+    ("admin todos [owner]", "GET", "/admin/todos", {**PAGE, "include": "owner"}, "admin"),
+    ("admin users", "GET", "/admin/users", None, "admin"),
+    ("admin stats", "GET", "/admin/stats", None, "admin"),
+]
+
+
+def query_counts(client, headers: dict, todo_id: int) -> dict:
+    """name -> queries run by the endpoint's second call (or an error message)"""
+    counts = {}
+    for name, method, path, data, who in ENDPOINTS:
+        url = path.format(todo_id=todo_id)
+        kwargs = {"params": data} if method == "GET" else {"json": data}
+        for _ in range(2):
+            response = client.request(method, url, headers=headers[who], **kwargs)
+        if response.status_code >= 300:
+            counts[name] = f"HTTP {response.status_code}"
+            continue
+        counts[name] = int(QUERY_COUNT.search(response.headers["server-timing"]).group(1))
+    return counts
+
+
+def grow(users: int, todos: int, user_id: int):
+    """Add `users` users with `todos` todos each, interleaved by owner, plus as many for user_id"""
+    from app import crud, migrations
+    from app.database import engine
+    with engine.begin() as connection:
+        grown_ids = connection.execute(crud.users_table.insert().returning(crud.users_table.c.id), [
+            {"name": f"grown {i}", "email": f"grown-{i}@example.com", "hashed_password": "x", "is_admin": False}
+            for i in range(users)
+        ]).scalars().all()
+        owner_ids = grown_ids + [user_id]
+        connection.execute(crud.todos_table.insert(), [
+            {"title": f"todo {i} of {owner_id}", "description": "grown", "completed": i % 2 == 0, "owner_id": owner_id}
+            for i in range(todos) for owner_id in owner_ids
+        ])
+        migrations.add_user_todo_stats(connection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100, help="users added between the rounds")
+    parser.add_argument("--todos", type=int, default=20, help="todos added per user between the rounds")
+    args = parser.parse_args()
+
+    os.environ["TODO_CACHE_ENABLED"] = "0"
+    os.chdir(tempfile.mkdtemp())  # the app uses ./test.db
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        headers = {"user": log_in(client, "user@user.com", "user"), "admin": log_in(client, "admin@admin.com", "admin")}
+        response = client.post("/todos/batch", json={"todos": [{"title": f"todo {i}"} for i in range(5)]}, headers=headers["user"])
+        todo_id = response.json()["results"][0]["id"]
+        before = query_counts(client, headers, todo_id)
+        grow(args.users, args.todos, client.get("/users/me", headers=headers["user"]).json()["id"])
+        after = query_counts(client, headers, todo_id)
+
+    problems = []
+    print(f"{'endpoint':<24} {'queries':>8} {'grown':>8}   (+{args.users} users, +{args.todos} todos each)")
+    for name, *_ in ENDPOINTS:
+        print(f"{name:<24} {before[name]!s:>8} {after[name]!s:>8}")
+        if isinstance(before[name], str) or isinstance(after[name], str):
+            problems.append(f"{name}: {before[name]} / {after[name]}")
+        elif before[name] != after[name]:
+            problems.append(f"{name}: {before[name]} queries, {after[name]} with more data")
+
+    if problems:
+        print("\nFAILED:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print(f"OK: {len(ENDPOINTS)} endpoints, query counts don't grow with the data")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Query plan check for crud.py.
+
+Calls every public function in app/crud.py against a fresh, seeded SQLite
+database, records each SQL statement it sends, and runs EXPLAIN QUERY PLAN
+on it. Exits with status 1 if any statement does a full scan of one of the
+CHECKED_TABLES (other than the admin listings in ALLOWED_FULL_SCANS), or if a crud
+function has no scenario below - add one when you add a crud function.
+
+Usage:
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py -v   # print every plan
+"""
+import argparse
+import inspect
+import os
+import re
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app import crud, migrations, models, schemas  # noqa: E402
+from app.database import Base, create_db_engine  # noqa: E402
+
+CHECKED_TABLES = ("todos", "users", "todo_tombstones", "change_counter", "user_todo_stats")
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?(%s)\b" % "|".join(CHECKED_TABLES))
+
+# Scenarios that list everything on purpose (admin only, paged by primary key)
+ALLOWED_FULL_SCANS = {
+    "iter_todos[all users]": "admin export of every todo",
+    "iter_todo_row_batches[all users]": "admin export of every todo",
+    "list_todo_rows[all users]": "admin listing of every todo",
+    "list_todo_rows[all users, owner]": "admin listing of every todo",
+    "list_user_rows": "admin listing of every user",
+    "todo_stats": "admin statistics, one row per user",
+}
+
+# crud functions that only build statements and never talk to the database
+STATEMENT_BUILDERS = {"bulk_update_statements", "select_owned_todos", "search_params", "select_changed_todos", "select_todo_rows",
+                      "select_todo_list_version", "select_tombstones", "todo_scope", "tombstone_rows",
+                      "todo_stats_upsert", "completed_stats_update", "completion_targets", "merge_batch_updates", "select_todo_stats",
+                      "delete_todos_of_users_statement", "deleted_todo_counts", "select_todos"}
+
+# Password hashing is irrelevant here and slow
+crud.auth.get_password_hash = lambda password: "not-a-real-hash"
+
+
+def scenarios(db):
+    """(name, call) for every crud function - each runs in order on the same database"""
+    owner = crud.get_user(db, 1)
+    other = crud.get_user(db, 2)
+    first_todo_id = crud.list_todo_rows(db, owner_id=owner.id, limit=1)[0].id
+    return [
+        ("get_user_by_email", lambda: crud.get_user_by_email(db, "owner@example.com")),
+        ("get_user", lambda: crud.get_user(db, 1)),
+        ("get_user_row", lambda: crud.get_user_row(db.connection(), 1)),
+        ("create_user", lambda: crud.create_user(db, schemas.UserCreate(name="New", email="new@example.com", password="x"))),
+        ("add_user", lambda: crud.add_user(db, schemas.UserCreate(name="Added", email="added@example.com", password="x"), "hash")),
+        ("update_user", lambda: crud.update_user(db, owner, "Renamed", "123")),
+        ("change_password", lambda: crud.change_password(db, owner, "new password")),
+        ("set_password_hash", lambda: crud.set_password_hash(db, owner, "hash")),
+        ("create_todo", lambda: crud.create_todo(db, owner, "New todo")),
+        ("iter_todos", lambda: list(crud.iter_todos(db, owner_id=owner.id, completed=False))),
+        ("iter_todos[all users]", lambda: list(crud.iter_todos(db))),
+        ("list_todo_rows", lambda: crud.list_todo_rows(db, owner_id=owner.id, limit=20, cursor=first_todo_id)),
+        ("list_todo_rows[completed]", lambda: crud.list_todo_rows(db, owner_id=owner.id, limit=20, completed=True)),
+        ("list_todo_rows[all users]", lambda: crud.list_todo_rows(db, limit=20, cursor=first_todo_id)),
+        ("list_todo_rows[all users, owner]", lambda: crud.list_todo_rows(db, limit=20, cursor=first_todo_id, include_owner=True)),
+        ("list_user_rows", lambda: crud.list_user_rows(db)),
+        ("search_todos", lambda: crud.search_todos(db, owner.id, "tod 1", limit=20)),
+        ("reserve_versions", lambda: crud.reserve_versions(db, 3)),
+        ("add_tombstones", lambda: crud.add_tombstones(db, owner.id, [1000, 1001])),
+        ("todo_list_version", lambda: crud.todo_list_version(db, owner.id)),
+        ("adjust_todo_stats", lambda: crud.adjust_todo_stats(db, owner.id, total=1)),
+        ("todo_stats", lambda: crud.todo_stats(db)),
+        ("update_owned_todo[expected version]", lambda: crud.update_owned_todo(db, first_todo_id + 6, owner.id, "x", None, None, 1)),
+        ("list_changes", lambda: crud.list_changes(db, owner.id, 10, limit=20)),
+        ("create_todos", lambda: crud.create_todos(db, owner, [schemas.TodoCreate(title="a"), schemas.TodoCreate(title="b")])),
+        ("import_todos", lambda: crud.import_todos(db, owner.id, [{"title": "i", "description": "", "completed": True}])),
+        ("iter_todo_row_batches", lambda: list(crud.iter_todo_row_batches(db, owner_id=owner.id, completed=True))),
+        ("iter_todo_row_batches[all users]", lambda: list(crud.iter_todo_row_batches(db))),
+        ("update_todos", lambda: crud.update_todos(db, owner, [
+            schemas.TodoBatchUpdateItem(id=first_todo_id, completed=False),
+            schemas.TodoBatchUpdateItem(id=first_todo_id + 1, title="Renamed"),
+        ])),
+        ("delete_todos", lambda: crud.delete_todos(db, owner, [first_todo_id + 2, first_todo_id + 3])),
+        ("get_owned_todo", lambda: crud.get_owned_todo(db, first_todo_id + 4, owner.id)),
+        ("update_owned_todo", lambda: crud.update_owned_todo(db, first_todo_id + 4, owner.id, None, None, True)),
+        ("apply_todo_updates", lambda: crud.apply_todo_updates(db, [
+            (first_todo_id + 4, owner.id, {"completed": False}),
+            (first_todo_id + 1, owner.id, {"title": "Grouped", "completed": True}),
+        ])),
+        ("update_owned_todo[no changes]", lambda: crud.update_owned_todo(db, first_todo_id + 4, owner.id, None, None, None)),
+        ("delete_owned_todo", lambda: crud.delete_owned_todo(db, first_todo_id + 4, owner.id)),
+        ("delete_owned_todo[admin]", lambda: crud.delete_owned_todo(db, first_todo_id + 5, None)),
+        ("delete_user_by_id", lambda: crud.delete_user_by_id(db, other.id)),
+        ("delete_todos_of_users", lambda: crud.delete_todos_of_users(db, [owner.id])),
+        ("adjust_stats_for_deleted", lambda: crud.adjust_stats_for_deleted(db, [])),
+        ("delete_user_accounts", lambda: crud.delete_user_accounts(db, [crud.get_user_by_email(db, "new@example.com").id])),
+        ("delete_users", lambda: crud.delete_users(db, [owner.id, crud.get_user_by_email(db, "added@example.com").id])),
+    ]
+
+
+def seed(db):
+    for i, email in enumerate(["owner@example.com", "other@example.com"]):
+        user = models.User(name=f"user {i}", email=email, hashed_password="x")
+        db.add(user)
+        db.flush()
+        db.add_all(models.Todo(title=f"todo {j}", owner_id=user.id, completed=j % 2 == 0) for j in range(50))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every statement and plan")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    engine = create_db_engine(f"sqlite:///{workdir}/plans.db")
+    Base.metadata.create_all(bind=engine)
+    migrations.run_migrations(engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    captured = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if executemany and parameters and isinstance(parameters[0], (list, tuple, dict)):
+            parameters = parameters[0]
+        captured.append((statement, parameters))
+
+    db = SessionLocal()
+    seed(db)
+    problems = []
+    covered = set()
+    for name, call in scenarios(db):
+        covered.add(name.split("[")[0])
+        captured.clear()
+        call()
+        statements = list(captured)
+        raw_connection = engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            for statement, parameters in statements:
+                # INSERT ... VALUES never reads a table, nothing to check
+                if not re.match(r"\s*(SELECT|UPDATE|DELETE)", statement, re.IGNORECASE):
+                    continue
+                plan = [row[-1] for row in cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()]
+                scans = [step for step in plan if FULL_SCAN.match(step)]
+                if args.verbose or (scans and name not in ALLOWED_FULL_SCANS):
+                    print(f"[{name}] {' '.join(statement.split())}")
+                    for step in plan:
+                        print(f"    {step}")
+                if scans and name not in ALLOWED_FULL_SCANS:
+                    problems.append(f"{name}: {', '.join(scans)}")
+        finally:
+            raw_connection.close()
+    db.close()
+
+    public_functions = {
+        name for name, value in vars(crud).items()
+        if inspect.isfunction(value) and value.__module__ == crud.__name__ and not name.startswith("_")
+    }
+    for name in sorted(public_functions - covered - STATEMENT_BUILDERS):
+        problems.append(f"{name}: no scenario in scripts/check_query_plans.py")
+
+    if problems:
+        print("\nFAILED:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print(f"OK: {len(covered)} crud functions, no unexpected full scans of {', '.join(CHECKED_TABLES)}")
+
+
+if __name__ == "__main__":
+    main()